@@ -0,0 +1,229 @@
+"""Profiling benchmarks against the local SQLite backend.
+
+Measures round trips, wall time and peak Python memory of
+SnowflakeTable.analyze(), dbt yml generation and bulk permission mirroring on
+synthetic tables, with a fixed latency injected into every query to stand in
+for the warehouse round trip. No Snowflake account is needed.
+
+SQLite returns at most 2000 columns per query; batches over that limit are
+re-split the way oversized Snowflake queries are.
+
+    python benchmarks/profiling.py [--columns 10,100,500,2000] [--rows 1000]
+        [--latency 0.05] [--output results.json] [--baseline results.json]
+
+With --baseline, the run fails if any benchmark needs more round trips than
+the baseline, or more than --tolerance more wall time.
+"""
+
+import os, sys, argparse
+import json
+import random
+import time
+import tracemalloc
+from snowflake_tools.LocalConnection import LocalConnection
+from snowflake_tools.Snowflake import Snowflake
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+from snowflake_tools.generate_yml import dump_yml, model_columns
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DATA_TYPES = ["NUMBER", "TEXT", "DATE", "TEXT"]
+
+
+def synthetic_columns(column_count):
+    return [
+        (f"COLUMN_{position:04}", DATA_TYPES[position % len(DATA_TYPES)])
+        for position in range(column_count)
+    ]
+
+
+def synthetic_rows(columns, row_count, seed=0):
+    """Rows mixing unique, low-cardinality, nullable and empty-string columns."""
+    generator = random.Random(seed)
+    rows = []
+    for row in range(row_count):
+        values = []
+        for position, (_, data_type) in enumerate(columns):
+            if data_type == "NUMBER":
+                values.append(row if position % 8 == 0 else generator.randint(0, 50))
+            elif data_type == "DATE":
+                values.append(f"2026-01-{generator.randint(1, 28):02}")
+            elif position % 4 == 1:
+                values.append(generator.choice(["a", "b", "c", "", None]))
+            else:
+                values.append(f"value {generator.randint(0, row_count)}")
+        rows.append(tuple(values))
+    return rows
+
+
+def measure(connection, function):
+    """Round trips and wall time of one run, and peak Python memory of a second one.
+
+    Memory is traced in a separate run since tracing slows everything down.
+    """
+    round_trips = connection.round_trips
+    start_time = time.perf_counter()
+    function()
+    wall_time = time.perf_counter() - start_time
+    round_trips = connection.round_trips - round_trips
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "round_trips": round_trips,
+        "wall_ms": round(wall_time * 1000, 1),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def benchmark_table(args, column_count):
+    connection = LocalConnection(latency=args.latency)
+    columns = synthetic_columns(column_count)
+    connection.create_table(
+        "BENCHMARK.PUBLIC.SYNTHETIC", columns, synthetic_rows(columns, args.rows)
+    )
+
+    def table():
+        return SnowflakeTable(
+            "BENCHMARK.PUBLIC.SYNTHETIC",
+            {},
+            max_in_flight=args.max_in_flight,
+            columns_per_query=args.columns_per_query,
+            connection=connection,
+        )
+
+    def analyze():
+        table().analyze()
+
+    def generate_yml():
+        analyzed = table()
+        analyzed.analyze()
+        dump_yml(
+            {
+                "version": 2,
+                "models": [{"name": "SYNTHETIC", "columns": model_columns(analyzed)}],
+            }
+        )
+
+    return {
+        f"analyze[{column_count} columns]": measure(connection, analyze),
+        f"generate_yml[{column_count} columns]": measure(connection, generate_yml),
+    }
+
+
+def benchmark_permissions(args):
+    connection = LocalConnection(latency=args.latency)
+    generator = random.Random(0)
+    pairs = []
+    for database in range(args.databases):
+        source, target = f"SOURCE_{database:03}", f"TARGET_{database:03}"
+        for privilege in ["USAGE", "MONITOR", "CREATE SCHEMA"]:
+            connection.grant(source, "ENGINEERING", privilege)
+            if generator.random() < 0.5:
+                connection.grant(target, "ENGINEERING", privilege)
+        for grant_on in ["TABLE", "VIEW"]:
+            connection.grant_future(source, "ENGINEERING", "SELECT", grant_on)
+        pairs.append((source, "ENGINEERING", target, "ENGINEERING"))
+
+    snowflake = Snowflake({}, connection=connection)
+    return {
+        f"mirror_permissions[{args.databases} databases]": measure(
+            connection,
+            lambda: snowflake.mirror_many_db_permissions(
+                pairs, max_in_flight=args.max_in_flight
+            ),
+        )
+    }
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if result["round_trips"] > baseline[name]["round_trips"]:
+            found.append(
+                f"{name}: {result['round_trips']} round trips, baseline {baseline[name]['round_trips']}"
+            )
+        if result["wall_ms"] > baseline[name]["wall_ms"] * (1 + tolerance):
+            found.append(
+                f"{name}: {result['wall_ms']} ms, baseline {baseline[name]['wall_ms']} ms"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Profiling benchmarks on the local backend"
+    )
+    parser.add_argument(
+        "--columns",
+        help="Comma separated table widths (default: 10,100,500,2000)",
+        default="10,100,500,2000",
+    )
+    parser.add_argument(
+        "--rows",
+        help="Rows per synthetic table (default: 1000)",
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        "--databases",
+        help="Database pairs to mirror permissions for (default: 150)",
+        type=int,
+        default=150,
+    )
+    parser.add_argument(
+        "--latency",
+        help="Seconds added to every query (default: 0.05)",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "--max-in-flight", help="Concurrent queries (default: 4)", type=int, default=4
+    )
+    parser.add_argument(
+        "--columns-per-query",
+        help="Columns profiled per query (default: spread over --max-in-flight queries)",
+        type=int,
+    )
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results from --output")
+    parser.add_argument(
+        "--tolerance",
+        help="Allowed wall time increase over the baseline (default: 0.25)",
+        type=float,
+        default=0.25,
+    )
+    args = parser.parse_args()
+
+    # Imported lazily by the tools; keep the import out of the first measurement
+    import pandas
+
+    results = {}
+    for column_count in [int(count) for count in args.columns.split(",")]:
+        results.update(benchmark_table(args, column_count))
+    results.update(benchmark_permissions(args))
+
+    for name, result in results.items():
+        print(
+            f"{name}: {result['round_trips']} round trips, {result['wall_ms']} ms, peak {result['peak_memory_kb']} KiB"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            found = regressions(results, json.load(file), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
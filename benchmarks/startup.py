@@ -0,0 +1,104 @@
+"""Cold-start benchmark for the console scripts.
+
+Runs every script in pyproject.toml's [tool.poetry.scripts] with --help in a
+fresh interpreter, which is the path argparse errors and --help take, and
+reports the median wall time along with the slowest imports from
+`python -X importtime`.
+
+    python benchmarks/startup.py [--runs 10] [--top 5] [--output startup.json]
+"""
+
+import os, sys, argparse
+import json
+import statistics
+import subprocess
+import time
+import toml
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def console_scripts():
+    with open(os.path.join(project_dir, "pyproject.toml"), "r") as file:
+        return toml.load(file)["tool"]["poetry"]["scripts"]
+
+
+def launcher(entry_point):
+    module, function = entry_point.split(":")
+    return (
+        f"import sys; sys.argv = ['startup-benchmark', '--help']; "
+        f"from {module} import {function}; {function}()"
+    )
+
+
+def wall_time(code):
+    start_time = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start_time
+
+
+def slowest_imports(code, top):
+    """Imports ranked by cumulative import time in microseconds.
+
+    Cumulative time includes everything an import pulled in, so the ranking
+    shows the chain from the script's own modules down to the heavy package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Console script cold-start benchmark")
+    parser.add_argument(
+        "--runs", help="Runs per script (default: 10)", type=int, default=10
+    )
+    parser.add_argument(
+        "--top", help="Slowest imports to list (default: 5)", type=int, default=5
+    )
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for script, entry_point in console_scripts().items():
+        code = launcher(entry_point)
+        wall_time(code)  # warm the filesystem cache and bytecode
+        times = [wall_time(code) for _ in range(args.runs)]
+        results[script] = {
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "slowest_imports_ms": {
+                name: round(cumulative / 1000, 1)
+                for cumulative, name in slowest_imports(code, args.top)
+            },
+        }
+
+        print(
+            f"{script}: median {results[script]['median_ms']} ms, min {results[script]['min_ms']} ms"
+        )
+        for name, milliseconds in results[script]["slowest_imports_ms"].items():
+            print(f"    {milliseconds:8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
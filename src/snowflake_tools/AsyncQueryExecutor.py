@@ -0,0 +1,94 @@
+import time
+import asyncio
+from snowflake_tools.QueryExecutor import DeadlineExceeded, query_timeout
+
+
+class AsyncQueryExecutor:
+    """Runs queries from asyncio code with the connector's asynchronous query support.
+
+    submit() starts a query with execute_async and then polls its status,
+    sleeping between polls with growing intervals, so the event loop is free
+    while the warehouse works. At most `max_in_flight` queries run at the same
+    time. The connector's own network calls still block, so they run in
+    asyncio.to_thread(). Cancelling a task awaiting submit() cancels its
+    query in Snowflake too, and so do a timeout or deadline, as in
+    QueryExecutor.
+    """
+
+    def __init__(
+        self, connection, max_in_flight=4, poll_interval=0.05, max_poll_interval=2.0
+    ):
+        self.connection = connection
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def submit(self, query, params=None, timeout=None, deadline=None):
+        """Run a query and return all of its rows; `timeout` is in seconds, `deadline` a time.monotonic() value."""
+        async with self._slots:
+            timeout = query_timeout(timeout, deadline)
+            start_time = time.time()
+            query_id, rows, error = None, None, None
+            cursor = self.connection.cursor()
+            try:
+                await asyncio.to_thread(cursor.execute_async, query, params)
+                query_id = cursor.sfqid
+                await self._wait(query_id, timeout)
+                await asyncio.to_thread(cursor.get_results_from_sfqid, query_id)
+                rows = await asyncio.to_thread(cursor.fetchall)
+                return rows
+            except asyncio.CancelledError as e:
+                error = e
+                if query_id is not None:
+                    # Shielded, so the query is cancelled even though this task is
+                    await asyncio.shield(self.cancel(query_id))
+                raise
+            except Exception as e:
+                error = e
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded(
+                        "Deadline passed; the query was cancelled"
+                    ) from e
+                raise
+            finally:
+                trace = getattr(self.connection, "trace", None)
+                if trace is not None:
+                    trace.record(
+                        query,
+                        time.time() - start_time,
+                        query_id=query_id,
+                        rows=None if rows is None else len(rows),
+                        error=error,
+                    )
+
+    async def _wait(self, query_id, timeout=None):
+        """Poll until the query is done; raises its error if it failed, or TimeoutError after `timeout` seconds."""
+        started_at = time.monotonic()
+        interval = self.poll_interval
+        while True:
+            status = await asyncio.to_thread(
+                self.connection.get_query_status_throw_if_error, query_id
+            )
+            if not self.connection.is_still_running(status):
+                return
+            if timeout is not None:
+                remaining = started_at + timeout - time.monotonic()
+                if remaining <= 0:
+                    await self.cancel(query_id)
+                    raise TimeoutError(
+                        f"Query {query_id} was cancelled after reaching its {timeout:g}s timeout"
+                    )
+                interval = min(interval, remaining)
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    async def cancel(self, query_id):
+        cursor = self.connection.cursor()
+        await asyncio.to_thread(
+            cursor.execute, "select system$cancel_query(%s)", (query_id,)
+        )
+
+    async def map(self, queries):
+        """Run all queries concurrently and return their rows in submission order."""
+        return await asyncio.gather(*(self.submit(query) for query in queries))
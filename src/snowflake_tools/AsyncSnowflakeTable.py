@@ -0,0 +1,154 @@
+import asyncio
+from snowflake_tools.AsyncQueryExecutor import AsyncQueryExecutor
+from snowflake_tools.QueryTrace import query_context
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+
+
+class AsyncSnowflakeTable(SnowflakeTable):
+    """SnowflakeTable for asyncio code, such as a service profiling tables on request.
+
+    analyze() and plan_profile() are coroutines. Profile queries run through
+    an AsyncQueryExecutor, so the event loop stays free while the warehouse
+    works. The short metadata and cache lookups run in asyncio.to_thread().
+    Share one executor between tables to profile many of them at once under
+    one limit on queries in flight:
+
+        executor = AsyncQueryExecutor(connection, max_in_flight=16)
+        tables = [AsyncSnowflakeTable(name, config, connection=connection,
+                                      executor=executor) for name in names]
+        await asyncio.gather(*(table.analyze() for table in tables))
+
+    Cancelling analyze() cancels its running queries, and `deadline` and
+    `statement_timeout` work as in SnowflakeTable.analyze(). Without a
+    `connection`, logging in waits for analyze() or plan_profile() and runs
+    in a thread. A missing table raises TableNotFoundError. Incremental
+    profiling (`watermark`) is not supported.
+    """
+
+    executor_class = AsyncQueryExecutor
+
+    def __init__(self, fq_table, connection_config, watermark=None, **kwargs):
+        if watermark is not None:
+            raise ValueError(
+                "AsyncSnowflakeTable does not support incremental profiles"
+            )
+        super().__init__(fq_table, connection_config, **kwargs)
+
+    def _connect(self):
+        # Logging in blocks, so without a connection it waits for _ensure_connected()
+        if self.connection is not None:
+            super()._connect()
+
+    async def _ensure_connected(self):
+        if self.cursor is None:
+            await asyncio.to_thread(super()._connect)
+
+    async def analyze(self):
+        self._start_deadline()
+        with query_context(table=self.fq_table):
+            await self._ensure_connected()
+            await self._analyze()
+
+    async def _analyze(self):
+        cache_key = await asyncio.to_thread(self._cache_key)
+        if await asyncio.to_thread(self._load_cached, cache_key):
+            return
+
+        try:
+            await self._profile()
+        except Exception as e:
+            if not await asyncio.to_thread(self._refresh_catalog, e):
+                raise
+            await self._profile()
+
+        await asyncio.to_thread(self._save_cached, cache_key)
+
+    async def _profile(self):
+        await asyncio.to_thread(self._load_columns)
+        if self.budget is not None:
+            await self.plan_profile()
+
+        await asyncio.to_thread(self._load_table_type)
+        all_columns = self._skip_planned_columns()
+        await self._add_profile()
+        await self._add_values()
+        self._add_skipped_columns(all_columns)
+
+    async def plan_profile(self):
+        if self.plan is not None:
+            return self.plan
+        with query_context(table=self.fq_table):
+            await self._ensure_connected()
+            return await asyncio.to_thread(super().plan_profile)
+
+    def _submit(self, query, params=None):
+        return asyncio.ensure_future(super()._submit(query, params))
+
+    async def _run_batches(self, count, compile, labels):
+        pending = {}
+
+        def submit(positions):
+            query, layout = compile(positions)
+            with query_context(**labels(positions)):
+                pending[self._submit(query)] = (positions, layout)
+
+        results = []
+        try:
+            for positions in self._column_groups(list(range(count))):
+                submit(positions)
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    self._finish_batch(*pending.pop(task), task.result, submit, results)
+            return sorted(results, key=lambda result: result[0][0])
+        finally:
+            # After a failure or cancellation, stop the other batches' queries too
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run_profile(self, columns, approx=False, sample=None, phase="profile"):
+        compile, labels = self._profile_batches(columns, approx, sample, phase)
+        return self._gather_counts(
+            columns, await self._run_batches(len(columns), compile, labels)
+        )
+
+    async def _add_profile(self):
+        with self._step("Profiling all columns..."):
+            columns = self._profile_columns()
+            total_rows = self._submit_row_count()
+            try:
+                counts = await self._run_profile(
+                    columns, approx=self.approx, sample=self.sample
+                )
+                if total_rows is not None:
+                    await asyncio.wait([total_rows])
+                self._set_row_counts(counts, total_rows and total_rows.result)
+            finally:
+                if total_rows is not None and not total_rows.done():
+                    total_rows.cancel()
+                    await asyncio.gather(total_rows, return_exceptions=True)
+
+        await self._set_profile(counts, self.approx, self.sample)
+
+    async def _set_profile(self, counts, approx, sample):
+        unique, estimates, escalations = self._estimate_profile(counts, approx, sample)
+        if self.escalate and escalations:
+            await self._escalate(escalations, counts, unique, estimates)
+        self._store_profile(counts, unique, estimates)
+
+    async def _escalate(self, escalations, counts, unique, estimates):
+        with self._step(f"Confirming {len(escalations)} estimated columns exactly..."):
+            positions, columns = self._escalation_columns(escalations)
+            exact = await self._run_profile(columns, phase="escalate")
+            self._apply_exact(escalations, positions, exact, counts, unique, estimates)
+
+    async def _add_values(self):
+        with self._step("Finding most frequent values..."):
+            columns = self._top_values_columns()
+            compile, labels = self._top_values_batches(columns)
+            self._set_top_values(
+                columns, await self._run_batches(len(columns), compile, labels)
+            )
@@ -0,0 +1,131 @@
+# Presentation name, attribute, nullable pandas dtype and Arrow type of each
+# statistic; None means not applicable or not profiled. VALUES holds every
+# value of a column when all are known, TOP_VALUES the most frequent values
+# with their counts.
+FIELDS = [
+    ("COLUMN_NAME", "names", "string", "string"),
+    ("DATA_TYPE", "data_types", "string", "string"),
+    ("ORDINAL_POSITION", "ordinal_positions", "Int64", "int64"),
+    ("NULLS", "nulls", "boolean", "bool"),
+    ("EMPTY_STRINGS", "empty_strings", "boolean", "bool"),
+    ("ZEROS", "zeros", "boolean", "bool"),
+    ("DIST", "distinct", "Int64", "int64"),
+    ("UNIQUE", "unique", "boolean", "bool"),
+    ("VALUES", "values", "object", "list<string>"),
+    ("TOP_VALUES", "top_values", "object", "list<value_count>"),
+    ("ESTIMATED", "estimated", "string", "string"),
+]
+
+
+class ColumnStats:
+    """Statistics of a table's columns, held as one list per statistic.
+
+    Lists are filled a whole statistic at a time from query results. A None
+    entry means the check does not apply to the column's type or the column
+    was not profiled. to_pandas() and to_arrow() build typed tables for
+    presentation and export.
+    """
+
+    __slots__ = [
+        "names",
+        "data_types",
+        "ordinal_positions",
+        "nulls",
+        "empty_strings",
+        "zeros",
+        "distinct",
+        "unique",
+        "values",
+        "top_values",
+        "estimated",
+    ]
+
+    def __init__(self, names, data_types, ordinal_positions=None):
+        self.names = list(names)
+        self.data_types = list(data_types)
+        self.ordinal_positions = list(
+            ordinal_positions or range(1, len(self.names) + 1)
+        )
+        empty = [None] * len(self.names)
+        self.nulls = list(empty)
+        self.empty_strings = list(empty)
+        self.zeros = list(empty)
+        self.distinct = list(empty)
+        self.unique = list(empty)
+        self.values = list(empty)
+        self.top_values = list(empty)
+        self.estimated = [""] * len(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def select(self, positions):
+        """A new ColumnStats holding only the columns at `positions`."""
+        selected = ColumnStats.__new__(ColumnStats)
+        for name in self.__slots__:
+            values = getattr(self, name)
+            setattr(selected, name, [values[position] for position in positions])
+        return selected
+
+    def update(self, positions, other):
+        """Copy every statistic of `other` into the columns at `positions`."""
+        for name in self.__slots__:
+            target = getattr(self, name)
+            for position, value in zip(positions, getattr(other, name)):
+                target[position] = value
+
+    def set_checks(self, counts):
+        """Set NULLS, EMPTY_STRINGS, ZEROS and DIST from per-column counts keyed on check."""
+        self.nulls = [None if count is None else count > 0 for count in counts["NULLS"]]
+        self.empty_strings = [
+            None if count is None else count > 0 for count in counts["EMPTY_STRINGS"]
+        ]
+        self.zeros = [None if count is None else count > 0 for count in counts["ZEROS"]]
+        self.distinct = [
+            None if count is None else int(count) for count in counts["DIST"]
+        ]
+
+    def add_estimate(self, position, label):
+        self.estimated[position] = "; ".join(
+            filter(None, [self.estimated[position], label])
+        )
+
+    def to_pandas(self):
+        import pandas as pd
+
+        return pd.DataFrame(
+            {name: getattr(self, attribute) for name, attribute, _, _ in FIELDS}
+        ).astype({name: dtype for name, _, dtype, _ in FIELDS})
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        columns = {name: getattr(self, attribute) for name, attribute, _, _ in FIELDS}
+        columns["TOP_VALUES"] = [
+            None if top is None else [dict(value=v, count=c) for v, c in top]
+            for top in self.top_values
+        ]
+        return pa.Table.from_pydict(columns, schema=pa.schema(arrow_fields()))
+
+
+def arrow_fields():
+    """Arrow fields of the statistics, in FIELDS order."""
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+        "list<string>": pa.list_(pa.string()),
+        "list<value_count>": pa.list_(
+            pa.struct([("value", pa.string()), ("count", pa.int64())])
+        ),
+    }
+    return [pa.field(name, types[arrow_type]) for name, _, _, arrow_type in FIELDS]
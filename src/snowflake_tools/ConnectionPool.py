@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import threading
+from functools import lru_cache
+from snowflake_tools.snowflake_config import get_cache_dir
+
+# Profile settings that identify a distinct authenticated session
+SESSION_KEYS = [
+    "account",
+    "user",
+    "role",
+    "warehouse",
+    "authenticator",
+    "private_key_path",
+    "backend",
+    "local_path",
+]
+
+
+@lru_cache(maxsize=None)
+def load_private_key(private_key_path):
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+
+    with open(os.path.expanduser(private_key_path), "rb") as key:
+        p_key = serialization.load_pem_private_key(
+            key.read(),
+            password=None,
+            backend=default_backend(),
+        )
+    return p_key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+
+
+class ConnectionPool:
+    """One authenticated Snowflake session per profile, shared by every tool in the process.
+
+    The connection is opened on first use. Workers call cursor() to get their
+    own cursor on it. With `cache_session = true` in the profile, the session
+    tokens are kept under the cache directory so the next invocation can skip
+    the login altogether. With `backend = "local"` the tools run against a
+    LocalConnection instead of a Snowflake account.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, connection_config):
+        self.connection_config = connection_config
+        self.cache_session = bool(connection_config.get("cache_session"))
+        self._connection = None
+        self._lock = threading.Lock()
+        # A QueryTrace recording every query issued on the connection, if set
+        self.trace = None
+
+    @classmethod
+    def session_key(cls, connection_config):
+        return tuple(connection_config.get(key) for key in SESSION_KEYS)
+
+    @classmethod
+    def get(cls, connection_config):
+        key = cls.session_key(connection_config)
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(connection_config)
+            return cls._pools[key]
+
+    @property
+    def connection(self):
+        with self._lock:
+            if self._connection is None or self._connection.is_closed():
+                self._connection = self._connect()
+            if self.trace is not None:
+                return self.trace.wrap(self._connection)
+            return self._connection
+
+    def cursor(self):
+        return self.connection.cursor()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect_arguments(self):
+        config = self.connection_config
+        arguments = {"user": config["user"], "account": config["account"]}
+        for key in ["role", "warehouse", "authenticator"]:
+            if config.get(key):
+                arguments[key] = config[key]
+        if config.get("private_key_path"):
+            arguments["private_key"] = load_private_key(config["private_key_path"])
+        elif config.get("password"):
+            arguments["password"] = config["password"]
+        if self.cache_session:
+            # Closing the connection must not log the cached session out
+            arguments["server_session_keep_alive"] = True
+        return arguments
+
+    def _session_file(self):
+        key = hashlib.sha256(
+            repr(self.session_key(self.connection_config)).encode()
+        ).hexdigest()[:16]
+        return os.path.join(get_cache_dir("sessions"), f"{key}.json")
+
+    def _connect(self):
+        if self.connection_config.get("backend") == "local":
+            from snowflake_tools.LocalConnection import LocalConnection
+
+            return LocalConnection(
+                self.connection_config.get("local_path", ":memory:"),
+                latency=float(self.connection_config.get("latency", 0)),
+            )
+
+        import snowflake.connector
+
+        if not self.cache_session:
+            return snowflake.connector.connect(**self._connect_arguments())
+
+        session_file = self._session_file()
+        if os.path.exists(session_file):
+            with open(session_file, "r") as file:
+                tokens = json.load(file)
+            try:
+                return snowflake.connector.connect(
+                    user=self.connection_config["user"],
+                    account=self.connection_config["account"],
+                    session_token=tokens["session_token"],
+                    master_token=tokens["master_token"],
+                    server_session_keep_alive=True,
+                )
+            except snowflake.connector.errors.Error:
+                os.remove(session_file)
+
+        connection = snowflake.connector.connect(**self._connect_arguments())
+        descriptor = os.open(session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(
+                {
+                    "session_token": connection.rest.token,
+                    "master_token": connection.rest.master_token,
+                },
+                file,
+            )
+        return connection
@@ -0,0 +1,308 @@
+import io
+import os
+import re
+from collections import namedtuple
+from snowflake_tools import Timer
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.QueryTrace import query_context
+
+IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+
+CREATE_STATEMENT = re.compile(
+    r"create\s+(?:or\s+replace\s+)?"
+    r"(?:(?:secure|transient|temporary|volatile|recursive)\s+)*"
+    r"((?:materialized|external|dynamic|event|hybrid|iceberg)\s+)?"
+    r"(database|schema|table|view|sequence|file\s+format|pipe|stream|task|alert|tag"
+    r"|function|procedure|masking\s+policy|row\s+access\s+policy)\s+"
+    rf"(?:if\s+not\s+exists\s+)?({IDENTIFIER}(?:\.{IDENTIFIER}){{0,2}})",
+    re.IGNORECASE,
+)
+
+# Objects GET_DDL('DATABASE', ...) may leave out, listed so they can be fetched one by one
+INVENTORY_QUERIES = {
+    "TABLES": """select table_schema, table_name, table_type, null
+        from {database}.INFORMATION_SCHEMA.TABLES
+        where table_schema <> 'INFORMATION_SCHEMA' and table_type not like '%TEMPORARY%'""",
+    "SEQUENCES": """select sequence_schema, sequence_name, 'SEQUENCE', null
+        from {database}.INFORMATION_SCHEMA.SEQUENCES""",
+    "FILE_FORMATS": """select file_format_schema, file_format_name, 'FILE FORMAT', null
+        from {database}.INFORMATION_SCHEMA.FILE_FORMATS""",
+    "PIPES": """select pipe_schema, pipe_name, 'PIPE', null
+        from {database}.INFORMATION_SCHEMA.PIPES""",
+    "FUNCTIONS": """select function_schema, function_name, 'FUNCTION', argument_signature
+        from {database}.INFORMATION_SCHEMA.FUNCTIONS""",
+    "PROCEDURES": """select procedure_schema, procedure_name, 'PROCEDURE', argument_signature
+        from {database}.INFORMATION_SCHEMA.PROCEDURES""",
+}
+
+# INFORMATION_SCHEMA.TABLES table types as CREATE statement object types
+TABLE_TYPES = {"BASE TABLE": "TABLE"}
+
+
+def unquote(identifier):
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.upper()
+
+
+def split_identifier(name):
+    return [unquote(part) for part in re.findall(IDENTIFIER, name)]
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def argument_types(arguments):
+    """Argument types of a signature like `(X NUMBER, Y VARCHAR)`, as `(NUMBER, VARCHAR)`."""
+    arguments = arguments.strip()
+    if arguments.startswith("("):
+        arguments = arguments[1:]
+    if arguments.endswith(")"):
+        arguments = arguments[:-1]
+    types = []
+    depth = 0
+    argument = ""
+    for character in arguments + ",":
+        if character == "," and depth == 0:
+            parts = argument.split(None, 1)
+            if len(parts) == 2:
+                data_type = " ".join(parts[1].upper().split()).split(" DEFAULT ")[0]
+                # Signatures in INFORMATION_SCHEMA leave out precision and length
+                types.append(re.sub(r"\(.*\)", "", data_type).strip())
+            argument = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(character, 0)
+        argument += character
+    return f"({', '.join(types)})"
+
+
+def statement_arguments(statement, start):
+    """The parenthesised argument list of a FUNCTION or PROCEDURE statement, from `start`."""
+    begin = statement.find("(", start)
+    if begin == -1:
+        return "()"
+    depth = 0
+    for position in range(begin, len(statement)):
+        depth += {"(": 1, ")": -1}.get(statement[position], 0)
+        if depth == 0:
+            return statement[begin : position + 1]
+    return "()"
+
+
+# One exported object; `arguments` holds the argument types of functions and procedures
+ObjectKey = namedtuple(
+    "ObjectKey", ["object_type", "schema", "name", "arguments"], defaults=[None]
+)
+
+
+def split_ddl(lines, schema=None):
+    """Yield (ObjectKey, statement) for each object in a GET_DDL script.
+
+    The script is read line by line. An object starts at a line beginning with
+    CREATE [OR REPLACE] outside of any string or $$ body, and runs until the
+    next one, so trailing ALTER statements stay with the object they belong
+    to. Objects named without a schema, as views and procedures keep the
+    text they were created with, belong to the last CREATE SCHEMA before
+    them, or to `schema`.
+    """
+    key = None
+    statement = []
+    in_string = False
+    in_body = False
+    for line in lines:
+        match = None
+        if not in_string and not in_body:
+            match = CREATE_STATEMENT.match(line.lstrip())
+        if match is not None:
+            if key is not None:
+                yield key, "".join(statement)
+            key = _statement_key(match, line.lstrip(), schema)
+            if key.object_type == "SCHEMA":
+                schema = key.schema
+            statement = []
+        statement.append(line)
+        in_string, in_body = _scan_quotes(line, in_string, in_body)
+    if key is not None:
+        yield key, "".join(statement)
+
+
+def _statement_key(match, statement, schema=None):
+    modifier, object_type, name = match.groups()
+    object_type = " ".join(((modifier or "") + object_type).upper().split())
+    parts = split_identifier(name)
+    arguments = None
+    if object_type in ("FUNCTION", "PROCEDURE"):
+        arguments = argument_types(statement_arguments(statement, match.end()))
+    if object_type == "DATABASE":
+        return ObjectKey(object_type, None, parts[-1])
+    if object_type == "SCHEMA":
+        return ObjectKey(object_type, parts[-1], parts[-1])
+    if len(parts) > 1:
+        schema = parts[-2]
+    if schema is None:
+        raise ValueError(f"No schema for {object_type} {name}")
+    return ObjectKey(object_type, schema, parts[-1], arguments)
+
+
+def _scan_quotes(line, in_string, in_body):
+    position = 0
+    while position < len(line):
+        if in_body:
+            end = line.find("$$", position)
+            if end == -1:
+                break
+            in_body = False
+            position = end + 2
+        elif in_string:
+            character = line[position]
+            if character == "\\":
+                position += 2
+                continue
+            if character == "'":
+                if line[position + 1 : position + 2] == "'":
+                    position += 2
+                    continue
+                in_string = False
+            position += 1
+        else:
+            if line.startswith("$$", position):
+                in_body = True
+                position += 2
+            elif line.startswith("--", position):
+                break
+            else:
+                if line[position] == "'":
+                    in_string = True
+                position += 1
+    return in_string, in_body
+
+
+class DdlExport:
+    """Writes the DDL of a whole database or schema as one file per object.
+
+    One GET_DDL('DATABASE'|'SCHEMA', ...) call returns the script for nearly
+    everything; it is split into per-object files as it is read. Objects the
+    script leaves out are found by listing INFORMATION_SCHEMA and fetched with
+    per-object GET_DDL calls, `max_in_flight` at a time.
+    """
+
+    def __init__(
+        self,
+        connection_config,
+        output_dir,
+        max_in_flight=8,
+        connection=None,
+        executor=None,
+        debug=False,
+    ):
+        self.connection_config = connection_config
+        self.output_dir = output_dir
+
+        if connection is None:
+            connection = ConnectionPool.get(connection_config).connection
+        self.connection = connection
+
+        self.cursor = self.connection.cursor()
+        self.executor = executor or QueryExecutor(self.connection, max_in_flight)
+        self.debug = debug
+
+    def path(self, database, key):
+        if key.object_type == "DATABASE":
+            return os.path.join(self.output_dir, database, "database.sql")
+        if key.object_type == "SCHEMA":
+            return os.path.join(self.output_dir, database, key.schema, "schema.sql")
+        file_name = key.name + (key.arguments or "").replace(", ", ",")
+        file_name = re.sub(r"[^\w$.,()-]", "_", file_name)
+        return os.path.join(
+            self.output_dir,
+            database,
+            key.schema,
+            key.object_type.lower().replace(" ", "_") + "s",
+            f"{file_name}.sql",
+        )
+
+    def _write(self, database, key, statement):
+        path = self.path(database, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(statement.strip() + "\n")
+
+    def export(self, name):
+        """Export a DATABASE or DATABASE.SCHEMA; returns (written, fallback, failed)."""
+        parts = split_identifier(name)
+        database = parts[0]
+        schema = parts[1] if len(parts) > 1 else None
+
+        if self.debug == True:
+            print(f"Fetching DDL for {name}...", end="", flush=True)
+        with Timer(output=self.debug):
+            with query_context(phase="inventory", table=name):
+                inventory = self.executor.submit(
+                    *self._inventory_query(database, schema)
+                )
+            object_type = "SCHEMA" if schema is not None else "DATABASE"
+            fq_name = ".".join(quote(part) for part in parts)
+            with query_context(phase="ddl", table=name):
+                self.cursor.execute(
+                    f"select get_ddl('{object_type}', %s, true)", (fq_name,)
+                )
+            script = self.cursor.fetchone()[0]
+
+        exported = set()
+        for key, statement in split_ddl(io.StringIO(script), schema):
+            self._write(database, key, statement)
+            exported.add(key)
+
+        missing = []
+        for object_schema, object_name, object_type, signature in inventory.result():
+            key = ObjectKey(
+                TABLE_TYPES.get(object_type, object_type),
+                object_schema,
+                object_name,
+                argument_types(signature) if signature is not None else None,
+            )
+            if key not in exported:
+                missing.append(key)
+
+        if self.debug == True and missing:
+            print(
+                f"Fetching DDL for {len(missing)} objects individually...",
+                end="",
+                flush=True,
+            )
+        failed = []
+        with Timer(output=self.debug and bool(missing)):
+            with query_context(phase="ddl_object", table=name):
+                futures = [
+                    (key, self.executor.submit(*self._object_ddl_query(database, key)))
+                    for key in missing
+                ]
+            for key, future in futures:
+                try:
+                    self._write(database, key, future.result()[0][0])
+                except Exception as e:
+                    failed.append((key, e))
+
+        return len(exported), len(missing) - len(failed), failed
+
+    def _inventory_query(self, database, schema):
+        queries = [
+            query.format(database=quote(database))
+            for query in INVENTORY_QUERIES.values()
+        ]
+        query = "\nunion all\n".join(queries)
+        if schema is None:
+            return query, None
+        return f"select * from ({query}) where $1 = %s", (schema,)
+
+    @staticmethod
+    def _object_ddl_query(database, key):
+        fq_name = ".".join(quote(part) for part in [database, key.schema, key.name])
+        if key.arguments is not None:
+            fq_name += key.arguments
+        object_type = key.object_type.replace(" ", "_")
+        if object_type == "MATERIALIZED_VIEW":
+            object_type = "VIEW"
+        return f"select get_ddl('{object_type}', %s, true)", (fq_name,)
@@ -0,0 +1,38 @@
+import os
+import json
+import tempfile
+from snowflake_tools.snowflake_config import get_cache_dir
+
+
+class IncrementalStore:
+    """Profile state of append-only tables, carried from one incremental run to the next.
+
+    Each table's state is a JSON document holding the watermark reached, the
+    running row and check counts, the exported HLL sketch of every column
+    and, for low-cardinality columns, their values.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or get_cache_dir("incremental")
+
+    def _path(self, fq_table):
+        return os.path.join(self.directory, f"{fq_table}.json")
+
+    def load(self, fq_table):
+        try:
+            with open(self._path(fq_table), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, fq_table, state):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(state, file)
+        os.replace(temporary_path, self._path(fq_table))
+
+    def reset(self, fq_table):
+        try:
+            os.remove(self._path(fq_table))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,184 @@
+import heapq
+import math
+from snowflake_tools import Timer
+from snowflake_tools.QueryTrace import query_context
+from snowflake_tools.profile_sql import (
+    HLL_RELATIVE_ERROR,
+    NO_TOP_VALUES_TYPES,
+    compile_key_query,
+)
+
+# APPROX_COUNT_DISTINCT estimates are treated as at most this far from the true count
+KEY_TOLERANCE = 3 * HLL_RELATIVE_ERROR
+
+
+class KeyFinder:
+    """Finds the smallest combinations of columns that identify every row of a profiled SnowflakeTable.
+
+    Trying every combination takes a count(distinct) each, and a wide table
+    has millions of them. Instead combinations are searched by size, from
+    two columns up to `max_columns`, stopping at the first size with keys:
+
+    A column that is unique on its own, has nulls or holds a single value is
+    never part of a smallest composite key, so those are left out. A
+    combination has at most as many distinct values as the product of its
+    columns' DIST, or of the distinct count of a smaller combination times
+    the other column's DIST, so combinations bounded under the row count are
+    not keys and need no query. Columns that together pin rows down, like an
+    order number and a line number, have a bound close to the row count, so
+    the `max_candidates` combinations with the lowest bounds that reach it
+    are counted with APPROX_COUNT_DISTINCT, many to a query. Only the ones
+    estimated near the row count are counted exactly. Of the combinations
+    that are not keys, the `max_candidates` with the highest counts or
+    bounds are extended to the next size.
+
+    A sampled profile's DIST is only a lower bound, so then bounds only rank
+    combinations. Keys timed out on are not reported, and `incomplete` is
+    set.
+    """
+
+    def __init__(self, table, max_columns=3, max_candidates=200):
+        if max_columns < 2:
+            raise ValueError("max_columns must be at least 2")
+        self.table = table
+        self.max_columns = max_columns
+        self.max_candidates = max_candidates
+        self.incomplete = False
+
+    def _columns(self):
+        """Positions of the columns a smallest composite key can be made of."""
+        stats = self.table.stats
+        return [
+            position
+            for position in range(len(stats))
+            if stats.distinct[position] is not None
+            and stats.distinct[position] > 1
+            and not stats.nulls[position]
+            and stats.unique[position] is not True
+            and stats.data_types[position] not in NO_TOP_VALUES_TYPES
+        ]
+
+    def _column_bound(self, position):
+        distinct = self.table.stats.distinct[position]
+        if self.table.approx:
+            return distinct * (1 + KEY_TOLERANCE)
+        return distinct
+
+    def find(self):
+        """The keys of the smallest size found, as tuples of COLUMN_NAME in column order."""
+        rows = self.table.total_rows
+        if rows is None:
+            raise ValueError(f"The row count of {self.table.fq_table} is unknown")
+        if rows < 2:
+            return []
+
+        positions = self._columns()
+        column_bounds = {
+            position: self._column_bound(position) for position in positions
+        }
+        bounds = {(position,): bound for position, bound in column_bounds.items()}
+        with query_context(table=self.table.fq_table):
+            for size in range(2, self.max_columns + 1):
+                combinations = self._combinations(bounds, column_bounds)
+                if not combinations:
+                    break
+                candidates = heapq.nsmallest(
+                    self.max_candidates,
+                    (
+                        candidate
+                        for candidate, bound in combinations.items()
+                        if bound >= rows or self.table.sample is not None
+                    ),
+                    key=lambda candidate: (
+                        abs(math.log(combinations[candidate] / rows)),
+                        candidate,
+                    ),
+                )
+                keys = self._check(candidates, combinations, rows, size)
+                if keys:
+                    return [
+                        tuple(self.table.stats.names[position] for position in key)
+                        for key in sorted(keys)
+                    ]
+                bounds = dict(
+                    heapq.nlargest(
+                        self.max_candidates,
+                        combinations.items(),
+                        key=lambda item: (item[1], item[0]),
+                    )
+                )
+        return []
+
+    def _check(self, candidates, combinations, rows, size):
+        """The `candidates` that are keys; the counts of the others tighten their bounds in `combinations`."""
+        if not candidates:
+            return []
+        if self.table.debug == True:
+            print(
+                f"Looking for keys among {len(candidates)} combinations of {size} columns...",
+                end="",
+                flush=True,
+            )
+        with Timer(output=self.table.debug):
+            estimates = self._count(candidates, approx=True)
+            survivors = [
+                candidate
+                for candidate in candidates
+                if estimates.get(candidate, rows) >= rows * (1 - KEY_TOLERANCE)
+            ]
+            exact = self._count(survivors)
+        keys = [candidate for candidate in survivors if exact.get(candidate) == rows]
+        for candidate in candidates:
+            if candidate in exact:
+                combinations[candidate] = exact[candidate]
+            elif candidate in estimates:
+                combinations[candidate] = min(
+                    combinations[candidate],
+                    estimates[candidate] * (1 + KEY_TOLERANCE),
+                )
+        return keys
+
+    def _combinations(self, bounds, column_bounds):
+        """Every combination one column larger than those in `bounds`, with its bound."""
+        combinations = {}
+        for combination, bound in bounds.items():
+            for position, column_bound in column_bounds.items():
+                if position in combination:
+                    continue
+                candidate = tuple(sorted(combination + (position,)))
+                combinations[candidate] = min(
+                    combinations.get(candidate, math.inf), bound * column_bound
+                )
+        return combinations
+
+    def _count(self, candidates, approx=False):
+        """Distinct counts of the `candidates` found, batched into concurrent queries."""
+        candidates = list(candidates)
+        names = [
+            tuple(self.table.stats.names[position] for position in candidate)
+            for candidate in candidates
+        ]
+
+        def compile(indexes):
+            query = compile_key_query(
+                self.table.fq_table, [names[index] for index in indexes], approx
+            )
+            return query, None
+
+        def labels(indexes):
+            return dict(
+                phase="keys_approx" if approx else "keys",
+                columns=sorted(
+                    {column_name for index in indexes for column_name in names[index]}
+                ),
+            )
+
+        counts = {}
+        for indexes, _, row in self.table._run_batches(
+            len(candidates), compile, labels
+        ):
+            for index, count in zip(indexes, row):
+                counts[candidates[index]] = int(count)
+        if len(counts) < len(candidates):
+            self.incomplete = True
+        return counts
@@ -0,0 +1,583 @@
+import re
+import json
+import hashlib
+import time
+import collections
+import sqlite3
+import datetime
+import itertools
+import threading
+from snowflake_tools.MetadataCatalog import COLUMN_FIELDS, TABLE_FIELDS, VIEW_FIELDS
+
+PRIVILEGE_FIELDS = [
+    "GRANTEE",
+    "OBJECT_CATALOG",
+    "OBJECT_SCHEMA",
+    "OBJECT_NAME",
+    "OBJECT_TYPE",
+    "PRIVILEGE_TYPE",
+]
+
+FUTURE_GRANT_FIELDS = [
+    "created_on",
+    "privilege",
+    "grant_on",
+    "name",
+    "grant_to",
+    "grantee_name",
+]
+
+STRING = r"'(?:[^']|'')*'"
+IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][\w$]*)'
+THREE_PART_NAME = re.compile(rf"{IDENTIFIER}\.{IDENTIFIER}\.{IDENTIFIER}")
+
+CANCEL_QUERY = re.compile(r"select system\$cancel_query\(('[^']*'|%s)\)", re.IGNORECASE)
+
+# SQLite column affinities of Snowflake data types
+AFFINITIES = {"NUMBER": "numeric", "FLOAT": "real", "TEXT": "text"}
+
+
+class ApproxTopK:
+    """APPROX_TOP_K, computed exactly."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.k = 1
+
+    def step(self, value, k, counters):
+        self.k = k
+        if value is not None:
+            self.counts[value] += 1
+
+    def finalize(self):
+        return json.dumps(
+            [[value, count] for value, count in self.counts.most_common(self.k)]
+        )
+
+
+def hash_values(*values):
+    """HASH, in 56 bits so sums and differences of hashes stay in SQLite integers."""
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=7).digest()
+    return int.from_bytes(digest) - 2**55
+
+
+class HashAgg:
+    """HASH_AGG: a signed 64-bit hash of the rows' values that ignores row order."""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values):
+        self.total = (self.total + hash_values(*values)) % 2**64
+
+    def finalize(self):
+        return self.total - 2**64 if self.total >= 2**63 else self.total
+
+
+class ArrayAgg:
+    """ARRAY_AGG, leaving out nulls, as a JSON array."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return json.dumps(self.values)
+
+
+class HllAccumulate:
+    """HLL_ACCUMULATE, computed exactly: the sketch is the JSON array of the distinct values."""
+
+    def __init__(self):
+        self.values = set()
+
+    def step(self, value):
+        if value is not None:
+            self.values.add(json.dumps(value))
+
+    def finalize(self):
+        return json.dumps(sorted(self.values))
+
+
+class HllCombine(HllAccumulate):
+    """HLL_COMBINE of sketches made by HllAccumulate."""
+
+    def step(self, sketch):
+        if sketch is not None:
+            self.values.update(json.loads(sketch))
+
+
+def hll_estimate(sketch):
+    return None if sketch is None else len(json.loads(sketch))
+
+
+def to_varchar(value, format=None):
+    return None if value is None else str(value)
+
+
+def to_timestamp(value, format=None):
+    return value
+
+
+def rewrite_calls(statement, function, template):
+    """Replace each `function(arguments)` call with `template.format(arguments)`."""
+    pattern = re.compile(rf"\b{function}\(", re.IGNORECASE)
+    while (match := pattern.search(statement)) is not None:
+        depth = 1
+        position = match.end()
+        while depth > 0:
+            string = re.compile(STRING).match(statement, position)
+            if string is not None:
+                position = string.end()
+                continue
+            depth += {"(": 1, ")": -1}.get(statement[position], 0)
+            position += 1
+        arguments = statement[match.end() : position - 1]
+        statement = (
+            statement[: match.start()]
+            + template.format(arguments)
+            + statement[position:]
+        )
+    return statement
+
+
+def unquote(identifier):
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.upper()
+
+
+def local_name(name):
+    """The SQLite table holding a Snowflake DATABASE.SCHEMA.NAME object."""
+    return '"' + ".".join(unquote(part) for part in re.findall(IDENTIFIER, name)) + '"'
+
+
+class LocalCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.sfqid = None
+        self.rowcount = None
+        self.description = None
+        self._rows = []
+        self._position = 0
+
+    def execute(self, command, params=None, timeout=None):
+        self.sfqid, self.description, self._rows = self.connection._execute(
+            command, params, timeout=timeout
+        )
+        self.rowcount = len(self._rows)
+        self._position = 0
+        return self
+
+    def execute_async(self, command, params=None):
+        self.sfqid = self.connection._execute_async(command, params)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        self.sfqid = sfqid
+        _, self.description, self._rows = self.connection._async_result(sfqid)
+        self.rowcount = len(self._rows)
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchall(self):
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def fetch_pandas_all(self):
+        import pandas as pd
+
+        return pd.DataFrame(
+            self.fetchall(), columns=[column[0] for column in self.description or []]
+        )
+
+    def fetch_arrow_batches(self, batch_size=10000):
+        import pyarrow as pa
+
+        names = [column[0] for column in self.description or []]
+        rows = self.fetchall()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            yield pa.table(
+                {name: list(values) for name, values in zip(names, zip(*batch))}
+            )
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class LocalConnection:
+    """Local stand-in for a Snowflake connection, backed by an in-memory SQLite database.
+
+    It understands the SQL the tools issue: three-part names, the
+    INFORMATION_SCHEMA views they read, COUNT_IF, APPROX_COUNT_DISTINCT and
+    COUNT(DISTINCT) of several columns, APPROX_TOP_K and the HLL_* sketch
+    functions (computed exactly), HASH and HASH_AGG, SAMPLE clauses, SHOW
+    FUTURE GRANTS and SHOW TERSE DATABASES with RESULT_SCAN, and
+    asynchronous queries with SYSTEM$CANCEL_QUERY. Each query sleeps for
+    `latency` seconds first, outside the lock, so concurrent queries overlap
+    the way warehouse round trips do, and `round_trips` counts them; a
+    cancelled query stops sleeping and fails. Unknown columns fail as
+    invalid identifiers. A query with a `timeout`
+    shorter than that fails the way a connector timeout does.
+    SQLite returns at most 2000 columns, so batches of wide tables past that
+    are re-split. Select it with `backend = "local"` in a profile, or pass it as
+    `connection=` to Snowflake or SnowflakeTable.
+    """
+
+    def __init__(self, path=":memory:", latency=0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._query_ids = itertools.count(1)
+        self._async_queries = {}
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self._db.create_aggregate("approx_top_k", 3, ApproxTopK)
+        self._db.create_aggregate("hash_agg", -1, HashAgg)
+        self._db.create_function("hash", -1, hash_values, deterministic=True)
+        self._db.create_function("to_varchar", -1, to_varchar, deterministic=True)
+        self._db.create_aggregate("array_agg", 1, ArrayAgg)
+        self._db.create_aggregate("hll_accumulate", 1, HllAccumulate)
+        self._db.create_aggregate("hll_combine", 1, HllCombine)
+        self._db.create_function("hll_estimate", 1, hll_estimate, deterministic=True)
+        for function in ["to_timestamp_ntz", "to_timestamp_ltz", "to_timestamp_tz"]:
+            self._db.create_function(function, 2, to_timestamp, deterministic=True)
+
+        table_fields = [
+            f"{field} timestamp" if field == "LAST_ALTERED" else field
+            for field in TABLE_FIELDS + ["CLUSTERING_KEY"]
+        ]
+        view_fields = [
+            f"{field} timestamp" if field == "LAST_ALTERED" else field
+            for field in VIEW_FIELDS
+        ]
+        with self._db:
+            self._db.execute(
+                f"create table if not exists _tables ({', '.join(table_fields)})"
+            )
+            self._db.execute(
+                f"create table if not exists _columns ({', '.join(COLUMN_FIELDS)})"
+            )
+            self._db.execute(
+                f"create table if not exists _views ({', '.join(view_fields)})"
+            )
+            self._db.execute(
+                f"create table if not exists _object_privileges ({', '.join(PRIVILEGE_FIELDS)})"
+            )
+            self._db.execute(
+                f"create table if not exists _future_grants (database_name, {', '.join(FUTURE_GRANT_FIELDS)})"
+            )
+            self._db.execute(
+                "create table if not exists _databases (created_on timestamp, name)"
+            )
+
+    def cursor(self):
+        return LocalCursor(self)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+    def create_database(self, database):
+        database = database.upper()
+        with self._lock, self._db:
+            if self._db.execute(
+                "select 1 from _databases where name = ?", (database,)
+            ).fetchone():
+                return
+            self._db.execute(
+                "insert into _databases values (?, ?)",
+                (datetime.datetime.now(), database),
+            )
+            for view, table, catalog_field in [
+                ("TABLES", "_tables", "TABLE_CATALOG"),
+                ("COLUMNS", "_columns", "TABLE_CATALOG"),
+                ("VIEWS", "_views", "TABLE_CATALOG"),
+                ("OBJECT_PRIVILEGES", "_object_privileges", "OBJECT_CATALOG"),
+            ]:
+                order = " order by ORDINAL_POSITION" if view == "COLUMNS" else ""
+                self._db.execute(
+                    f"""create view "{database}.INFORMATION_SCHEMA.{view}" as
+                    select * from {table} where {catalog_field} = '{database}'{order}"""
+                )
+
+    def create_table(self, fq_table, columns, rows=()):
+        """Create a table from (COLUMN_NAME, DATA_TYPE) pairs and load `rows` into it."""
+        database, schema, table = fq_table.upper().split(".")
+        self.create_database(database)
+        definitions = ", ".join(
+            f'"{name}" {AFFINITIES.get(data_type, "")}' for name, data_type in columns
+        )
+        with self._lock, self._db:
+            self._db.execute(f"drop table if exists {local_name(fq_table)}")
+            self._db.execute(f"create table {local_name(fq_table)} ({definitions})")
+            placeholders = ", ".join("?" * len(columns))
+            rows = list(rows)
+            self._db.executemany(
+                f"insert into {local_name(fq_table)} values ({placeholders})", rows
+            )
+            size = sum(len(str(value)) for row in rows for value in row)
+            row_count = self._db.execute(
+                f"select count(*) from {local_name(fq_table)}"
+            ).fetchone()[0]
+            for table_name in ["_tables", "_columns"]:
+                self._db.execute(
+                    f"delete from {table_name} where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?",
+                    (database, schema, table),
+                )
+            self._db.execute(
+                f"insert into _tables ({', '.join(TABLE_FIELDS)}) values (?, ?, ?, 'BASE TABLE', ?, ?, ?)",
+                (database, schema, table, datetime.datetime.now(), row_count, size),
+            )
+            self._db.executemany(
+                f"insert into _columns (TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, DATA_TYPE, IS_NULLABLE) values (?, ?, ?, ?, ?, ?, 'YES')",
+                [
+                    (database, schema, table, name, position, data_type)
+                    for position, (name, data_type) in enumerate(columns, start=1)
+                ],
+            )
+
+    def insert(self, fq_table, rows):
+        """Append `rows` to a table made by create_table(), updating its INFORMATION_SCHEMA.TABLES row."""
+        database, schema, table = fq_table.upper().split(".")
+        rows = list(rows)
+        with self._lock, self._db:
+            if rows:
+                self._db.executemany(
+                    f"insert into {local_name(fq_table)} values ({', '.join('?' * len(rows[0]))})",
+                    rows,
+                )
+            self._db.execute(
+                f"""update _tables set LAST_ALTERED = ?, ROW_COUNT = (select count(*) from {local_name(fq_table)}),
+                BYTES = BYTES + ? where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?""",
+                (
+                    datetime.datetime.now(),
+                    sum(len(str(value)) for row in rows for value in row),
+                    database,
+                    schema,
+                    table,
+                ),
+            )
+
+    def grant(self, database, grantee, privilege):
+        database = database.upper()
+        self.create_database(database)
+        with self._lock, self._db:
+            self._db.execute(
+                "insert into _object_privileges values (?, ?, null, ?, 'DATABASE', ?)",
+                (grantee.upper(), database, database, privilege.upper()),
+            )
+
+    def grant_future(self, database, grantee, privilege, grant_on):
+        database = database.upper()
+        self.create_database(database)
+        with self._lock, self._db:
+            self._db.execute(
+                "insert into _future_grants values (?, ?, ?, ?, ?, 'ROLE', ?)",
+                (
+                    database,
+                    datetime.datetime.now(),
+                    privilege.upper(),
+                    grant_on.upper(),
+                    f"{database}.<{grant_on.upper()}>",
+                    grantee.upper(),
+                ),
+            )
+
+    def _execute(
+        self, statement, params=None, query_id=None, cancelled=None, timeout=None
+    ):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection is closed")
+        cancel = CANCEL_QUERY.fullmatch(statement.strip())
+        if cancel is not None:
+            query_id = cancel.group(1) if cancel.group(1) != "%s" else params[0]
+            return self._cancel(query_id.strip("'"))
+        cancelled = cancelled or threading.Event()
+        if cancelled.wait(min(self.latency, timeout or self.latency)):
+            raise sqlite3.OperationalError("SQL execution canceled")
+        if timeout and timeout < self.latency:
+            raise sqlite3.OperationalError(
+                "SQL execution was cancelled by the client due to a timeout"
+            )
+        with self._lock:
+            self.round_trips += 1
+            query_id = query_id or f"local-{next(self._query_ids)}"
+            query, params = self._translate(statement, params)
+            try:
+                cursor = self._db.execute(query, params)
+            except sqlite3.OperationalError as e:
+                # As Snowflake reports columns that don't exist
+                column = re.match(r"no such column: (.*)", str(e))
+                if column is None:
+                    raise
+                raise sqlite3.OperationalError(
+                    f"invalid identifier '{column.group(1).upper()}'"
+                ) from e
+            rows = cursor.fetchall()
+            description = cursor.description
+            if statement.lstrip().lower().startswith("show "):
+                # Kept for RESULT_SCAN, like Snowflake keeps query results
+                fields = ", ".join(f'"{column[0]}"' for column in description)
+                self._db.execute(
+                    f'create temp table "result_scan.{query_id}" ({fields})'
+                )
+                self._db.executemany(
+                    f'insert into "result_scan.{query_id}" values ({", ".join("?" * len(description))})',
+                    rows,
+                )
+        return query_id, description, rows
+
+    def _execute_async(self, statement, params=None):
+        """Start a statement on a background thread, like EXECUTE_ASYNC, and return its query id."""
+        query_id = f"local-{next(self._query_ids)}"
+        query = {"status": "RUNNING", "result": None, "error": None}
+        query["cancelled"] = threading.Event()
+        self._async_queries[query_id] = query
+
+        def run():
+            try:
+                query["result"] = self._execute(
+                    statement, params, query_id, query["cancelled"]
+                )
+                query["status"] = "SUCCESS"
+            except Exception as e:
+                query["error"] = e
+                query["status"] = (
+                    "ABORTED" if query["cancelled"].is_set() else "FAILED_WITH_ERROR"
+                )
+
+        threading.Thread(target=run, daemon=True).start()
+        return query_id
+
+    def _async_result(self, query_id):
+        query = self._async_queries[query_id]
+        if query["error"] is not None:
+            raise query["error"]
+        return query["result"]
+
+    def _cancel(self, query_id):
+        if query_id in self._async_queries:
+            self._async_queries[query_id]["cancelled"].set()
+        return (
+            None,
+            [("SYSTEM$CANCEL_QUERY",)],
+            [("Identified SQL statement is being canceled.",)],
+        )
+
+    def get_query_status_throw_if_error(self, query_id):
+        query = self._async_queries[query_id]
+        if query["error"] is not None:
+            raise query["error"]
+        return query["status"]
+
+    @staticmethod
+    def is_still_running(status):
+        return status == "RUNNING"
+
+    def _translate(self, statement, params):
+        """Rewrite a Snowflake statement and its pyformat parameters for SQLite."""
+        params = list(params or [])
+        show = statement.strip().rstrip(";").lower().split()
+        if show[:3] == ["show", "terse", "databases"]:
+            return (
+                "select created_on, name, 'STANDARD' as kind, null as database_name, null as schema_name from _databases order by name",
+                [],
+            )
+        if show[:5] == ["show", "future", "grants", "in", "database"]:
+            return (
+                f"select {', '.join(FUTURE_GRANT_FIELDS)} from _future_grants where database_name = ?",
+                [unquote(statement.strip().rstrip(";").split()[-1])],
+            )
+
+        # Native aggregates, since SQLite calls Python aggregates once per row
+        statement = rewrite_calls(
+            statement, "count_if", "count(case when {} then 1 end)"
+        )
+        statement = rewrite_calls(
+            statement, "approx_count_distinct", "count(distinct {})"
+        )
+        # Sketches and objects are JSON text; json() marks them so json_object nests them
+        statement = rewrite_calls(statement, "hll_export", "json({})")
+        statement = rewrite_calls(statement, "hll_import", "({})")
+        statement = rewrite_calls(statement, "parse_json", "json({})")
+        statement = rewrite_calls(statement, "object_construct", "json_object({})")
+        statement = rewrite_calls(statement, "iff", "iif({})")
+        statement = re.sub(
+            rf"({IDENTIFIER}|\w+\([^()]*\))::varchar",
+            r"cast(\1 as text)",
+            statement,
+            flags=re.IGNORECASE,
+        )
+        statement = re.sub(
+            r"from values ((?:\(%s\)(?:, )?)+)",
+            r"from (values \1)",
+            statement,
+            flags=re.IGNORECASE,
+        )
+        # SQLite counts distinct values of one expression only
+        statement = re.sub(
+            r"count\(distinct ([^()]*,[^()]*)\)",
+            r"count(distinct json_array(\1))",
+            statement,
+            flags=re.IGNORECASE,
+        )
+        parts = re.split(f"({STRING})", statement)
+        placeholder = 0
+        for index in range(0, len(parts), 2):
+            part = parts[index]
+            for match in re.finditer(
+                r"table\(result_scan\(%s\)\)|%s", part, re.IGNORECASE
+            ):
+                if match.group(0) != "%s":
+                    query_id = params.pop(placeholder)
+                    part = part.replace(match.group(0), f'"result_scan.{query_id}"', 1)
+                else:
+                    placeholder += 1
+            # A seed picks the same rows every time, as it does in Snowflake
+            part = re.sub(
+                r"(\S+) sample (?:system|bernoulli) \(([\d.]+)\) seed \((\d+)\)",
+                r"(select * from \1 where abs(rowid * 1103515245 + \3) % 100000 < \2 * 1000)",
+                part,
+                flags=re.IGNORECASE,
+            )
+            part = re.sub(
+                r"(\S+) sample (?:system|bernoulli) \(([\d.]+)\)",
+                r"(select * from \1 where abs(random() % 100000) < \2 * 1000)",
+                part,
+                flags=re.IGNORECASE,
+            )
+            part = re.sub(
+                r"(\S+) sample \((\d+) rows\)",
+                r"(select * from \1 order by random() limit \2)",
+                part,
+                flags=re.IGNORECASE,
+            )
+            part = THREE_PART_NAME.sub(lambda match: local_name(match.group(0)), part)
+            # SQLite reads a double-quoted name it can't resolve as a string;
+            # bracketed names fail like Snowflake identifiers do
+            part = re.sub(
+                r'"((?:[^"]|"")+)"',
+                lambda match: "[" + match.group(1).replace('""', '"') + "]",
+                part,
+            )
+            part = part.replace("%s", "?").replace("%%", "%")
+            parts[index] = part
+        return "".join(parts), params
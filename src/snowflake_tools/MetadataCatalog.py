@@ -0,0 +1,286 @@
+import os
+import time
+import sqlite3
+import threading
+from snowflake_tools.snowflake_config import get_cache_dir
+
+COLUMN_FIELDS = [
+    "TABLE_CATALOG",
+    "TABLE_SCHEMA",
+    "TABLE_NAME",
+    "COLUMN_NAME",
+    "ORDINAL_POSITION",
+    "COLUMN_DEFAULT",
+    "IS_NULLABLE",
+    "DATA_TYPE",
+    "CHARACTER_MAXIMUM_LENGTH",
+    "NUMERIC_PRECISION",
+    "NUMERIC_SCALE",
+    "COMMENT",
+]
+
+TABLE_FIELDS = [
+    "TABLE_CATALOG",
+    "TABLE_SCHEMA",
+    "TABLE_NAME",
+    "TABLE_TYPE",
+    "LAST_ALTERED",
+    "ROW_COUNT",
+    "BYTES",
+]
+
+VIEW_FIELDS = [
+    "TABLE_CATALOG",
+    "TABLE_SCHEMA",
+    "TABLE_NAME",
+    "VIEW_DEFINITION",
+    "LAST_ALTERED",
+]
+
+# Past this many changed tables one bulk COLUMNS query beats a filtered one
+MAX_FILTERED_TABLES = 500
+
+# Stored as SQLite's user_version; older catalogs are dropped and reloaded
+CATALOG_FORMAT = 1
+
+
+def fetch_batches(cursor):
+    """Rows of the cursor's last query, streamed in batches as the connector downloads them."""
+    from snowflake.connector.errors import NotSupportedError
+
+    try:
+        batches = cursor.fetch_arrow_batches()
+    except NotSupportedError:
+        # Small results may come back as JSON instead of Arrow
+        yield cursor.fetchall()
+        return
+    for batch in batches:
+        yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+
+class MetadataCatalog:
+    """Local SQLite copy of INFORMATION_SCHEMA.TABLES, COLUMNS and VIEWS.
+
+    A database is bulk loaded the first time it is looked up, with one query
+    per INFORMATION_SCHEMA view. Later refreshes list TABLES again and reload
+    COLUMNS and VIEWS only for objects whose LAST_ALTERED changed. COLUMNS is
+    streamed into SQLite batch by batch, so large catalogs are never held in
+    memory whole. Lookups are answered locally until the database's copy is
+    older than `max_age` seconds. An object is reloaded on its own when
+    columns() is given a newer LAST_ALTERED than the copy's, or by
+    refresh_object() when a query finds its columns out of date.
+    """
+
+    def __init__(self, path, max_age=24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            if self._db.execute("pragma user_version").fetchone()[0] < CATALOG_FORMAT:
+                # Earlier catalogs could hold a table's columns more than once
+                for table in ["tables", "columns", "views", "databases"]:
+                    self._db.execute(f"drop table if exists {table}")
+                self._db.execute(f"pragma user_version = {CATALOG_FORMAT}")
+            self._db.execute(
+                f"create table if not exists tables ({', '.join(TABLE_FIELDS)}, primary key (TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME))"
+            )
+            self._db.execute(
+                f"create table if not exists columns ({', '.join(COLUMN_FIELDS)}, primary key (TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME))"
+            )
+            self._db.execute(
+                f"create table if not exists views ({', '.join(VIEW_FIELDS)}, primary key (TABLE_CATALOG, TABLE_SCHEMA, TABLE_NAME))"
+            )
+            self._db.execute(
+                "create table if not exists databases (DATABASE_NAME primary key, REFRESHED_AT)"
+            )
+
+    @classmethod
+    def for_profile(cls, config, **kwargs):
+        path = os.path.join(
+            get_cache_dir(), f"catalog-{config['account'].lower()}.sqlite"
+        )
+        return cls(path, **kwargs)
+
+    def refreshed_at(self, database):
+        with self._lock:
+            row = self._db.execute(
+                "select REFRESHED_AT from databases where DATABASE_NAME = ?",
+                (database,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def _ensure_fresh(self, cursor, database):
+        """Refresh the database if its copy is missing or too old; True if it did."""
+        with self._refresh_lock:
+            refreshed_at = self.refreshed_at(database)
+            if refreshed_at is None or time.time() - refreshed_at > self.max_age:
+                self.refresh(cursor, database)
+                return True
+        return False
+
+    def refresh(self, cursor, database, full=False):
+        """Bring one database up to date; returns the number of reloaded objects."""
+        cursor.execute(
+            f"""select {', '.join(TABLE_FIELDS)} from {database}.INFORMATION_SCHEMA.TABLES
+            where table_schema <> 'INFORMATION_SCHEMA'"""
+        )
+        tables = [
+            self._to_sqlite(row) for rows in fetch_batches(cursor) for row in rows
+        ]
+
+        with self._lock:
+            known = {
+                (schema, name): last_altered
+                for schema, name, last_altered in self._db.execute(
+                    "select TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED from tables where TABLE_CATALOG = ?",
+                    (database,),
+                )
+            }
+            loaded = self._db.execute(
+                "select 1 from databases where DATABASE_NAME = ?", (database,)
+            ).fetchone()
+
+        current = {(row[1], row[2]): row[4] for row in tables}
+        if full or loaded is None:
+            changed = None
+        else:
+            changed = [
+                key
+                for key, last_altered in current.items()
+                if known.get(key) != last_altered
+            ]
+        dropped = [key for key in known if key not in current]
+
+        if changed is None or len(changed) > MAX_FILTERED_TABLES:
+            only = None
+            reloaded = list(current)
+        else:
+            only = changed
+            reloaded = changed
+
+        self._reload(cursor, database, tables, reloaded, dropped, only)
+        with self._lock, self._db:
+            self._db.execute(
+                "insert or replace into databases values (?, ?)",
+                (database, time.time()),
+            )
+        return len(reloaded) + len(dropped)
+
+    def refresh_object(self, cursor, database, schema, name):
+        """Reload one table or view, e.g. after it was recreated with other columns."""
+        cursor.execute(
+            f"""select {', '.join(TABLE_FIELDS)} from {database}.INFORMATION_SCHEMA.TABLES
+            where table_schema = %s and table_name = %s""",
+            (schema, name),
+        )
+        tables = [self._to_sqlite(row) for row in cursor.fetchall()]
+        key = (schema, name)
+        if tables:
+            self._reload(cursor, database, tables, [key], [], [key])
+        else:
+            self._reload(cursor, database, tables, [], [key], [])
+
+    def _reload(self, cursor, database, tables, reloaded, dropped, only):
+        """Replace the `reloaded` and `dropped` objects' rows, fetching COLUMNS and VIEWS for `only` (None for all)."""
+        with self._lock, self._db:
+            for schema, name in reloaded + dropped:
+                for table in ["tables", "columns", "views"]:
+                    self._db.execute(
+                        f"delete from {table} where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?",
+                        (database, schema, name),
+                    )
+        # Tables are inserted last, so an interrupted refresh reloads them next time
+        for view, table, fields in [
+            ("COLUMNS", "columns", COLUMN_FIELDS),
+            ("VIEWS", "views", VIEW_FIELDS),
+        ]:
+            for rows in self._fetch(cursor, database, view, fields, only):
+                with self._lock, self._db:
+                    self._db.executemany(
+                        f"insert or replace into {table} values ({', '.join('?' * len(fields))})",
+                        rows,
+                    )
+        with self._lock, self._db:
+            reloaded_keys = set(reloaded)
+            self._db.executemany(
+                f"insert or replace into tables values ({', '.join('?' * len(TABLE_FIELDS))})",
+                [row for row in tables if (row[1], row[2]) in reloaded_keys],
+            )
+
+    def _fetch(self, cursor, database, view, fields, only=None):
+        """Batches of rows of one INFORMATION_SCHEMA view, optionally only for `only` tables."""
+        query = f"""select {', '.join(fields)} from {database}.INFORMATION_SCHEMA.{view}
+            where table_schema <> 'INFORMATION_SCHEMA'"""
+        if only is None:
+            cursor.execute(query)
+        elif not only:
+            return
+        else:
+            placeholders = ", ".join(["(%s, %s)"] * len(only))
+            cursor.execute(
+                f"{query} and (table_schema, table_name) in ({placeholders})",
+                tuple(value for key in only for value in key),
+            )
+        for rows in fetch_batches(cursor):
+            yield [self._to_sqlite(row) for row in rows]
+
+    @staticmethod
+    def _to_sqlite(row):
+        return tuple(
+            value.isoformat() if hasattr(value, "isoformat") else value for value in row
+        )
+
+    def _last_altered(self, database, schema, name):
+        with self._lock:
+            row = self._db.execute(
+                "select LAST_ALTERED from tables where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?",
+                (database, schema, name),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def columns(
+        self, cursor, database, schema, table, fields=COLUMN_FIELDS, last_altered=None
+    ):
+        """INFORMATION_SCHEMA.COLUMNS `fields` of one table or view, in ordinal order.
+
+        Answered from the catalog without a query unless `last_altered`, the
+        object's LAST_ALTERED as the caller already read it, differs from the
+        copy's, or the object is not in the copy; then only that object is
+        reloaded.
+        """
+        refreshed = self._ensure_fresh(cursor, database)
+        stored = self._last_altered(database, schema, table)
+        if (stored is None and not refreshed) or (
+            last_altered is not None and stored != last_altered
+        ):
+            with self._refresh_lock:
+                # Another thread may have reloaded it while this one waited
+                if self._last_altered(database, schema, table) == stored:
+                    self.refresh_object(cursor, database, schema, table)
+        with self._lock:
+            return self._db.execute(
+                f"""select {', '.join(fields)} from columns
+                where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?
+                order by ORDINAL_POSITION""",
+                (database, schema, table),
+            ).fetchall()
+
+    def object_type(self, cursor, database, schema, name):
+        """TABLE_TYPE of an object ("BASE TABLE", "VIEW", ...) or None if it doesn't exist."""
+        refreshed = self._ensure_fresh(cursor, database)
+        query = "select TABLE_TYPE from tables where TABLE_CATALOG = ? and TABLE_SCHEMA = ? and TABLE_NAME = ?"
+        params = (database, schema, name)
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        if row is None and not refreshed:
+            # Possibly created since the last refresh
+            with self._refresh_lock:
+                with self._lock:
+                    row = self._db.execute(query, params).fetchone()
+                if row is None:
+                    self.refresh_object(cursor, database, schema, name)
+                    with self._lock:
+                        row = self._db.execute(query, params).fetchone()
+        return None if row is None else row[0]
@@ -0,0 +1,108 @@
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+from snowflake_tools.snowflake_config import get_cache_dir
+
+
+class ProfileCache:
+    """On-disk cache of table profiles, keyed on the table's change state.
+
+    Entries are keyed on the fully qualified name, the profiling options and
+    LAST_ALTERED/ROW_COUNT/BYTES from INFORMATION_SCHEMA.TABLES, so any change
+    to the table makes its old entries unreachable. evict() removes entries not
+    used for `max_age` seconds, then the least recently used ones until the
+    cache fits in `max_bytes`.
+    """
+
+    def __init__(self, directory=None, max_bytes=500 * 1024**2, max_age=30 * 86400):
+        self.directory = directory or get_cache_dir("profiles")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @staticmethod
+    def table_state(cursor, database, schema, table):
+        """LAST_ALTERED, ROW_COUNT and BYTES of a table, or None if it can't be cached.
+
+        Views have no ROW_COUNT and LAST_ALTERED does not change when their
+        underlying tables do, so they are never cached.
+        """
+        cursor.execute(
+            f"""select last_altered, row_count, bytes from {database}.INFORMATION_SCHEMA.TABLES
+            where table_schema = %s and table_name = %s and table_type <> 'VIEW'""",
+            (schema, table),
+        )
+        row = cursor.fetchone()
+        if row is None or row[1] is None:
+            return None
+        last_altered, row_count, bytes = row
+        return (last_altered.isoformat(), row_count, bytes)
+
+    @staticmethod
+    def table_states(cursor, database):
+        """table_state() of every table in a database, keyed on (TABLE_SCHEMA, TABLE_NAME), in one query."""
+        cursor.execute(
+            f"""select table_schema, table_name, last_altered, row_count, bytes from {database}.INFORMATION_SCHEMA.TABLES
+            where table_schema <> 'INFORMATION_SCHEMA' and table_type <> 'VIEW'"""
+        )
+        return {
+            (schema, table): (last_altered.isoformat(), row_count, bytes)
+            for schema, table, last_altered, row_count, bytes in cursor.fetchall()
+            if row_count is not None
+        }
+
+    @staticmethod
+    def key(fq_table, state, options):
+        return hashlib.sha256(repr((fq_table, state, options)).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                profile = pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+        os.utime(path)
+        return profile
+
+    def contains(self, key):
+        """Whether a profile is cached under `key`; counts as a use, like get()."""
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, profile):
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(profile, file)
+        os.replace(temporary_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        total_bytes = sum(size for _, size, _ in entries)
+        for accessed_at, size, path in sorted(entries):
+            if now - accessed_at <= self.max_age and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
@@ -0,0 +1,119 @@
+import sys
+import json
+import datetime
+from snowflake_tools.ColumnStats import arrow_fields
+
+FORMATS = ["text", "parquet", "arrow", "jsonl", "csv"]
+
+# Formats that can't be written to a terminal
+BINARY_FORMATS = ["parquet", "arrow"]
+
+# Table level fields written ahead of each column's statistics; PROFILED_AT is UTC
+TABLE_FIELDS = [
+    ("TABLE_CATALOG", "string"),
+    ("TABLE_SCHEMA", "string"),
+    ("TABLE_NAME", "string"),
+    ("PROFILED_AT", "timestamp[us]"),
+    ("TOTAL_ROWS", "int64"),
+    ("PROFILED_ROWS", "int64"),
+]
+
+
+class ProfileWriter:
+    """Writes the profiles of many tables to one parquet, arrow, jsonl or csv file.
+
+    Each row is one column of a profiled table, with the table's name, row
+    counts and the time of the run ahead of the column statistics, so the
+    output of every run can be loaded into the same warehouse table. Tables
+    are written as they are added, so memory use does not grow with the
+    number of tables. `path` None writes jsonl and csv to stdout. CSV has
+    no nested types, so VALUES and TOP_VALUES are written as JSON text.
+    """
+
+    def __init__(self, path, format):
+        import pyarrow as pa
+
+        self.path = path
+        self.format = format
+        self.profiled_at = datetime.datetime.now(datetime.timezone.utc).replace(
+            tzinfo=None
+        )
+        self.schema = pa.schema(
+            [(name, pa.type_for_alias(arrow_type)) for name, arrow_type in TABLE_FIELDS]
+            + arrow_fields()
+        )
+        if format == "csv":
+            self.schema = pa.schema(
+                [
+                    (
+                        pa.field(field.name, pa.string())
+                        if pa.types.is_nested(field.type)
+                        else field
+                    )
+                    for field in self.schema
+                ]
+            )
+        if format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema)
+        elif format == "arrow":
+            self._writer = pa.ipc.new_file(path, self.schema)
+        elif format == "csv":
+            import pyarrow.csv
+
+            self._writer = pyarrow.csv.CSVWriter(path or sys.stdout.buffer, self.schema)
+        elif format == "jsonl":
+            self._writer = open(path, "w") if path else sys.stdout
+        else:
+            raise ValueError(f"Unsupported format: {format}")
+
+    def record_batch(self, table):
+        """One Arrow row per column of an analyzed SnowflakeTable."""
+        import pyarrow as pa
+
+        stats = table.to_arrow()
+        values = [
+            table.snowflake_database,
+            table.snowflake_schema,
+            table.snowflake_table,
+            self.profiled_at,
+            table.total_rows,
+            table.profiled_rows,
+        ]
+        columns = [
+            pa.array([value] * stats.num_rows, self.schema.field(name).type)
+            for (name, _), value in zip(TABLE_FIELDS, values)
+        ]
+        for field, column in zip(stats.schema, stats.columns):
+            if pa.types.is_nested(field.type) and self.format == "csv":
+                column = pa.array(
+                    [
+                        None if value is None else json.dumps(value)
+                        for value in column.to_pylist()
+                    ],
+                    pa.string(),
+                )
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def write(self, table):
+        batch = self.record_batch(table)
+        if self.format == "jsonl":
+            for row in batch.to_pylist():
+                self._writer.write(json.dumps(row, default=str) + "\n")
+            self._writer.flush()
+        else:
+            self._writer.write_table(batch)
+
+    def close(self):
+        if self.format != "jsonl":
+            self._writer.close()
+        elif self._writer is not sys.stdout:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,177 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DeadlineExceeded(TimeoutError):
+    """A query was not run, or was cancelled, because its deadline passed."""
+
+
+def query_timeout(timeout=None, deadline=None):
+    """Seconds a query may run under its `timeout` and time.monotonic() `deadline`; raises DeadlineExceeded if that has passed."""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline passed before the query started")
+    return min(timeout or remaining, remaining)
+
+
+class QueryExecutor:
+    """Runs queries concurrently on a shared connection, at most `max_in_flight` at a time.
+
+    Each worker thread gets its own cursor, since cursors are not thread safe
+    but the connection they come from is. Queries run in a copy of the
+    submitter's context, so query_context() labels follow them. Queries are
+    started with execute_async and their status polled, with growing
+    intervals, so each running query's id is known: one given a timeout is
+    cancelled once it runs that long, one given a deadline also at the
+    deadline, and cancel() cancels exactly the queries this executor runs,
+    or only those of the given futures.
+    """
+
+    def __init__(
+        self, connection, max_in_flight=4, poll_interval=0.05, max_poll_interval=2.0
+    ):
+        self.connection = connection
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Each submitted future's key, and the query id running under each key
+        self._futures = {}
+        self._running = {}
+        # Keys of futures cancelled before their query id was known
+        self._cancelled = set()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="snowflake-query"
+        )
+
+    def _cursor(self):
+        if not hasattr(self._local, "cursor"):
+            self._local.cursor = self.connection.cursor()
+        return self._local.cursor
+
+    def _run(self, query, params, timeout=None, deadline=None, key=None):
+        key = key or object()
+        timeout = query_timeout(timeout, deadline)
+        start_time = time.time()
+        query_id, rows, error = None, None, None
+        cursor = self._cursor()
+        try:
+            cursor.execute_async(query, params)
+            query_id = cursor.sfqid
+            with self._lock:
+                self._running[key] = query_id
+                cancelled = key in self._cancelled
+            try:
+                if cancelled:
+                    self._cancel_query(query_id)
+                self._wait(query_id, timeout)
+            finally:
+                with self._lock:
+                    self._running.pop(key, None)
+            cursor.get_results_from_sfqid(query_id)
+            rows = cursor.fetchall()
+            return rows
+        except Exception as e:
+            error = e
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded(
+                    "Deadline passed; the query was cancelled"
+                ) from e
+            raise
+        finally:
+            # execute_async bypasses a traced cursor, so the query is recorded here
+            trace = getattr(self.connection, "trace", None)
+            if trace is not None:
+                trace.record(
+                    query,
+                    time.time() - start_time,
+                    query_id=query_id,
+                    rows=None if rows is None else len(rows),
+                    error=error,
+                )
+
+    def _wait(self, query_id, timeout=None):
+        """Poll until the query is done; raises its error if it failed, or TimeoutError after `timeout` seconds."""
+        started_at = time.monotonic()
+        interval = self.poll_interval
+        while self.connection.is_still_running(
+            self.connection.get_query_status_throw_if_error(query_id)
+        ):
+            if timeout is not None:
+                remaining = started_at + timeout - time.monotonic()
+                if remaining <= 0:
+                    self._cancel_query(query_id)
+                    raise TimeoutError(
+                        f"Query {query_id} was cancelled after reaching its {timeout:g}s timeout"
+                    )
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    def _cancel_query(self, query_id):
+        self.connection.cursor().execute("select system$cancel_query(%s)", (query_id,))
+
+    def submit(self, query, params=None, timeout=None, deadline=None):
+        """Run a query on a worker; `timeout` is in seconds, `deadline` a time.monotonic() value."""
+        context = contextvars.copy_context()
+        key = object()
+        future = self._pool.submit(
+            context.run, self._run, query, params, timeout, deadline, key
+        )
+        with self._lock:
+            self._futures[future] = key
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._cancelled.discard(self._futures.pop(future, None))
+
+    def call(self, function, *args):
+        """Run function(cursor, *args) on a worker, for work that needs several queries on one cursor."""
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, lambda: function(self._cursor(), *args))
+
+    def map(self, queries):
+        """Run all queries concurrently and return their rows in submission order."""
+        futures = [self.submit(query) for query in queries]
+        return [future.result() for future in futures]
+
+    def cancel(self, futures=None):
+        """Drop the queued queries and cancel the running ones in Snowflake, e.g. on Ctrl-C.
+
+        Only this executor's queries are cancelled, by id, so other tables
+        and processes sharing the session keep theirs. Given `futures` from
+        submit(), only their queries are, so a table can stop its own
+        queries on an executor it shares with others.
+        """
+        with self._lock:
+            if futures is None:
+                futures = list(self._futures)
+            keys = {
+                future: self._futures[future]
+                for future in futures
+                if future in self._futures
+            }
+        for future in futures:
+            future.cancel()
+        with self._lock:
+            running = [
+                self._running[key] for key in keys.values() if key in self._running
+            ]
+            # A query starting now cancels itself once its id is known
+            self._cancelled.update(
+                key
+                for future, key in keys.items()
+                if not future.done() and key not in self._running
+            )
+        for query_id in running:
+            self._cancel_query(query_id)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
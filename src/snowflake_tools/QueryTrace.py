@@ -0,0 +1,307 @@
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from snowflake_tools.profile_sql import parse_sample
+from snowflake_tools.profile_plan import parse_budget
+
+_context = contextvars.ContextVar("query_context", default={})
+
+HISTORY_FIELDS = {
+    "BYTES_SCANNED": "bytes_scanned",
+    "PARTITIONS_SCANNED": "partitions_scanned",
+    "PARTITIONS_TOTAL": "partitions_total",
+    "EXECUTION_TIME": "execution_ms",
+    "QUEUED_OVERLOAD_TIME": "queued_ms",
+}
+
+# QUERY_HISTORY_BY_SESSION returns at most this many queries
+MAX_HISTORY_ROWS = 10000
+
+
+@contextmanager
+def query_context(**fields):
+    """Label the queries issued inside the block, e.g. with their phase and columns.
+
+    The labels are context variables, so QueryExecutor carries them over to
+    the worker that runs each submitted query.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def fingerprint(statement):
+    """Hash of a statement with its literals and whitespace normalized away."""
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    normalized = re.sub(r"\b\d+(?:\.\d+)?\b", "?", normalized)
+    normalized = " ".join(normalized.lower().split())
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class TracedCursor:
+    """A cursor that records every statement it executes in a QueryTrace."""
+
+    def __init__(self, cursor, trace):
+        self.cursor = cursor
+        self.trace = trace
+
+    def execute(self, command, params=None, *args, **kwargs):
+        start_time = time.time()
+        error = None
+        try:
+            self.cursor.execute(command, params, *args, **kwargs)
+            return self
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.trace.record(
+                command,
+                time.time() - start_time,
+                query_id=getattr(error, "sfqid", None) or self.cursor.sfqid,
+                rows=None if error else self.cursor.rowcount,
+                error=error,
+            )
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+class TracedConnection:
+    def __init__(self, connection, trace):
+        self.connection = connection
+        self.trace = trace
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self.connection.cursor(*args, **kwargs), self.trace)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+class QueryTrace:
+    """Record of every query a tool issued: id, fingerprint, labels, time and rows.
+
+    Queries are labelled with the phase and columns set by query_context().
+    fetch_history() adds bytes scanned, partitions and warehouse time from
+    QUERY_HISTORY, with one query for the whole trace. A profile query covers
+    all the columns of its group, so per-column costs need one column per
+    query (--columns-per-query 1).
+    """
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def wrap(self, connection):
+        return TracedConnection(connection, self)
+
+    def record(self, statement, elapsed_time, query_id=None, rows=None, error=None):
+        context = _context.get()
+        record = {
+            "query_id": query_id,
+            "fingerprint": fingerprint(statement),
+            "phase": context.get("phase"),
+            "table": context.get("table"),
+            "columns": context.get("columns"),
+            "checks": context.get("checks"),
+            "started_at": time.time() - elapsed_time,
+            "elapsed": round(elapsed_time, 4),
+            "rows": rows,
+            "error": None if error is None else str(error),
+            "statement": " ".join(statement.split())[:1000],
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def fetch_history(self, cursor, database=None):
+        """Add QUERY_HISTORY statistics to the recorded queries of this session."""
+        if isinstance(cursor, TracedCursor):
+            cursor = cursor.cursor
+        records = {
+            record["query_id"]: record
+            for record in self.records
+            if record["query_id"] is not None
+        }
+        if not records:
+            return
+        function = "information_schema.query_history_by_session"
+        if database is not None:
+            function = f"{database}.{function}"
+        query_ids = list(records)
+        for start in range(0, len(query_ids), 1000):
+            chunk = query_ids[start : start + 1000]
+            cursor.execute(
+                f"""select query_id, {', '.join(HISTORY_FIELDS)}
+                from table({function}(result_limit => {MAX_HISTORY_ROWS}))
+                where query_id in ({', '.join(['%s'] * len(chunk))})""",
+                tuple(chunk),
+            )
+            for row in cursor.fetchall():
+                records[row[0]].update(zip(HISTORY_FIELDS.values(), row[1:]))
+
+    def write_jsonl(self, file):
+        for record in sorted(self.records, key=lambda record: record["started_at"]):
+            file.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self):
+        """Queries, time, rows and (with history) scan statistics per phase and column, costliest first."""
+        from tabulate import tabulate
+
+        groups = {}
+        for record in self.records:
+            columns = record["columns"] or []
+            if len(columns) == 1:
+                column = columns[0]
+            else:
+                column = f"{len(columns)} columns" if columns else ""
+            key = (record["phase"] or "", record["table"] or "", column)
+            totals = groups.setdefault(key, [0, 0.0, 0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += record["elapsed"]
+            totals[2] += record["rows"] or 0
+            totals[3] += record.get("bytes_scanned") or 0
+            totals[4] += record.get("execution_ms") or 0
+            totals[5] += 1 if record["error"] else 0
+
+        rows = []
+        for key, totals in sorted(groups.items(), key=lambda item: -item[1][1]):
+            totals[1] = round(totals[1], 3)
+            rows.append([*key, *totals])
+        return tabulate(
+            rows,
+            headers=[
+                "PHASE",
+                "TABLE",
+                "COLUMN",
+                "QUERIES",
+                "SECONDS",
+                "ROWS",
+                "BYTES_SCANNED",
+                "WAREHOUSE_MS",
+                "ERRORS",
+            ],
+            tablefmt="simple",
+        )
+
+
+def add_profile_arguments(parser):
+    """Add the profiling options every profiling command shares."""
+    parser.add_argument(
+        "--approx",
+        help="Estimate distinct counts with APPROX_COUNT_DISTINCT (HyperLogLog)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--sample",
+        help="Profile a sample of each table: a percentage (10 or 10%%) or a row count (5000 rows)",
+        type=parse_sample,
+    )
+
+    parser.add_argument(
+        "--no-escalate",
+        help="Do not confirm estimated uniqueness and null checks with exact queries",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--top-k",
+        help="Most frequent values to list for columns with too many values to list them all (default: 5, 0 for none)",
+        type=int,
+        default=5,
+    )
+
+    parser.add_argument(
+        "--no-catalog",
+        help="Look up columns in INFORMATION_SCHEMA instead of the local metadata catalog",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        help="Do not read or write the local profile cache",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--refresh",
+        help="Re-profile even if a cached profile of the unchanged table exists",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--budget",
+        help="Most bytes scanned (50GB) or seconds (120s) to spend per table; picks exact, approximate or sampled profiling to fit",
+        type=parse_budget,
+    )
+
+
+def add_trace_arguments(parser):
+    parser.add_argument(
+        "--trace",
+        help="Write a JSON lines trace of every query to this file (- for stderr)",
+    )
+
+    parser.add_argument(
+        "--trace-summary",
+        help="Print a summary of query costs per phase and column when done",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--trace-history",
+        help="Add bytes scanned, partitions and warehouse time from QUERY_HISTORY to the trace; without --trace, print them in the summary",
+        action="store_true",
+    )
+
+
+def start_trace(args, config):
+    """Trace every query on the profile's pooled connection if the arguments ask for it."""
+    from snowflake_tools.ConnectionPool import ConnectionPool
+
+    if not (args.trace or args.trace_summary or args.trace_history):
+        return None
+    trace = QueryTrace()
+    ConnectionPool.get(config).trace = trace
+    return trace
+
+
+def fetch_session_history(trace, pool, databases):
+    """Add the QUERY_HISTORY of the pool's session, read through the first of `databases` that works."""
+    for database in list(dict.fromkeys(databases)) or [None]:
+        try:
+            trace.fetch_history(pool.cursor(), database)
+            return
+        except Exception as e:
+            error = e
+    print(f"Could not fetch query history: {error}", file=sys.stderr)
+
+
+def finish_trace(trace, args, config, *databases):
+    """Stop tracing the profile's session and write the trace, with QUERY_HISTORY if asked for."""
+    from snowflake_tools.ConnectionPool import ConnectionPool
+
+    if trace is None:
+        return
+    pool = ConnectionPool.get(config)
+    pool.trace = None
+    if args.trace_history:
+        fetch_session_history(trace, pool, databases)
+    if args.trace == "-":
+        trace.write_jsonl(sys.stderr)
+    elif args.trace:
+        with open(args.trace, "w") as file:
+            trace.write_jsonl(file)
+    if args.trace_summary or not args.trace:
+        print(f"\n{trace.summary()}", file=sys.stderr)
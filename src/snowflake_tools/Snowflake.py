@@ -1,56 +1,104 @@
-import snowflake.connector
-import pandas as pd
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.QueryTrace import query_context
+
 
 class Snowflake:
-    def __init__(self, connection_config, debug=False):
+    def __init__(self, connection_config, debug=False, connection=None):
         self.connection_config = connection_config
-        self.connection = snowflake.connector.connect(
-            user=connection_config["user"],
-            password=connection_config["password"],
-            account=connection_config["account"],
-        )
+        if connection is None:
+            connection = ConnectionPool.get(connection_config).connection
+        self.connection = connection
         self.cursor = self.connection.cursor()
 
         self.debug = debug
 
+    @staticmethod
+    def database_privileges(cursor, database, grantee):
+        cursor.execute(
+            f"""select privilege_type from {database}.information_schema.object_privileges
+            where grantee = %s and object_type = 'DATABASE' and object_name = %s""",
+            (grantee.upper(), database.upper()),
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def future_privileges(cursor, database, grantee):
+        cursor.execute(f"show future grants in database {database}")
+        # Filter the SHOW output server-side; by query id, since other threads share the session
+        cursor.execute(
+            """select "privilege", "grant_on" from table(result_scan(%s))
+            where "grantee_name" = %s""",
+            (cursor.sfqid, grantee.upper()),
+        )
+        return set(cursor.fetchall())
+
     def mirror_db_permissions(
-        self, source_db, source_grantee, target_db, target_grantee
+        self,
+        source_db,
+        source_grantee,
+        target_db,
+        target_grantee,
+        missing_only=False,
     ):
+        statements = self.mirror_many_db_permissions(
+            [(source_db, source_grantee, target_db, target_grantee)],
+            missing_only=missing_only,
+        )[0]
+        if isinstance(statements, Exception):
+            raise statements
+        return statements
 
-        self.cursor.execute(
-            f"select * from {source_db}.information_schema.object_privileges"
-        )
-        grants = self.cursor.fetch_pandas_all()
-        grant_rows = grants.loc[
-            (grants["GRANTEE"] == source_grantee)
-            & (grants["OBJECT_TYPE"] == "DATABASE")
-            & (grants["OBJECT_NAME"] == source_db),
-            ["PRIVILEGE_TYPE", "GRANTEE"],
-        ]
-
-        new_grants = [
-            f"grant {row['PRIVILEGE_TYPE']} on database {target_db} to {target_grantee};"
-            for row in grant_rows.to_dict(orient="records")
-        ]
-
-        self.cursor.execute(f"show future grants in database {source_db}")
-        privileges_columns = [desc[0] for desc in self.cursor.description]
-        future_grants = pd.DataFrame(self.cursor.fetchall(), columns=privileges_columns)
-        future_grant_rows = future_grants.loc[
-            (future_grants["grantee_name"] == source_grantee),
-            [
-                "privilege",
-                "grantee_name",
-                "grant_on",
-            ],
-        ]
-
-        new_future_grants = [
-            f"grant {row['privilege']} on future {row['grant_on']}S in database {target_db} to {target_grantee};"
-            for row in future_grant_rows.to_dict(orient="records")
-        ]
-
-        return new_grants + new_future_grants
+    def mirror_many_db_permissions(self, pairs, missing_only=True, max_in_flight=8):
+        """GRANT statements mirroring each (source_db, source_grantee, target_db, target_grantee).
+
+        Grants are fetched concurrently, once per distinct database and grantee.
+        With `missing_only`, grants the target grantee already holds are left
+        out. Returns one list of statements per pair, in the order given; a
+        pair whose grants could not be read gets the exception instead.
+        """
+        executor = QueryExecutor(self.connection, max_in_flight)
+        try:
+            lookups = {}
+            for source_db, source_grantee, target_db, target_grantee in pairs:
+                keys = [(source_db, source_grantee)]
+                if missing_only:
+                    keys.append((target_db, target_grantee))
+                for key in keys:
+                    if key not in lookups:
+                        with query_context(phase="grants", table=key[0]):
+                            lookups[key] = (
+                                executor.call(self.database_privileges, *key),
+                                executor.call(self.future_privileges, *key),
+                            )
+
+            results = []
+            for source_db, source_grantee, target_db, target_grantee in pairs:
+                try:
+                    source = lookups[(source_db, source_grantee)]
+                    privileges = source[0].result()
+                    future_privileges = source[1].result()
+                    if missing_only:
+                        target = lookups[(target_db, target_grantee)]
+                        privileges = privileges - target[0].result()
+                        future_privileges = future_privileges - target[1].result()
+                except Exception as e:
+                    results.append(e)
+                    continue
+
+                results.append(
+                    [
+                        f"grant {privilege} on database {target_db} to {target_grantee};"
+                        for privilege in sorted(privileges)
+                    ]
+                    + [
+                        f"grant {privilege} on future {grant_on}S in database {target_db} to {target_grantee};"
+                        for privilege, grant_on in sorted(future_privileges)
+                    ]
+                )
+            return results
+        finally:
+            executor.close()
 
     def exec(self, statement):
         self.cursor.execute(statement)
@@ -1,174 +1,969 @@
-import snowflake.connector
-import os
+import re
+import sys
+import json
+import time
+import random
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, wait
 from snowflake_tools import Timer
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives.asymmetric import dsa
-from cryptography.hazmat.primitives import serialization
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.IncrementalStore import IncrementalStore
+from snowflake_tools.ColumnStats import ColumnStats
+from snowflake_tools.QueryExecutor import QueryExecutor, DeadlineExceeded
+from snowflake_tools.QueryTrace import query_context
+from snowflake_tools.profile_plan import plan_profile, table_metadata
+from snowflake_tools.profile_sql import (
+    HLL_RELATIVE_ERROR,
+    NO_TOP_VALUES_TYPES,
+    TOP_K_COUNTERS,
+    column_checks,
+    compile_fingerprint_query,
+    compile_increment_query,
+    compile_profile_query,
+    compile_sketch_merge_query,
+    compile_top_values_query,
+    fingerprint_checks,
+    parse_sample,
+)
+
+
+PROFILE_CHECKS = ["NULLS", "EMPTY_STRINGS", "ZEROS", "DIST"]
+
+# Part of the cache key, so profiles cached in an older structure are not read back
+PROFILE_FORMAT = 3
+
+# Without --columns-per-query, a table's columns are spread over the queries
+# that can run at once, in batches big enough to be worth a query and small
+# enough to compile quickly. Snowflake stores tables by column, so batches
+# together scan no more than one query over all columns would.
+MIN_COLUMNS_PER_QUERY = 100
+MAX_COLUMNS_PER_QUERY = 1000
+
+# Statement timeouts (000630) and statement size or compilation limits, which
+# a smaller batch of columns may stay under
+RESPLIT_ERRNOS = [630]
+RESPLIT_MESSAGES = re.compile(
+    r"timeout|too (large|long|complex|many columns)|exceed(s|ed)? .*(max|limit)",
+    re.IGNORECASE,
+)
+
+# A column the query names no longer exists (000904)
+INVALID_IDENTIFIER_ERRNOS = [904]
+INVALID_IDENTIFIER_MESSAGES = re.compile(r"invalid identifier", re.IGNORECASE)
+
+# Statement timeouts, ours or the warehouse's
+TIMEOUT_ERRNOS = [630]
+TIMEOUT_MESSAGES = re.compile(r"timeout", re.IGNORECASE)
+
+# Marks the cells a timeout or the deadline left empty
+NOT_PROFILED = "not profiled (timed out)"
+VALUES_NOT_FOUND = "VALUES (timed out)"
+
+# Snowflake's SAMPLE ... SEED takes seeds from 0 to this
+MAX_SAMPLE_SEED = 2**31 - 1
+
+# Keeps sketch merge queries well under Snowflake's statement size limit
+MAX_SKETCH_BYTES_PER_QUERY = 400_000
+
+
+class TableNotFoundError(ValueError):
+    """The table or view has no columns in INFORMATION_SCHEMA."""
 
 
 class SnowflakeTable:
-    def __init__(self, fq_table, connection_config, max_distinct=8, debug=False):
+    def __init__(
+        self,
+        fq_table,
+        connection_config,
+        max_distinct=8,
+        top_k=5,
+        approx=False,
+        sample=None,
+        seed=None,
+        escalate=True,
+        max_in_flight=4,
+        columns_per_query=None,
+        connection=None,
+        executor=None,
+        cache=None,
+        refresh=False,
+        watermark=None,
+        incremental_store=None,
+        catalog=None,
+        budget=None,
+        statement_timeout=None,
+        deadline=None,
+        debug=False,
+    ):
         (self.snowflake_database, self.snowflake_schema, self.snowflake_table) = (
             fq_table.upper().split(".")
         )
         self.max_distinct = max_distinct
+        self.top_k = top_k
+        self.approx = approx
+        self.sample = parse_sample(sample) if isinstance(sample, str) else sample
+        # One seed for every query of the table, so they all sample the same rows
+        self.seed = random.randint(0, MAX_SAMPLE_SEED) if seed is None else seed
+        self.escalate = escalate
         self.connection_config = connection_config
 
-        if connection_config["private_key_path"]:
-            with open(connection_config["private_key_path"], "rb") as key:
-                p_key = serialization.load_pem_private_key(
-                    key.read(),
-                    password=None,
-                    backend=default_backend(),
-                )
-            pkb = p_key.private_bytes(
-                encoding=serialization.Encoding.DER,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption(),
-            )
-            self.connection = snowflake.connector.connect(
-                user=connection_config["user"],
-                account=connection_config["account"],
-                private_key=pkb,
-                database=self.snowflake_database,
-                schema=self.snowflake_schema,
-                role=connection_config["role"],
-                warehouse=connection_config["warehouse"],
-            )
-
-        else:
-            self.connection = snowflake.connector.connect(
-                user=connection_config["user"],
-                password=connection_config["password"],
-                account=connection_config["account"],
-                database=self.snowflake_database,
-                schema=self.snowflake_schema,
-                role=connection_config["role"],
-                warehouse=connection_config["warehouse"],
-            )
-
-        self.cursor = self.connection.cursor()
+        self.connection = connection
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.cursor = None
+        self._connect()
+        self.columns_per_query = columns_per_query
+        self.cache = cache
+        self.refresh = refresh
+        self.watermark = watermark.upper() if watermark else None
+        self._incremental_store = incremental_store
+        self.catalog = catalog
+        self.budget = budget
+        self.statement_timeout = statement_timeout
+        self.deadline = deadline
+        self._deadline_at = None
+        # Whether a timeout or the deadline left some statistics out
+        self.incomplete = False
+        self.plan = None
+        self.table_type = None
+        # LAST_ALTERED from the cache lookup, which tells the catalog whether its columns are current
+        self._last_altered = None
+        self.stats = None
+        self._batch_limit = None
         self.debug = debug
 
         if debug == True:
             print(f"Max distinct values: {max_distinct}")
 
+    executor_class = QueryExecutor
+
+    def _connect(self):
+        """Log in unless given a connection, and open the cursor and executor."""
+        if self.connection is None:
+            self.connection = ConnectionPool.get(self.connection_config).connection
+        self.cursor = self.connection.cursor()
+        if self.executor is None:
+            self.executor = self.executor_class(self.connection, self.max_in_flight)
+
+    @property
+    def incremental_store(self):
+        # Created on first use, so tables without a watermark never touch ~/.cache
+        if self._incremental_store is None:
+            self._incremental_store = IncrementalStore()
+        return self._incremental_store
+
+    def _start_deadline(self):
+        self._deadline_at = None
+        if self.deadline is not None:
+            self._deadline_at = time.monotonic() + self.deadline
+
+    @contextmanager
+    def _step(self, message):
+        """Time one step of the profile, announcing it with `message` when debugging."""
+        if self.debug == True:
+            print(message, end="", flush=True)
+        with Timer(output=self.debug):
+            yield
+
     def analyze(self):
-        self.cursor.execute(
-            rf"""select * from {self.snowflake_database}.INFORMATION_SCHEMA.COLUMNS
-            where table_schema = '{self.snowflake_schema}'
-            and table_name = '{self.snowflake_table}'"""
-        )
-        self.column_info = self.cursor.fetch_pandas_all()
-        if len(self.column_info) == 0:
-            print(
-                f"Could not find information on table or view: {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"
+        """Profile the table.
+
+        With a `deadline` in seconds, queries still running when it passes
+        are cancelled and the statistics found so far are kept; columns and
+        values left out are labelled in ESTIMATED and `incomplete` is set.
+        A column whose query runs past `statement_timeout` seconds on its
+        own is left out the same way. Incremental profiles ignore both. On
+        Ctrl-C the table's queries are cancelled in Snowflake.
+        """
+        self._start_deadline()
+        with query_context(table=self.fq_table):
+            try:
+                self._analyze()
+            except KeyboardInterrupt:
+                self.executor.cancel()
+                raise
+
+    def _analyze(self):
+        cache_key = self._cache_key()
+        if self._load_cached(cache_key):
+            return
+
+        try:
+            self._profile()
+        except Exception as e:
+            if not self._refresh_catalog(e):
+                raise
+            self._profile()
+
+        self._save_cached(cache_key)
+
+    def _profile(self):
+        self._load_columns()
+        if self.budget is not None and self.watermark is None:
+            self.plan_profile()
+
+        if self.watermark is not None:
+            self._add_incremental_profile()
+        else:
+            self._load_table_type()
+            all_columns = self._skip_planned_columns()
+            self._add_profile()
+            self._add_values()
+            self._add_skipped_columns(all_columns)
+
+    def _refresh_catalog(self, error):
+        """Reload the table's columns in the catalog if `error` says they are out of date.
+
+        Returns whether it did, so the profile can be run again with them.
+        """
+        if self.catalog is None or not self._is_invalid_identifier(error):
+            return False
+        with query_context(phase="metadata"):
+            self.catalog.refresh_object(
+                self.cursor,
+                self.snowflake_database,
+                self.snowflake_schema,
+                self.snowflake_table,
             )
-            exit()
-        self.total_rows = self.cursor.execute(
-            f"""select count(1) from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"""
-        ).fetchone()[  # type: ignore
-            0
-        ]
-        self._add_has_null()
-        self._add_has_empty_strings()
-        self._add_has_zeros()
-        self._add_distinct_count()
-        self._add_values()
-        self._add_unique()
-
-    def _add_has_null(self):
+        self.stats = None
+        self.plan = None
+        return True
+
+    def _cache_key(self):
+        """Key of the table's profile in the cache, or None if it can't be cached."""
+        if self.cache is None:
+            return None
+        with query_context(phase="cache"):
+            state = ProfileCache.table_state(
+                self.cursor,
+                self.snowflake_database,
+                self.snowflake_schema,
+                self.snowflake_table,
+            )
+        if state is None:
+            return None
+        self._last_altered = state[0]
+        return self.profile_key(state)
+
+    def profile_key(self, state):
+        """Key of the table's profile in the cache while ProfileCache.table_state() is `state`."""
+        return ProfileCache.key(
+            self.fq_table,
+            state,
+            (
+                self.max_distinct,
+                self.top_k,
+                self.approx,
+                self.sample,
+                self.escalate,
+                self.watermark,
+                self.budget,
+                PROFILE_FORMAT,
+            ),
+        )
+
+    def _load_cached(self, cache_key):
+        if cache_key is None or self.refresh:
+            return False
+        profile = self.cache.get(cache_key)
+        if profile is None:
+            return False
         if self.debug == True:
-            print("Checking for null values...", end="", flush=True)
+            print("Using cached profile")
+        (self.stats, self.total_rows, self.profiled_rows) = profile
+        return True
 
-        with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                result = self.cursor.execute(
-                    f"""select count(1) from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table} where "{row["COLUMN_NAME"]}" is null"""
+    def _save_cached(self, cache_key):
+        if cache_key is not None and not self.incomplete:
+            self.cache.put(cache_key, (self.stats, self.total_rows, self.profiled_rows))
+
+    def _load_columns(self):
+        if self.stats is not None:
+            return
+        fields = ["COLUMN_NAME", "DATA_TYPE", "ORDINAL_POSITION"]
+        with query_context(phase="metadata"):
+            if self.catalog is not None:
+                rows = self.catalog.columns(
+                    self.cursor,
+                    self.snowflake_database,
+                    self.snowflake_schema,
+                    self.snowflake_table,
+                    fields,
+                    last_altered=self._last_altered,
+                )
+            else:
+                self.cursor.execute(
+                    rf"""select {', '.join(fields)} from {self.snowflake_database}.INFORMATION_SCHEMA.COLUMNS
+                    where table_schema = '{self.snowflake_schema}'
+                    and table_name = '{self.snowflake_table}'
+                    order by ordinal_position"""
                 )
-                null_count = result.fetchone()[0]  # type: ignore
+                rows = self.cursor.fetchall()
+        if len(rows) == 0:
+            raise TableNotFoundError(
+                f"Could not find information on table or view: {self.fq_table}"
+            )
+        self.stats = ColumnStats(*zip(*rows))
 
-                if null_count > 0:
-                    self.column_info.at[index, "NULLS"] = True
-                else:
-                    self.column_info.at[index, "NULLS"] = False
+    def plan_profile(self):
+        """Choose the profiling strategy within the budget from metadata alone, and apply it."""
+        if self.plan is not None:
+            return self.plan
+        self._load_columns()
+        with query_context(table=self.fq_table, phase="plan"):
+            metadata = table_metadata(
+                self.cursor,
+                self.snowflake_database,
+                self.snowflake_schema,
+                self.snowflake_table,
+            )
+        self.plan = plan_profile(
+            self.fq_table,
+            metadata,
+            list(zip(self.stats.names, self.stats.data_types)),
+            budget=self.budget,
+            approx=self.approx,
+            sample=self.sample,
+            escalate=self.escalate,
+        )
+        self.table_type = metadata["table_type"]
+        self.approx = self.plan.approx
+        self.sample = self.plan.sample
+        self.escalate = self.plan.escalate
+        return self.plan
 
-    def _add_has_empty_strings(self):
-        if self.debug == True:
-            print("Checking for empty strings...", end="", flush=True)
-        with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                if row["DATA_TYPE"] == "TEXT":
-                    result = self.cursor.execute(
-                        f"""select count(1) from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table} where "{row["COLUMN_NAME"]}" = ''"""
-                    )
-                    empty_strings_count = result.fetchone()[0]  # type: ignore
-                    if empty_strings_count > 0:
-                        self.column_info.at[index, "EMPTY_STRINGS"] = True
-                    else:
-                        self.column_info.at[index, "EMPTY_STRINGS"] = False
-                else:
-                    self.column_info.at[index, "EMPTY_STRINGS"] = ""
+    def _load_table_type(self):
+        """Look up TABLE_TYPE when sampling a percentage, whose method views restrict."""
+        if (
+            self.table_type is not None
+            or self.sample is None
+            or self.sample[0] != "percent"
+        ):
+            return
+        with query_context(phase="metadata"):
+            if self.catalog is not None:
+                self.table_type = self.catalog.object_type(
+                    self.cursor,
+                    self.snowflake_database,
+                    self.snowflake_schema,
+                    self.snowflake_table,
+                )
+            else:
+                self.table_type = table_metadata(
+                    self.cursor,
+                    self.snowflake_database,
+                    self.snowflake_schema,
+                    self.snowflake_table,
+                )["table_type"]
 
-    def _add_has_zeros(self):
-        if self.debug == True:
-            print("Checking for zero values...", end="", flush=True)
-        with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                if row["DATA_TYPE"] == "NUMBER":
-                    result = self.cursor.execute(
-                        f"""select count(1) from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table} where "{row["COLUMN_NAME"]}" = 0"""
+    def _is_view(self):
+        return self.table_type is not None and self.table_type.endswith("VIEW")
+
+    def _skip_planned_columns(self):
+        """Narrow stats down to the columns the plan profiles; returns what to restore."""
+        if self.plan is None or not self.plan.skipped:
+            return None
+        skipped = set(self.plan.skipped)
+        positions = [
+            position
+            for position, column_name in enumerate(self.stats.names)
+            if column_name not in skipped
+        ]
+        all_columns = self.stats
+        self.stats = all_columns.select(positions)
+        return all_columns, positions
+
+    def _add_skipped_columns(self, all_columns):
+        if all_columns is None:
+            return
+        stats, positions = all_columns
+        stats.update(positions, self.stats)
+        for position, column_name in enumerate(stats.names):
+            if column_name in self.plan.skipped:
+                stats.estimated[position] = "skipped (over budget)"
+        self.stats = stats
+
+    def to_pandas(self):
+        """Column statistics as a DataFrame with nullable dtypes, one row per column."""
+        return self.stats.to_pandas()
+
+    def to_arrow(self):
+        """Column statistics as an Arrow table, one row per column."""
+        return self.stats.to_arrow()
+
+    @property
+    def column_info(self):
+        return self.to_pandas()
+
+    @property
+    def fq_table(self):
+        return (
+            f"{self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"
+        )
+
+    def _column_groups(self, columns):
+        """Split columns into batches of --columns-per-query, or spread them over the queries in flight."""
+        if not columns:
+            return []
+        size = self.columns_per_query
+        if not size:
+            size = -(-len(columns) // self.executor.max_in_flight)
+            size = min(max(size, MIN_COLUMNS_PER_QUERY), MAX_COLUMNS_PER_QUERY)
+        if self._batch_limit is not None:
+            size = min(size, self._batch_limit)
+        count = -(-len(columns) // size)
+        return [
+            columns[index * len(columns) // count : (index + 1) * len(columns) // count]
+            for index in range(count)
+        ]
+
+    @staticmethod
+    def _is_batch_limit(error):
+        return getattr(
+            error, "errno", None
+        ) in RESPLIT_ERRNOS or RESPLIT_MESSAGES.search(str(error))
+
+    @staticmethod
+    def _is_invalid_identifier(error):
+        return getattr(
+            error, "errno", None
+        ) in INVALID_IDENTIFIER_ERRNOS or INVALID_IDENTIFIER_MESSAGES.search(str(error))
+
+    @staticmethod
+    def _is_timeout(error):
+        return isinstance(error, DeadlineExceeded) or (
+            getattr(error, "errno", None) in TIMEOUT_ERRNOS
+            or TIMEOUT_MESSAGES.search(str(error))
+        )
+
+    def _submit(self, query, params=None):
+        """Submit a query under the table's statement timeout and deadline."""
+        return self.executor.submit(
+            query,
+            params,
+            timeout=self.statement_timeout,
+            deadline=self._deadline_at,
+        )
+
+    def _run_batches(self, count, compile, labels):
+        """Run `count` columns as concurrent batches of one query each and gather their rows.
+
+        compile(positions) returns the query of a batch and its layout, and
+        labels(positions) its query_context() labels. A batch that fails on a
+        timeout or a size or compilation limit is split in half and run again,
+        down to single columns, and later batches of the table are kept at
+        most that size. Returns (positions, layout, row) for every batch, in
+        column order, leaving out the batches stopped by the deadline and
+        single columns that timed out.
+        """
+        pending = {}
+
+        def submit(positions):
+            query, layout = compile(positions)
+            with query_context(**labels(positions)):
+                pending[self._submit(query)] = (positions, layout)
+
+        results = []
+        try:
+            for positions in self._column_groups(list(range(count))):
+                submit(positions)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish_batch(
+                        *pending.pop(future), future.result, submit, results
                     )
-                    zeros_count = result.fetchone()[0]  # type: ignore
+            return sorted(results, key=lambda result: result[0][0])
+        finally:
+            # After a failure, stop the other batches' queries in Snowflake too;
+            # only this table's, since the executor may be shared
+            self.executor.cancel(pending)
 
-                    if zeros_count > 0:
-                        self.column_info.at[index, "ZEROS"] = True
-                    else:
-                        self.column_info.at[index, "ZEROS"] = False
-                else:
-                    self.column_info.at[index, "ZEROS"] = ""
+    def _finish_batch(self, positions, layout, result, submit, results):
+        """Handle a finished batch: keep its row, drop it after a timeout, or resubmit its halves.
 
-    def _add_distinct_count(self):
+        result() returns the batch's rows or raises its error, and submit()
+        runs a batch again.
+        """
+        try:
+            rows = result()
+        except DeadlineExceeded:
+            return
+        except Exception as e:
+            if len(positions) == 1 and self._is_timeout(e):
+                return
+            for half in self._resplit(positions, e):
+                submit(half)
+            return
+        results.append((positions, layout, rows[0]))
+
+    def _resplit(self, positions, error):
+        """The halves of a failed batch to run again, or raise `error` if splitting can't help."""
+        if len(positions) == 1 or not self._is_batch_limit(error):
+            raise error
+        half = len(positions) // 2
+        self._batch_limit = min(self._batch_limit or half, half)
         if self.debug == True:
-            print("Checking distinct count...", end="", flush=True)
-        with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                result = self.cursor.execute(
-                    f"""select count(distinct("{row["COLUMN_NAME"]}")) from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"""
+            print(
+                f"\nSplitting a batch of {len(positions)} columns: {error}",
+                file=sys.stderr,
+            )
+        return positions[:half], positions[half:]
+
+    def _run_profile(self, columns, approx=False, sample=None, phase="profile"):
+        """Profile `columns` with one aggregate query per batch, run concurrently.
+
+        Returns per-column counts keyed on check, plus the number of rows each
+        column was profiled over under "ROWS".
+        """
+        compile, labels = self._profile_batches(columns, approx, sample, phase)
+        return self._gather_counts(
+            columns, self._run_batches(len(columns), compile, labels)
+        )
+
+    def _profile_batches(self, columns, approx, sample, phase):
+        """compile() and labels() for running profile queries of `columns` in batches."""
+
+        def compile(positions):
+            return compile_profile_query(
+                self.fq_table,
+                [columns[position] for position in positions],
+                approx=approx,
+                sample=sample,
+                seed=self.seed,
+                view=self._is_view(),
+            )
+
+        def labels(positions):
+            return dict(
+                phase=phase,
+                columns=[columns[position][0] for position in positions],
+                checks=sorted(
+                    {check for position in positions for check in columns[position][1]}
+                ),
+            )
+
+        return compile, labels
+
+    @staticmethod
+    def _gather_counts(columns, results):
+        counts = {check: [None] * len(columns) for check in ["ROWS"] + PROFILE_CHECKS}
+        for positions, layout, result in results:
+            for position in positions:
+                counts["ROWS"][position] = result[0]
+            for (index, check), value in zip(layout, result[1:]):
+                counts[check][positions[index]] = value
+        return counts
+
+    def _profile_columns(self):
+        return [
+            (column_name, column_checks(data_type))
+            for column_name, data_type in zip(self.stats.names, self.stats.data_types)
+        ]
+
+    def _add_profile(self):
+        with self._step("Profiling all columns..."):
+            columns = self._profile_columns()
+            total_rows = self._submit_row_count()
+            try:
+                counts = self._run_profile(
+                    columns, approx=self.approx, sample=self.sample
                 )
-                distinct_count = result.fetchone()[0]  # type: ignore
+                self._set_row_counts(counts, total_rows and total_rows.result)
+            finally:
+                if total_rows is not None:
+                    self.executor.cancel([total_rows])
 
-                self.column_info.at[index, "DIST"] = distinct_count
+        self._set_profile(counts, self.approx, self.sample)
 
-            self.column_info["DIST"] = self.column_info["DIST"].astype(int)
+    def _submit_row_count(self):
+        """Submit the count(*) of a sampled table; None when the profile counts every row."""
+        if self.sample is None:
+            return None
+        # count(*) on a table is answered from metadata without a scan
+        with query_context(phase="row_count"):
+            return self._submit(f"select count(*) from {self.fq_table}")
+
+    def _set_row_counts(self, counts, total_rows=None):
+        """Set profiled_rows from the profile and total_rows from total_rows(), the count(*)'s rows, if sampled."""
+        self.profiled_rows = next(
+            (rows for rows in counts["ROWS"] if rows is not None), None
+        )
+        if total_rows is None:
+            self.total_rows = self.profiled_rows
+            return
+        try:
+            self.total_rows = total_rows()[0][0]
+        except Exception as e:
+            if not self._is_timeout(e):
+                raise
+            self.total_rows = None
+            self.incomplete = True
+
+    def _set_profile(self, counts, approx, sample):
+        """Turn per-column counts into stats, labelling and confirming estimates."""
+        unique, estimates, escalations = self._estimate_profile(counts, approx, sample)
+        if self.escalate and escalations:
+            self._escalate(escalations, counts, unique, estimates)
+        self._store_profile(counts, unique, estimates)
+
+    def _estimate_profile(self, counts, approx, sample):
+        """Uniqueness and estimate labels per column, and the checks worth confirming exactly."""
+        positions = range(len(self.stats))
+        estimates = [{} for _ in positions]
+        unique = [
+            (
+                None
+                if counts["ROWS"][position] is None
+                else self._is_unique(counts, position, approx, sample)
+            )
+            for position in positions
+        ]
+        escalations = {}
+        for position in positions:
+            if counts["ROWS"][position] is None:
+                estimates[position]["PROFILE"] = NOT_PROFILED
+                self.incomplete = True
+                continue
+            if sample is not None:
+                for check in ["NULLS", "EMPTY_STRINGS", "ZEROS"]:
+                    if counts[check][position] == 0:
+                        estimates[position][
+                            check
+                        ] = f"{check} (< {self._absence_bound(counts, position)} of rows)"
+                estimates[position]["DIST"] = "DIST (sample lower bound)"
+                if counts["NULLS"][position] == 0:
+                    escalations.setdefault(position, []).append("NULLS")
+            elif approx:
+                estimates[position]["DIST"] = f"DIST (+/- {HLL_RELATIVE_ERROR:.2%})"
+
+            if unique[position] is None:
+                unique[position] = True
+                estimates[position]["UNIQUE"] = "UNIQUE (unconfirmed)"
+                escalations.setdefault(position, []).append("DIST")
+
+        return unique, estimates, escalations
+
+    def _store_profile(self, counts, unique, estimates):
+        self.stats.set_checks(counts)
+        self.stats.unique = unique
+        self.stats.estimated = ["; ".join(labels.values()) for labels in estimates]
+
+    def _is_unique(self, counts, position, approx, sample):
+        """True or False when the profile proves it, None when it is too close to call."""
+        # Nulls are not counted as distinct, so a column with nulls is never unique
+        if counts["NULLS"][position] > 0:
+            return False
+        tolerance = 3 * HLL_RELATIVE_ERROR if approx else 0
+        if counts["DIST"][position] < counts["ROWS"][position] * (1 - tolerance):
+            return False
+        if approx or sample is not None:
+            return None
+        return True
+
+    def _absence_bound(self, counts, position):
+        # "Rule of three": 95% upper bound on a rate never seen in n sampled rows
+        if counts["ROWS"][position] == 0:
+            return "100%"
+        return f"{300 / counts['ROWS'][position]:.3g}%"
+
+    def _escalate(self, escalations, counts, unique, estimates):
+        with self._step(f"Confirming {len(escalations)} estimated columns exactly..."):
+            positions, columns = self._escalation_columns(escalations)
+            exact = self._run_profile(columns, phase="escalate")
+            self._apply_exact(escalations, positions, exact, counts, unique, estimates)
+
+    def _escalation_columns(self, escalations):
+        positions = sorted(escalations)
+        columns = []
+        for position in positions:
+            checks = escalations[position]
+            if "DIST" in checks and "NULLS" not in checks:
+                checks = ["NULLS"] + checks
+            columns.append((self.stats.names[position], checks))
+        return positions, columns
+
+    def _apply_exact(self, escalations, positions, exact, counts, unique, estimates):
+        for index, position in enumerate(positions):
+            if exact["ROWS"][index] is None:
+                # Timed out; the estimates stand, labelled as such
+                continue
+            for check in PROFILE_CHECKS:
+                if exact[check][index] is not None:
+                    counts[check][position] = exact[check][index]
+                    estimates[position].pop(check, None)
+            if "DIST" in escalations[position]:
+                unique[position] = (
+                    counts["NULLS"][position] == 0
+                    and counts["DIST"][position] == exact["ROWS"][index]
+                )
+                estimates[position].pop("UNIQUE", None)
 
     def _add_values(self):
+        """Find each column's most frequent values with their counts, in one scan per column group.
+
+        Columns with at most `max_distinct` values get enough counters for
+        every value, so their counts are exact and, unless sampled, all their
+        values are known. Other non-unique columns get their `top_k` most
+        frequent values, approximately.
+        """
+        with self._step("Finding most frequent values..."):
+            columns = self._top_values_columns()
+            compile, labels = self._top_values_batches(columns)
+            self._set_top_values(
+                columns, self._run_batches(len(columns), compile, labels)
+            )
+
+    def _top_values_columns(self):
+        """(position, COLUMN_NAME, k, counters) of the columns to find the most frequent values of."""
+        columns = []
+        for position, (column_name, data_type, distinct_count, unique) in enumerate(
+            zip(
+                self.stats.names,
+                self.stats.data_types,
+                self.stats.distinct,
+                self.stats.unique,
+            )
+        ):
+            if distinct_count is None or data_type in NO_TOP_VALUES_TYPES:
+                continue
+            if distinct_count <= self.max_distinct:
+                # One more than needed, so a longer result shows the estimate was low
+                k = self.max_distinct + 1
+                columns.append((position, column_name, k, 2 * k))
+            elif self.top_k and unique is not True:
+                columns.append((position, column_name, self.top_k, TOP_K_COUNTERS))
+        return columns
+
+    def _top_values_batches(self, columns):
+        """compile() and labels() for running top values queries of `columns` in batches."""
+
+        def compile(positions):
+            query = compile_top_values_query(
+                self.fq_table,
+                [columns[position][1:] for position in positions],
+                self.sample,
+                seed=self.seed,
+                view=self._is_view(),
+            )
+            return query, None
+
+        def labels(positions):
+            return dict(
+                phase="values",
+                columns=[columns[position][1] for position in positions],
+            )
+
+        return compile, labels
+
+    def _set_top_values(self, columns, results):
+        top_values = [None] * len(self.stats)
+        values = [None] * len(self.stats)
+        found = {index for positions, _, _ in results for index in positions}
+        for index, (position, _, _, _) in enumerate(columns):
+            if index not in found:
+                self.stats.add_estimate(position, VALUES_NOT_FOUND)
+                self.incomplete = True
+        for positions, _, row in results:
+            for index, result in zip(positions, row):
+                position, _, k, _ = columns[index]
+                top = [
+                    (value, int(count))
+                    for value, count in json.loads(result or "[]")
+                    if value is not None
+                ]
+                top_values[position] = top
+                if self.sample is not None:
+                    self.stats.add_estimate(position, "VALUES (sample)")
+                elif k > self.max_distinct and len(top) <= self.max_distinct:
+                    values[position] = sorted(value for value, _ in top)
+
+        self.stats.top_values = top_values
+        self.stats.values = values
+
+    def fingerprint(self):
+        """Fingerprint every column server side, in one scan per column group.
+
+        Returns the row count and, per COLUMN_NAME, its DATA_TYPE with
+        the HASH_AGG of its values, NULLS and DIST counts and, for ordered
+        types, MIN and MAX as text. No row data leaves the warehouse.
+        """
+        with query_context(table=self.fq_table):
+            self._load_columns()
+            columns = [
+                (column_name, fingerprint_checks(data_type))
+                for column_name, data_type in zip(
+                    self.stats.names, self.stats.data_types
+                )
+            ]
+
+            def compile(positions):
+                return compile_fingerprint_query(
+                    self.fq_table, [columns[position] for position in positions]
+                )
+
+            def labels(positions):
+                return dict(
+                    phase="fingerprint",
+                    columns=[columns[position][0] for position in positions],
+                )
+
+            results = self._run_batches(len(columns), compile, labels)
+
+        rows = results[0][2][0] if results else None
+        fingerprints = {
+            column_name: {"DATA_TYPE": data_type}
+            for column_name, data_type in zip(self.stats.names, self.stats.data_types)
+        }
+        for positions, layout, result in results:
+            for (index, check), value in zip(layout, result[1:]):
+                fingerprints[columns[positions[index]][0]][check] = value
+        return rows, fingerprints
+
+    def _add_incremental_profile(self):
         if self.debug == True:
-            print("Finding distinct values...", end="", flush=True)
+            print(
+                f"Profiling rows past the {self.watermark} watermark...",
+                end="",
+                flush=True,
+            )
         with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                distinct_count = row["DIST"]
-                if distinct_count <= self.max_distinct:
+            column_names = list(self.stats.names)
+            data_types = dict(zip(column_names, self.stats.data_types))
+            if self.watermark not in data_types:
+                raise ValueError(
+                    f"Watermark column {self.watermark} not found in {self.fq_table}"
+                )
 
-                    result = self.cursor.execute(
-                        f"""select listagg(distinct("{row["COLUMN_NAME"]}"), ', ') from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"""
-                    )
-                    values = result.fetchone()[0]  # type: ignore
+            state = self.incremental_store.load(self.fq_table)
+            if state is not None and (
+                state["watermark_column"] != self.watermark
+                or state["max_distinct"] != self.max_distinct
+                or sorted(state["columns"]) != sorted(column_names)
+            ):
+                # The table's columns changed, so its history has to be profiled again
+                state = None
+            if state is None:
+                state = {
+                    "watermark_column": self.watermark,
+                    "watermark": None,
+                    "max_distinct": self.max_distinct,
+                    "rows": 0,
+                    "columns": {
+                        column_name: {
+                            "NULLS": 0,
+                            "EMPTY_STRINGS": 0,
+                            "ZEROS": 0,
+                            "SKETCH": None,
+                            "VALUES": [],
+                        }
+                        for column_name in column_names
+                    },
+                }
+
+            columns = [
+                (column_name, column_checks(data_types[column_name]))
+                for column_name in column_names
+            ]
+            query, params, layout = compile_increment_query(
+                self.fq_table,
+                columns,
+                self.watermark,
+                data_types[self.watermark],
+                self.max_distinct,
+                since=state["watermark"],
+            )
+            with query_context(phase="incremental", columns=column_names):
+                result = self.executor.submit(query, params).result()[0]
+
+            self.profiled_rows = result[0]
+            state["rows"] += result[0]
+            if result[1] is not None:
+                state["watermark"] = result[1]
 
-                    self.column_info.at[index, "VALUES"] = values
+            new_sketches = [None] * len(columns)
+            for (position, check), value in zip(layout, result[2:]):
+                column_state = state["columns"][column_names[position]]
+                if check == "SKETCH":
+                    new_sketches[position] = value
+                elif check == "VALUES":
+                    if column_state["VALUES"] is None or value is None:
+                        column_state["VALUES"] = None
+                    else:
+                        values = set(column_state["VALUES"]) | set(json.loads(value))
+                        column_state["VALUES"] = (
+                            sorted(values) if len(values) <= self.max_distinct else None
+                        )
                 else:
-                    self.column_info.at[index, "VALUES"] = (
-                        f"> {self.max_distinct} values"
-                    )
+                    column_state[check] += value
 
-    def _add_unique(self):
-        if self.debug == True:
-            print("Checking if column is unique...", end="", flush=True)
-        with Timer(output=self.debug):
-            for index, row in self.column_info.iterrows():
-                result = self.cursor.execute(
-                    f"""select case when count(1) = count(distinct "{row["COLUMN_NAME"]}") then true else false end from {self.snowflake_database}.{self.snowflake_schema}.{self.snowflake_table}"""
+            distinct = self._merge_sketches(column_names, state, new_sketches)
+
+        self.incremental_store.save(self.fq_table, state)
+        self.total_rows = state["rows"]
+
+        counts = {check: [None] * len(columns) for check in ["ROWS"] + PROFILE_CHECKS}
+        for position, (column_name, checks) in enumerate(columns):
+            counts["ROWS"][position] = state["rows"]
+            counts["DIST"][position] = distinct[position]
+            for check in checks:
+                if check != "DIST":
+                    counts[check][position] = state["columns"][column_name][check]
+        # Confirming uniqueness exactly would scan the whole table on every run,
+        # so near-unique columns stay labelled as unconfirmed estimates
+        unique, estimates, _ = self._estimate_profile(counts, approx=True, sample=None)
+        self._store_profile(counts, unique, estimates)
+
+        # Sets of values merge across runs, their frequencies don't
+        self.stats.values = [
+            state["columns"][column_name]["VALUES"] for column_name in column_names
+        ]
+        self.stats.top_values = [None] * len(column_names)
+
+    def _merge_sketches(self, column_names, state, new_sketches):
+        """Fold each column's new HLL sketch into its stored one and estimate its distinct count."""
+        sketches = [
+            [
+                sketch
+                for sketch in [state["columns"][column_name]["SKETCH"], new_sketch]
+                if sketch is not None
+            ]
+            for column_name, new_sketch in zip(column_names, new_sketches)
+        ]
+
+        groups = []
+        group_bytes = 0
+        for position, column_sketches in enumerate(sketches):
+            if not column_sketches:
+                continue
+            sketch_bytes = sum(len(sketch) for sketch in column_sketches)
+            if not groups or group_bytes + sketch_bytes > MAX_SKETCH_BYTES_PER_QUERY:
+                groups.append([])
+                group_bytes = 0
+            groups[-1].append(position)
+            group_bytes += sketch_bytes
+
+        futures = []
+        for group in groups:
+            with query_context(
+                phase="sketch_merge",
+                columns=[column_names[position] for position in group],
+            ):
+                futures.append(
+                    self.executor.submit(
+                        *compile_sketch_merge_query(
+                            [sketches[position] for position in group]
+                        )
+                    )
                 )
 
-                self.column_info.at[index, "UNIQUE"] = result.fetchone()[0]  # type: ignore
+        distinct = [0] * len(column_names)
+        for group, future in zip(groups, futures):
+            for position, merged in zip(group, future.result()[0]):
+                merged = json.loads(merged)
+                state["columns"][column_names[position]]["SKETCH"] = json.dumps(
+                    merged["sketch"]
+                )
+                distinct[position] = merged["estimate"]
+        return distinct
@@ -0,0 +1,179 @@
+import collections
+from concurrent.futures import FIRST_COMPLETED, wait
+from snowflake_tools.QueryTrace import query_context
+from snowflake_tools.profile_sql import (
+    NUMERIC_KEY_TYPES,
+    compile_diff_bounds_query,
+    compile_diff_buckets_query,
+    compile_diff_rows_query,
+    diff_key_expression,
+)
+
+
+class TableDiff:
+    """Finds the rows that differ between two SnowflakeTables without fetching either table.
+
+    Both tables are split into `segments` ranges of the `key` column, and
+    each range's row count and HASH_AGG of its rows are compared server
+    side. Ranges that match are done; ranges that don't are split again,
+    until a range holds at most `bucket_rows` rows. Only then are the key
+    and a hash of each row in the range fetched, and compared locally.
+    Ranges are worked on concurrently through each table's executor.
+
+    diff() yields ("-", key) for rows only in the left table, ("+", key)
+    for rows only in the right one and ("!", key) for rows that changed, as
+    soon as the range holding them is done. Columns in only one table are
+    not compared. Rows with a null key can't be matched up; null_keys holds
+    their count in each table after diff() starts.
+    """
+
+    def __init__(self, left, right, key, segments=16, bucket_rows=10000):
+        if segments < 2:
+            raise ValueError("segments must be at least 2")
+        self.left = left
+        self.right = right
+        self.key = key
+        self.segments = segments
+        self.bucket_rows = bucket_rows
+        self.null_keys = None
+        self.column_names = None
+        self.key_expression = None
+
+    def _prepare(self):
+        with query_context(phase="metadata"):
+            for table in (self.left, self.right):
+                table._load_columns()
+        left_types = dict(zip(self.left.stats.names, self.left.stats.data_types))
+        right_types = dict(zip(self.right.stats.names, self.right.stats.data_types))
+        if self.key not in left_types and self.key.upper() in left_types:
+            self.key = self.key.upper()
+        for table, types in ((self.left, left_types), (self.right, right_types)):
+            if self.key not in types:
+                raise ValueError(f"{table.fq_table} has no column {self.key}")
+        self.column_names = [
+            column_name for column_name in left_types if column_name in right_types
+        ]
+        # Both sides must split on the same expression for their ranges to line up
+        data_type = left_types[self.key]
+        if right_types[self.key] not in NUMERIC_KEY_TYPES:
+            data_type = right_types[self.key]
+        self.key_expression = diff_key_expression(self.key, data_type)
+
+    def _submit(self, compile):
+        """Run compile(fq_table) on both tables; returns their futures."""
+        return [
+            table.executor.submit(compile(table.fq_table))
+            for table in (self.left, self.right)
+        ]
+
+    def _submit_buckets(self, low, high):
+        boundaries = sorted(
+            {
+                low + (high - low) * index // self.segments
+                for index in range(self.segments + 1)
+            }
+        )
+        with query_context(phase="diff_ranges"):
+            futures = self._submit(
+                lambda fq_table: compile_diff_buckets_query(
+                    fq_table,
+                    self.key,
+                    self.key_expression,
+                    self.column_names,
+                    boundaries,
+                )
+            )
+        return ("ranges", boundaries, *futures)
+
+    def _submit_rows(self, low, high):
+        with query_context(phase="diff_rows"):
+            futures = self._submit(
+                lambda fq_table: compile_diff_rows_query(
+                    fq_table,
+                    self.key,
+                    self.key_expression,
+                    self.column_names,
+                    low,
+                    high,
+                )
+            )
+        return ("rows", (low, high), *futures)
+
+    def diff(self):
+        self._prepare()
+        with query_context(phase="diff_bounds"):
+            bounds = [
+                future.result()[0]
+                for future in self._submit(
+                    lambda fq_table: compile_diff_bounds_query(
+                        fq_table, self.key, self.key_expression
+                    )
+                )
+            ]
+        self.null_keys = tuple(int(nulls) for nulls, _, _ in bounds)
+        lows = [low for _, low, _ in bounds if low is not None]
+        if not lows:
+            return
+        low = int(min(lows))
+        high = int(max(high for _, _, high in bounds if high is not None)) + 1
+
+        running = [self._submit_buckets(low, high)]
+        try:
+            while running:
+                wait(
+                    [
+                        future
+                        for task in running
+                        for future in task[2:]
+                        if not future.done()
+                    ],
+                    return_when=FIRST_COMPLETED,
+                )
+                for task in [
+                    task for task in running if all(f.done() for f in task[2:])
+                ]:
+                    running.remove(task)
+                    kind, boundaries, left, right = task
+                    if kind == "rows":
+                        yield from self._diff_rows(left.result(), right.result())
+                        continue
+                    for low, high, rows in self._mismatched_ranges(
+                        boundaries, left.result(), right.result()
+                    ):
+                        if rows <= self.bucket_rows or high - low <= 1:
+                            running.append(self._submit_rows(low, high))
+                        else:
+                            running.append(self._submit_buckets(low, high))
+        finally:
+            # The caller stopped early or a query failed; stop the other queries
+            self.left.executor.cancel([task[2] for task in running])
+            self.right.executor.cancel([task[3] for task in running])
+
+    @staticmethod
+    def _mismatched_ranges(boundaries, left_rows, right_rows):
+        """(low, high, most rows on either side) of each range whose count or hash differ."""
+        left = {int(bucket): (count, hash) for bucket, count, hash in left_rows}
+        right = {int(bucket): (count, hash) for bucket, count, hash in right_rows}
+        for index in sorted(set(left) | set(right)):
+            if left.get(index) != right.get(index):
+                yield (
+                    boundaries[index],
+                    boundaries[index + 1],
+                    max(left.get(index, (0,))[0], right.get(index, (0,))[0]),
+                )
+
+    @staticmethod
+    def _diff_rows(left_rows, right_rows):
+        left = collections.defaultdict(collections.Counter)
+        right = collections.defaultdict(collections.Counter)
+        for rows, hashes in ((left_rows, left), (right_rows, right)):
+            for key, row_hash in rows:
+                hashes[key][row_hash] += 1
+        for key in left:
+            if key not in right:
+                yield "-", key
+            elif left[key] != right[key]:
+                yield "!", key
+        for key in right:
+            if key not in left:
+                yield "+", key
@@ -0,0 +1,204 @@
+import sys
+import time
+import queue
+import threading
+from fnmatch import fnmatchcase
+from glob import has_magic
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+from snowflake_tools.QueryTrace import query_context
+
+# A table that failed to profile is retried after this many seconds, doubling
+# with every failure up to MAX_RETRY_DELAY, or as soon as its LAST_ALTERED changes
+RETRY_DELAY = 300
+MAX_RETRY_DELAY = 24 * 3600
+
+
+class TableWatcher:
+    """Keeps the profiles of a set of tables fresh, re-profiling only the tables that changed.
+
+    Each poll reads LAST_ALTERED, ROW_COUNT and BYTES of the tables matching
+    `matches` (DATABASE[.SCHEMA[.TABLE]] patterns with * and ? wildcards)
+    with one INFORMATION_SCHEMA.TABLES query per database. A table whose
+    current state has no profile in the ProfileCache is queued. Tables not
+    profiled since the watcher started go first, then the ones profiled
+    longest ago, smaller before larger. `max_workers` tables are profiled
+    at a time, their queries sharing one executor.
+
+    Profiles are stored in the ProfileCache, so snowflake-analyze-table and
+    snowflake-analyze-schema run with the same profiling options read them
+    instead of scanning. With `refresh`, every table is profiled again once
+    even if its cached profile is current. A table that fails to profile is
+    not queued again until it changes or its retry delay, which doubles with
+    each failure, has passed. Views have no change state and are not watched.
+    """
+
+    def __init__(
+        self,
+        config,
+        matches,
+        connection,
+        executor,
+        cache,
+        catalog=None,
+        max_workers=4,
+        refresh=False,
+        table_options=None,
+        output=sys.stderr,
+    ):
+        self.config = config
+        self.matches = []
+        for match in matches:
+            parts = match.upper().split(".")
+            if len(parts) > 3:
+                raise ValueError(f"Expected DATABASE[.SCHEMA[.TABLE]], got: {match}")
+            self.matches.append(tuple((parts + ["*", "*"])[:3]))
+        self.connection = connection
+        self.executor = executor
+        self.cache = cache
+        self.catalog = catalog
+        self.max_workers = max_workers
+        self.refresh = refresh
+        self.table_options = table_options or {}
+        self.output = output
+        self._queue = queue.PriorityQueue()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._profiled_at = {}
+        # fq_table: (LAST_ALTERED, failures in a row, time.time() to retry at)
+        self._failures = {}
+
+    def _table(self, fq_table):
+        return SnowflakeTable(
+            fq_table,
+            self.config,
+            connection=self.connection,
+            executor=self.executor,
+            cache=self.cache,
+            catalog=self.catalog,
+            refresh=self.refresh,
+            **self.table_options,
+        )
+
+    def _databases(self, cursor):
+        """The watched databases, each with its (schema, table) patterns."""
+        databases = {}
+        names = None
+        for database, schema, table in self.matches:
+            if has_magic(database):
+                if names is None:
+                    cursor.execute("show terse databases")
+                    names = [row[1] for row in cursor.fetchall()]
+                matching = [name for name in names if fnmatchcase(name, database)]
+            else:
+                matching = [database]
+            for name in matching:
+                databases.setdefault(name, []).append((schema, table))
+        return databases
+
+    def poll(self):
+        """Queue every watched table whose profile is out of date; returns how many were queued."""
+        cursor = self.connection.cursor()
+        queued = 0
+        with query_context(phase="watch"):
+            for database, patterns in sorted(self._databases(cursor).items()):
+                states = ProfileCache.table_states(cursor, database)
+                changed = 0
+                for (schema, name), state in sorted(states.items()):
+                    if not any(
+                        fnmatchcase(schema, schema_pattern)
+                        and fnmatchcase(name, table_pattern)
+                        for schema_pattern, table_pattern in patterns
+                    ):
+                        continue
+                    fq_table = f"{database}.{schema}.{name}"
+                    with self._lock:
+                        if fq_table in self._pending:
+                            continue
+                        failure = self._failures.get(fq_table)
+                    if (
+                        failure is not None
+                        and failure[0] == state[0]
+                        and time.time() < failure[2]
+                    ):
+                        continue
+                    refreshed = not self.refresh or fq_table in self._profiled_at
+                    if refreshed and self.cache.contains(
+                        self._table(fq_table).profile_key(state)
+                    ):
+                        continue
+                    with self._lock:
+                        self._pending.add(fq_table)
+                    priority = (self._profiled_at.get(fq_table, 0), state[2] or 0)
+                    self._queue.put((priority, fq_table, state[0]))
+                    changed += 1
+                if changed and self.catalog is not None:
+                    # Changed tables may have new columns
+                    self.catalog.refresh(cursor, database)
+                queued += changed
+        return queued
+
+    def _work(self):
+        while True:
+            _, fq_table, last_altered = self._queue.get()
+            start_time = time.time()
+            try:
+                table = self._table(fq_table)
+                table.analyze()
+                self._profiled_at[fq_table] = time.time()
+                with self._lock:
+                    self._failures.pop(fq_table, None)
+                print(
+                    f"{time.strftime('%H:%M:%S')} {fq_table}: {table.total_rows:,} rows profiled in {time.time() - start_time:.1f}s",
+                    file=self.output,
+                    flush=True,
+                )
+            except Exception as e:
+                delay = self._failed(fq_table, last_altered)
+                print(
+                    f"{time.strftime('%H:%M:%S')} {fq_table}: {e} (retrying in {delay:.0f}s or once it changes)",
+                    file=self.output,
+                    flush=True,
+                )
+            finally:
+                with self._lock:
+                    self._pending.discard(fq_table)
+                self._queue.task_done()
+
+    def _failed(self, fq_table, last_altered):
+        """Record a failure to profile the table as of `last_altered`; returns the delay until it is retried."""
+        with self._lock:
+            failure = self._failures.get(fq_table)
+            failures = 0
+            if failure is not None and failure[0] == last_altered:
+                failures = failure[1]
+            delay = min(RETRY_DELAY * 2**failures, MAX_RETRY_DELAY)
+            self._failures[fq_table] = (last_altered, failures + 1, time.time() + delay)
+        return delay
+
+    def run(self, interval=300, once=False):
+        """Poll every `interval` seconds until interrupted; with `once`, poll, profile and return."""
+        for _ in range(self.max_workers):
+            threading.Thread(target=self._work, daemon=True).start()
+        while True:
+            start_time = time.time()
+            try:
+                queued = self.poll()
+            except Exception as e:
+                # A failed poll is retried on the next tick rather than stopping the watch
+                print(
+                    f"{time.strftime('%H:%M:%S')} Poll failed: {e}",
+                    file=self.output,
+                    flush=True,
+                )
+                queued = 0
+            if queued:
+                print(
+                    f"{time.strftime('%H:%M:%S')} {queued} changed tables queued",
+                    file=self.output,
+                    flush=True,
+                )
+            if once:
+                self._queue.join()
+                return
+            time.sleep(max(0, interval - (time.time() - start_time)))
@@ -0,0 +1,217 @@
+import os, sys, argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatchcase
+from glob import has_magic
+from importlib.metadata import version
+from snowflake_tools import snowflake_config
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.analyze_table import render_analysis
+from snowflake_tools.ProfileWriter import ProfileWriter, FORMATS, BINARY_FORMATS
+from snowflake_tools.QueryTrace import (
+    add_profile_arguments,
+    add_trace_arguments,
+    start_trace,
+    finish_trace,
+)
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+snowflake_tools_version = version("snowflake-tools")
+
+
+def find_tables(cursor, match):
+    """List DATABASE.SCHEMA.TABLE names matching a pattern such as BD_DEV_PRD.STG_*."""
+    parts = match.upper().split(".")
+    if len(parts) > 3:
+        raise ValueError(f"Expected DATABASE[.SCHEMA[.TABLE]], got: {match}")
+    database, schema, table = (parts + ["*", "*"])[:3]
+
+    if has_magic(database):
+        cursor.execute("show terse databases")
+        databases = [
+            row[1] for row in cursor.fetchall() if fnmatchcase(row[1], database)
+        ]
+    else:
+        databases = [database]
+
+    tables = []
+    for database in sorted(databases):
+        query = f"""select table_schema, table_name from {database}.INFORMATION_SCHEMA.TABLES
+            where table_schema <> 'INFORMATION_SCHEMA'"""
+        params = None
+        if not has_magic(schema):
+            query += " and table_schema = %s"
+            params = (schema,)
+        cursor.execute(query + " order by 1, 2", params)
+        tables += [
+            f"{database}.{table_schema}.{table_name}"
+            for table_schema, table_name in cursor.fetchall()
+            if fnmatchcase(table_schema, schema) and fnmatchcase(table_name, table)
+        ]
+    return tables
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description=f"Analyze every Snowflake table in a database or schema v{snowflake_tools_version}.",
+        epilog="Example: snowflake-analyze-schema --profile bd --match 'FIVETRAN_DATABASE.MYSQL_*' --output profiles.txt",
+    )
+
+    parser.add_argument(
+        "--profile",
+        help="Profile name",
+        required=True,
+    )
+
+    parser.add_argument(
+        "--match",
+        help="DATABASE, DATABASE.SCHEMA or DATABASE.SCHEMA.TABLE; each part may use * and ? wildcards",
+        required=True,
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Write results to this file instead of stdout (required for parquet and arrow)",
+    )
+
+    parser.add_argument(
+        "--format",
+        help="Output format: text (default), or parquet, arrow, jsonl or csv with one row per column of every table",
+        choices=FORMATS,
+        default="text",
+    )
+
+    parser.add_argument(
+        "--max-workers",
+        help="Number of tables profiled at the same time (default: 4)",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of queries running at the same time across all tables (default: 8)",
+        type=int,
+        default=8,
+    )
+
+    add_profile_arguments(parser)
+
+    parser.add_argument(
+        "--deadline",
+        help="Seconds to spend profiling each table; then its running queries are cancelled and the statistics found so far kept",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--statement-timeout",
+        help="Seconds each query may run before it is cancelled; columns too slow to profile on their own are left out",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--explain",
+        help="Print the chosen profiling plan and its estimated cost before running it",
+        action="store_true",
+    )
+
+    add_trace_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.format in BINARY_FORMATS and not args.output:
+        parser.error(f"--format {args.format} requires --output")
+
+    config = snowflake_config.get_profile(args.profile)
+    trace = start_trace(args, config)
+    connection = ConnectionPool.get(config).connection
+    executor = QueryExecutor(connection, args.max_in_flight)
+    cache = None if args.no_cache else ProfileCache()
+    catalog = None if args.no_catalog else MetadataCatalog.for_profile(config)
+
+    try:
+        tables = find_tables(connection.cursor(), args.match)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    print(f"Profiling {len(tables)} tables...", file=sys.stderr)
+
+    def analyze(fq_table):
+        start_time = time.time()
+        table = SnowflakeTable(
+            fq_table,
+            config,
+            approx=args.approx,
+            sample=args.sample,
+            escalate=not args.no_escalate,
+            connection=connection,
+            executor=executor,
+            cache=cache,
+            refresh=args.refresh,
+            catalog=catalog,
+            budget=args.budget,
+            top_k=args.top_k,
+            statement_timeout=args.statement_timeout,
+            deadline=args.deadline,
+        )
+        plan = table.plan_profile().explain() + "\n" if args.explain else ""
+        table.analyze()
+        if args.format != "text":
+            if plan:
+                print(f"{fq_table}\n{plan}", file=sys.stderr)
+            return table, time.time() - start_time
+        return plan + render_analysis(table), time.time() - start_time
+
+    if args.format != "text":
+        output = ProfileWriter(args.output, args.format)
+    else:
+        output = open(args.output, "w") if args.output else sys.stdout
+    failures = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.max_workers) as workers:
+            futures = {
+                workers.submit(analyze, fq_table): fq_table for fq_table in tables
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    fq_table = futures[future]
+                    try:
+                        result, elapsed_time = future.result()
+                    except Exception as e:
+                        failures += 1
+                        print(
+                            f"[{done}/{len(tables)}] {fq_table} failed: {e}",
+                            file=sys.stderr,
+                        )
+                        continue
+                    if args.format != "text":
+                        output.write(result)
+                    else:
+                        output.write(f"\n{fq_table}\n{'=' * len(fq_table)}\n{result}\n")
+                        output.flush()
+                    print(
+                        f"[{done}/{len(tables)}] {fq_table} ({elapsed_time:.1f} seconds)",
+                        file=sys.stderr,
+                    )
+            except KeyboardInterrupt:
+                # Tables are profiled on worker threads, so cancel their queries here
+                workers.shutdown(wait=False, cancel_futures=True)
+                executor.cancel()
+                print("\nInterrupted; running queries were cancelled", file=sys.stderr)
+                sys.exit(130)
+    finally:
+        executor.close()
+        if output is not sys.stdout:
+            output.close()
+        # QUERY_HISTORY is read through a database the tables were found in
+        database = args.match.split(".")[0]
+        databases = [] if has_magic(database) else [database]
+        databases += [fq_table.split(".")[0] for fq_table in tables]
+        finish_trace(trace, args, config, *databases)
+
+    if failures:
+        sys.exit(1)
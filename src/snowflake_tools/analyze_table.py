@@ -1,11 +1,19 @@
-import os, argparse
-import snowflake.connector
+import os, sys, argparse
 from snowflake_tools import snowflake_config
-import pkg_resources
-from snowflake_tools.SnowflakeTable import SnowflakeTable
+from importlib.metadata import version
+from snowflake_tools.SnowflakeTable import SnowflakeTable, TableNotFoundError
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.ProfileWriter import ProfileWriter, FORMATS, BINARY_FORMATS
+from snowflake_tools.QueryTrace import (
+    add_profile_arguments,
+    add_trace_arguments,
+    start_trace,
+    finish_trace,
+)
 
 project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-version = pkg_resources.get_distribution("snowflake-tools").version
+snowflake_tools_version = version("snowflake-tools")
 
 
 def dump(obj):
@@ -13,9 +21,69 @@ def dump(obj):
         print("obj.%s = %r" % (attr, getattr(obj, attr)))
 
 
+# Shown for the empty string among a column's values
+EMPTY_VALUE = "''"
+
+
+def format_values(row, max_distinct):
+    """VALUES of one column for display: its values, with counts where known."""
+    import pandas as pd
+
+    if isinstance(row.TOP_VALUES, list):
+        counts = [
+            f"{value or EMPTY_VALUE} ({count:,})" for value, count in row.TOP_VALUES
+        ]
+    elif isinstance(row.VALUES, list):
+        counts = [value or EMPTY_VALUE for value in row.VALUES]
+    else:
+        return f"> {max_distinct} values" if not pd.isna(row.DIST) else ""
+    if not pd.isna(row.DIST) and row.DIST > max_distinct:
+        return f"> {max_distinct} values, top: {', '.join(counts)}"
+    return ", ".join(counts)
+
+
+def format_count(count):
+    return "unknown (timed out)" if count is None else f"{count:,}"
+
+
+def render_analysis(table):
+    columns = [
+        "COLUMN_NAME",
+        "DATA_TYPE",
+        "NULLS",
+        "EMPTY_STRINGS",
+        "ZEROS",
+        "DIST",
+        "UNIQUE",
+        "VALUES",
+    ]
+    if table.approx or table.sample or table.watermark or table.incomplete:
+        columns.append("ESTIMATED")
+
+    lines = [f"\nTotal rows: {format_count(table.total_rows)}\n"]
+    if table.sample:
+        lines.append(f"Profiled rows (sample): {format_count(table.profiled_rows)}\n")
+    if table.watermark:
+        lines.append(f"New rows profiled: {table.profiled_rows:,}\n")
+    if table.incomplete:
+        lines.append("Incomplete: timed out before every column was profiled\n")
+    frame = table.to_pandas()
+    frame["VALUES"] = [
+        format_values(row, table.max_distinct) for row in frame.itertuples()
+    ]
+    lines.append(
+        frame[columns]
+        .sort_values(by="COLUMN_NAME")
+        .astype(object)
+        .where(lambda frame: frame.notna(), "")
+        .to_markdown(index=False, tablefmt="simple")
+    )
+    return "\n".join(lines)
+
+
 def cli():
     parser = argparse.ArgumentParser(
-        description=f"Analyze Snowflake Table v{version}.",
+        description=f"Analyze Snowflake Table v{snowflake_tools_version}.",
         epilog="Example: snowflake-analyze-table --profile bd --table FIVETRAN_DATABASE.MYSQL_LOTTERY_PROD.NLDLS_DLSLOT_ENTRIES",
     )
 
@@ -29,8 +97,74 @@ def cli():
         "--table", help="Fully qualified table or view name", required=True
     )
 
+    add_profile_arguments(parser)
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of queries running at the same time (default: 4)",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--columns-per-query",
+        help="Split profiling into concurrent queries of this many columns each (default: spread over --max-in-flight queries)",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--incremental-column",
+        help="Only profile rows past the last run's high-water mark of this column (append-only tables)",
+    )
+
+    parser.add_argument(
+        "--reset-incremental",
+        help="Forget the stored incremental state and profile the whole table again",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--explain",
+        help="Print the chosen profiling plan and its estimated cost before running it",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        help="Seconds to spend profiling; then running queries are cancelled and the statistics found so far shown",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--statement-timeout",
+        help="Seconds each query may run before it is cancelled; columns too slow to profile on their own are left out",
+        type=float,
+    )
+
+    parser.add_argument(
+        "--format",
+        help="Output format: text (default), or parquet, arrow, jsonl or csv with one row per column",
+        choices=FORMATS,
+        default="text",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Write results to this file instead of stdout (required for parquet and arrow)",
+    )
+
+    add_trace_arguments(parser)
+
     args = parser.parse_args()
 
+    if args.format in BINARY_FORMATS and not args.output:
+        parser.error(f"--format {args.format} requires --output")
+
+    if args.incremental_column and (args.deadline or args.statement_timeout):
+        parser.error(
+            "--deadline and --statement-timeout do not apply to --incremental-column"
+        )
+
     # args = parser.parse_args(['BD_DEV_PRD.MTWOMEY.STG_LT__ENTRIES_CURRENT'])
 
     if args.table is None:
@@ -44,36 +178,52 @@ def cli():
             )
             exit()
 
+        trace = start_trace(args, config)
         table = SnowflakeTable(
             # SNOWFLAKE_TABLE,
             args.table,
-            {
-                "user": config["user"],
-                "password": config["password"],
-                "account": config["account"],
-                "role": config["role"],
-                "private_key_path": config["private_key_path"],
-                "warehouse": config["warehouse"],
-            },
-            debug=True,
+            config,
+            approx=args.approx,
+            sample=args.sample,
+            escalate=not args.no_escalate,
+            max_in_flight=args.max_in_flight,
+            columns_per_query=args.columns_per_query,
+            cache=None if args.no_cache else ProfileCache(),
+            refresh=args.refresh,
+            catalog=None if args.no_catalog else MetadataCatalog.for_profile(config),
+            watermark=args.incremental_column,
+            budget=args.budget,
+            top_k=args.top_k,
+            statement_timeout=args.statement_timeout,
+            deadline=args.deadline,
+            # Progress would be mixed into jsonl or csv on stdout
+            debug=args.format == "text",
         )
 
-        table.analyze()
-
-        print(f"\nTotal rows: {table.total_rows:,}\n")
-        print(
-            table.column_info[
-                [
-                    "COLUMN_NAME",
-                    "DATA_TYPE",
-                    "NULLS",
-                    "EMPTY_STRINGS",
-                    "ZEROS",
-                    "DIST",
-                    "UNIQUE",
-                    "VALUES",
-                ]
-            ]
-            .sort_values(by="COLUMN_NAME")
-            .to_markdown(index=False, tablefmt="simple")
-        )
+        try:
+            if args.explain:
+                print(
+                    table.plan_profile().explain(),
+                    file=sys.stdout if args.format == "text" else sys.stderr,
+                )
+
+            if args.reset_incremental:
+                table.incremental_store.reset(table.fq_table)
+
+            table.analyze()
+        except TableNotFoundError as e:
+            print(e)
+            exit()
+        except KeyboardInterrupt:
+            print("\nInterrupted; running queries were cancelled", file=sys.stderr)
+            sys.exit(130)
+
+        if args.format != "text":
+            with ProfileWriter(args.output, args.format) as writer:
+                writer.write(table)
+        elif args.output:
+            with open(args.output, "w") as file:
+                file.write(render_analysis(table) + "\n")
+        else:
+            print(render_analysis(table))
+        finish_trace(trace, args, config, table.snowflake_database)
@@ -0,0 +1,232 @@
+import os, sys, argparse
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version
+from snowflake_tools import snowflake_config
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.SnowflakeTable import SnowflakeTable, TableNotFoundError
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.TableDiff import TableDiff
+from snowflake_tools.QueryTrace import (
+    add_trace_arguments,
+    fetch_session_history,
+    start_trace,
+    finish_trace,
+)
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+snowflake_tools_version = version("snowflake-tools")
+
+FINGERPRINT_CHECKS = ["DATA_TYPE", "HASH", "NULLS", "DIST", "MIN", "MAX"]
+
+
+def compare_fingerprints(left, right):
+    """List what differs between two SnowflakeTable.fingerprint() results.
+
+    Returns (COLUMN_NAME, CHECK, LEFT, RIGHT) tuples: the row count under
+    an empty COLUMN_NAME, then every check of every column that differs, in
+    the left table's column order. A column missing on one side is reported
+    once with CHECK "COLUMN".
+    """
+    left_rows, left_columns = left
+    right_rows, right_columns = right
+    differences = []
+    if left_rows != right_rows:
+        differences.append(("", "ROWS", left_rows, right_rows))
+    for column_name in list(left_columns) + [
+        column_name for column_name in right_columns if column_name not in left_columns
+    ]:
+        if column_name not in right_columns or column_name not in left_columns:
+            differences.append(
+                (
+                    column_name,
+                    "COLUMN",
+                    "present" if column_name in left_columns else "missing",
+                    "present" if column_name in right_columns else "missing",
+                )
+            )
+            continue
+        for check in FINGERPRINT_CHECKS:
+            left_value = left_columns[column_name].get(check)
+            right_value = right_columns[column_name].get(check)
+            if left_value != right_value:
+                differences.append((column_name, check, left_value, right_value))
+    return differences
+
+
+def render_comparison(left_table, right_table, left, right, differences):
+    from tabulate import tabulate
+
+    lines = [
+        f"\n{left_table}: {left[0]:,} rows, {len(left[1])} columns",
+        f"{right_table}: {right[0]:,} rows, {len(right[1])} columns\n",
+    ]
+    if not differences:
+        lines.append("No differences found")
+        return "\n".join(lines)
+
+    columns = sorted({column_name for column_name, _, _, _ in differences} - {""})
+    lines.append(f"{len(columns)} columns differ\n")
+    lines.append(
+        tabulate(
+            [
+                ("" if value is None else value for value in difference)
+                for difference in differences
+            ],
+            headers=["COLUMN_NAME", "CHECK", left_table, right_table],
+            tablefmt="simple",
+            disable_numparse=True,
+        )
+    )
+    return "\n".join(lines)
+
+
+def print_row_differences(table_diff, limit):
+    """Print the differing rows' keys as they are found: - left only, + right only, ! changed."""
+    print(
+        f"\nRows that differ by {table_diff.key} (- {table_diff.left.fq_table} only, + {table_diff.right.fq_table} only, ! changed):",
+        flush=True,
+    )
+    count = 0
+    for status, key in table_diff.diff():
+        print(f"{status} {key}", flush=True)
+        count += 1
+        if count == limit:
+            print(f"Stopped after {limit} rows")
+            break
+    if count == 0:
+        print("None in the columns both tables have")
+    left_nulls, right_nulls = table_diff.null_keys or (0, 0)
+    if left_nulls or right_nulls:
+        print(
+            f"Rows with a null {table_diff.key} are not compared: {left_nulls:,} and {right_nulls:,}"
+        )
+
+
+def compare(args, configs):
+    tables = [
+        SnowflakeTable(
+            fq_table,
+            config,
+            max_in_flight=args.max_in_flight,
+            columns_per_query=args.columns_per_query,
+            catalog=None if args.no_catalog else MetadataCatalog.for_profile(config),
+        )
+        for fq_table, config in zip([args.table, args.other_table], configs)
+    ]
+
+    # Both sides scan at the same time, each in its own queries
+    print("Fingerprinting both tables...", file=sys.stderr)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as workers:
+            left, right = workers.map(lambda table: table.fingerprint(), tables)
+    except TableNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    differences = compare_fingerprints(left, right)
+    print(
+        render_comparison(
+            tables[0].fq_table, tables[1].fq_table, left, right, differences
+        )
+    )
+    if differences and args.key:
+        try:
+            print_row_differences(
+                TableDiff(*tables, args.key, bucket_rows=args.bucket_rows), args.limit
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+    # Like diff, so scripts and CI jobs can check the result
+    sys.exit(1 if differences else 0)
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description=f"Compare two Snowflake tables by per-column fingerprints v{snowflake_tools_version}.",
+        epilog="Example: snowflake-compare-tables --profile bd --table BD_DEV_PRD.MTWOMEY.STG_LT__ENTRIES --other-table BD_PRD.STAGING.STG_LT__ENTRIES",
+    )
+
+    parser.add_argument(
+        "--profile",
+        help="Profile name",
+        required=True,
+    )
+
+    parser.add_argument(
+        "--table", help="Fully qualified table or view name", required=True
+    )
+
+    parser.add_argument(
+        "--other-table",
+        help="Fully qualified name of the table or view to compare it with",
+        required=True,
+    )
+
+    parser.add_argument(
+        "--other-profile",
+        help="Profile to read --other-table with (default: --profile)",
+    )
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of queries running at the same time per table (default: 4)",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--columns-per-query",
+        help="Split fingerprinting into concurrent queries of this many columns each (default: spread over --max-in-flight queries)",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--key",
+        help="When the tables differ, list the rows that differ, matched on this key column",
+    )
+
+    parser.add_argument(
+        "--bucket-rows",
+        help="With --key, fetch row hashes once a differing key range has at most this many rows (default: 10000)",
+        type=int,
+        default=10000,
+    )
+
+    parser.add_argument(
+        "--limit",
+        help="With --key, stop after this many differing rows (default: 1000, 0 for all)",
+        type=int,
+        default=1000,
+    )
+
+    parser.add_argument(
+        "--no-catalog",
+        help="Look up columns in INFORMATION_SCHEMA instead of the local metadata catalog",
+        action="store_true",
+    )
+
+    add_trace_arguments(parser)
+
+    args = parser.parse_args()
+
+    configs = [
+        snowflake_config.get_profile(args.profile),
+        snowflake_config.get_profile(args.other_profile or args.profile),
+    ]
+    trace = start_trace(args, configs[0])
+    other_pool = ConnectionPool.get(configs[1])
+    other_session = other_pool is not ConnectionPool.get(configs[0])
+    if trace is not None and other_session:
+        # --other-profile logs in separately; its queries go in the same trace
+        other_pool.trace = trace
+    try:
+        compare(args, configs)
+    finally:
+        if trace is not None and other_session:
+            other_pool.trace = None
+            if args.trace_history:
+                fetch_session_history(
+                    trace, other_pool, [args.other_table.split(".")[0]]
+                )
+        finish_trace(trace, args, configs[0], args.table.split(".")[0])
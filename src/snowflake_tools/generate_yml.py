@@ -1,12 +1,26 @@
-import os, argparse
-import threading
+import os, sys, argparse
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from glob import has_magic
 from snowflake_tools import snowflake_config
-import pkg_resources
+from importlib.metadata import version
 from snowflake_tools.SnowflakeTable import SnowflakeTable
-import yaml
+from snowflake_tools.KeyFinder import KeyFinder
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.analyze_schema import find_tables
+from snowflake_tools.QueryTrace import (
+    add_profile_arguments,
+    add_trace_arguments,
+    start_trace,
+    finish_trace,
+)
 
 project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-version = pkg_resources.get_distribution("snowflake-tools").version
+snowflake_tools_version = version("snowflake-tools")
 
 
 def dump(obj):
@@ -20,9 +34,221 @@ def is_mixed_case(input_str):
     )
 
 
+# Tests this tool adds and removes; any others in a merged schema.yml are left alone
+GENERATED_TESTS = ["unique", "not_null", "dbt_utils.not_empty_string", "not_zero"]
+GENERATED_MODEL_TESTS = ["dbt_utils.unique_combination_of_columns"]
+
+
+# accepted_values compares these types as unquoted literals
+UNQUOTED_TYPES = ["NUMBER", "FLOAT", "BOOLEAN"]
+
+
+def column_name(name):
+    return f'"{name}"' if is_mixed_case(name) else name.lower()
+
+
+def model_columns(table):
+    import pandas as pd
+
+    columns = []
+    for row in table.to_pandas().itertuples():
+
+        tests = []
+        description_line = []
+        description_line.append(f"[ {row.DATA_TYPE} ]")
+        description_line.append("")
+
+        if pd.isna(row.NULLS):
+            # Skipped by the profile plan, nothing is known about its values
+            description_line.append("* Column was not profiled")
+            columns.append(
+                {
+                    "name": column_name(row.COLUMN_NAME),
+                    "description": "\n".join(description_line),
+                    "tests": tests,
+                }
+            )
+            continue
+
+        if pd.notna(row.UNIQUE) and row.UNIQUE:
+            description_line.append("* Column has Unique values")
+            tests.append("unique")
+
+        if row.NULLS:
+            description_line.append("* Column has NULL values")
+        else:
+            description_line.append("* Column has NO NULL values")
+            tests.append("not_null")
+
+        if row.DATA_TYPE == "TEXT":
+            if row.EMPTY_STRINGS:
+                description_line.append("* Column has empty string values")
+            else:
+                description_line.append("* Column has NO empty string values")
+                tests.append("dbt_utils.not_empty_string")
+
+        if row.DATA_TYPE == "NUMBER":
+            if row.ZEROS:
+                description_line.append("* Column has zero values")
+            else:
+                description_line.append("* Column has NO zero values")
+                tests.append("not_zero")
+
+        # Every value is known only when the table was profiled without sampling
+        if isinstance(row.VALUES, list) and row.VALUES and not row.UNIQUE:
+            description_line.append(f"* Column has {len(row.VALUES)} distinct values")
+            accepted_values = {"values": row.VALUES}
+            if row.DATA_TYPE in UNQUOTED_TYPES:
+                accepted_values["quote"] = False
+            tests.append({"accepted_values": accepted_values})
+
+        columns.append(
+            {
+                "name": column_name(row.COLUMN_NAME),
+                "description": "\n".join(description_line),
+                "tests": tests,
+            }
+        )
+    return columns
+
+
+def model_tests(keys):
+    return [
+        {
+            "dbt_utils.unique_combination_of_columns": {
+                "combination_of_columns": [column_name(name) for name in key]
+            }
+        }
+        for key in keys
+    ]
+
+
+def test_name(test):
+    return test if isinstance(test, str) else next(iter(test))
+
+
+def merge_model(existing, model):
+    """Update the generated parts of an existing model, keeping everything hand written.
+
+    Generated tests are replaced with the current ones, other tests are kept.
+    A hand written accepted_values test is only replaced by a generated one.
+    Model tests are only updated when the model was generated with them.
+    Descriptions are only replaced while they still look generated. Columns
+    are matched regardless of case and written in the table's column order,
+    followed by any columns the table no longer has.
+    """
+    existing_columns = {
+        column["name"].lower(): column for column in existing.get("columns") or []
+    }
+    columns = []
+    for column in model["columns"]:
+        current = existing_columns.pop(column["name"].lower(), None)
+        if current is None:
+            columns.append(column)
+            continue
+        current = dict(current)
+        if not current.get("description") or current["description"].startswith("[ "):
+            current["description"] = column["description"]
+        replaced = set(GENERATED_TESTS) | {test_name(test) for test in column["tests"]}
+        kept_tests = [
+            test
+            for test in current.get("tests") or []
+            if test_name(test) not in replaced
+        ]
+        current["tests"] = column["tests"] + kept_tests
+        columns.append(current)
+    merged = dict(existing)
+    if "tests" in model:
+        merged["tests"] = model["tests"] + [
+            test
+            for test in existing.get("tests") or []
+            if test_name(test) not in GENERATED_MODEL_TESTS
+        ]
+        if not merged["tests"]:
+            del merged["tests"]
+    merged["columns"] = columns + list(existing_columns.values())
+    return merged
+
+
+def merge_models(existing, models):
+    """Merge models into an existing list of models, matched regardless of case and sorted by name.
+
+    A merged model keeps the existing model's name.
+    """
+    merged = {model["name"].lower(): model for model in existing}
+    for model in models:
+        key = model["name"].lower()
+        merged[key] = merge_model(merged.get(key, {"name": model["name"]}), model)
+    return [merged[key] for key in sorted(merged)]
+
+
+def dump_yml(document):
+    import yaml
+
+    def str_presenter(dumper, data):
+        if data.count("\n") > 0:
+            data = "\n".join(
+                [line.rstrip() for line in data.splitlines()]
+            )  # Remove any trailing spaces, then put it back together again
+            return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
+        return dumper.represent_scalar("tag:yaml.org,2002:str", data)
+
+    class MyDumper(yaml.Dumper):
+        def increase_indent(self, flow=False, indentless=False):
+            return super(MyDumper, self).increase_indent(flow, False)
+
+    MyDumper.add_representer(str, str_presenter)
+
+    return yaml.dump(document, Dumper=MyDumper, sort_keys=False)
+
+
+def load_yml(path):
+    import yaml
+
+    try:
+        with open(path, "r") as file:
+            return yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        return {}
+
+
+def file_mode(path):
+    """Permissions of the file at `path`, or those a new file gets under the umask."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_yml(path, document):
+    directory = os.path.dirname(os.path.abspath(path))
+    mode = file_mode(path)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, "w") as file:
+        file.write(dump_yml(document))
+    # mkstemp creates the file readable by its owner only
+    os.chmod(temporary_path, mode)
+    os.replace(temporary_path, path)
+
+
+def model_name(fq_table):
+    # dbt model names, like their files, are lowercase
+    return fq_table.split(".")[-1].lower()
+
+
+def duplicate_models(tables):
+    """Model names shared by more than one of `tables`, with the tables sharing them."""
+    models = {}
+    for fq_table in tables:
+        models.setdefault(model_name(fq_table), []).append(fq_table)
+    return {name: shared for name, shared in models.items() if len(shared) > 1}
+
+
 def cli():
     parser = argparse.ArgumentParser(
-        description=f"Generate DBT yml from Snowflake Table v{version}.",
+        description=f"Generate DBT yml from Snowflake Table v{snowflake_tools_version}.",
         epilog="Example: snowflake-generate-yml --profile bd --table FIVETRAN_DATABASE.MYSQL_LOTTERY_PROD.NLDLS_DLSLOT_ENTRIES",
     )
 
@@ -33,97 +259,193 @@ def cli():
     )
 
     parser.add_argument(
-        "--table", help="Fully qualified table or view name", required=True
+        "--table",
+        help="Fully qualified table or view names; each part may use * and ? wildcards",
+        nargs="+",
+        required=True,
+    )
+
+    parser.add_argument(
+        "--output",
+        help="Write one models document to this file, updated as each table finishes",
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        help="Write one <model>.yml file per table to this directory",
     )
 
+    parser.add_argument(
+        "--merge",
+        help="Merge into existing yml files, updating only generated descriptions and tests",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--max-workers",
+        help="Number of tables profiled at the same time (default: 4)",
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of queries running at the same time across all tables (default: 8)",
+        type=int,
+        default=8,
+    )
+
+    add_profile_arguments(parser)
+
+    parser.add_argument(
+        "--find-keys",
+        help="Search column combinations for composite keys and add dbt_utils.unique_combination_of_columns tests",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--key-columns",
+        help="With --find-keys, most columns in a key (default: 3)",
+        type=int,
+        default=3,
+    )
+
+    parser.add_argument(
+        "--max-key-candidates",
+        help="With --find-keys, most column combinations of each size to count (default: 200)",
+        type=int,
+        default=200,
+    )
+
+    add_trace_arguments(parser)
+
     args = parser.parse_args()
 
     # args = parser.parse_args(['BD_DEV_PRD.MTWOMEY.STG_LT__ENTRIES_CURRENT'])
 
-    if args.table is None:
-        parser.print_help()
-    else:
-        try:
-            config = snowflake_config.get_profile(args.profile)
-        except ValueError:
+    if args.output and args.output_dir:
+        parser.error("--output and --output-dir can't be used together")
+
+    if args.merge and not args.output and not args.output_dir:
+        parser.error("--merge requires --output or --output-dir")
+
+    if args.find_keys and args.key_columns < 2:
+        parser.error("--key-columns must be at least 2")
+
+    config = snowflake_config.get_profile(args.profile)
+    trace = start_trace(args, config)
+    connection = ConnectionPool.get(config).connection
+    executor = QueryExecutor(connection, args.max_in_flight)
+    cache = None if args.no_cache else ProfileCache()
+    catalog = None if args.no_catalog else MetadataCatalog.for_profile(config)
+
+    tables = []
+    for name in args.table:
+        if has_magic(name):
+            tables += find_tables(connection.cursor(), name)
+        elif len(name.split(".")) == 3:
+            tables.append(name.upper())
+        else:
             print(
                 "Error: Please provide a fully qualified table or view name: DATABASE.SCHEMA.TABLE"
             )
             exit()
+    tables = sorted(set(tables))
 
-        table = SnowflakeTable(
-            args.table,
-            {
-                "user": config["user"],
-                "password": config["password"],
-                "account": config["account"],
-                "role": config["role"],
-            },
-            debug=True,
+    # Models are matched and written by name, so tables sharing one would overwrite each other
+    duplicates = duplicate_models(tables)
+    if duplicates:
+        parser.error(
+            "tables in different schemas would generate the same model: "
+            + "; ".join(
+                f"{name} ({', '.join(shared)})" for name, shared in duplicates.items()
+            )
         )
 
+    def generate(fq_table):
+        table = SnowflakeTable(
+            fq_table,
+            config,
+            connection=connection,
+            executor=executor,
+            approx=args.approx,
+            sample=args.sample,
+            escalate=not args.no_escalate,
+            top_k=args.top_k,
+            cache=cache,
+            refresh=args.refresh,
+            catalog=catalog,
+            budget=args.budget,
+            debug=len(tables) == 1,
+        )
         table.analyze()
+        model = {"name": model_name(fq_table)}
+        if args.find_keys:
+            keys = []
+            # A table with a unique column has a key already
+            if True not in table.stats.unique:
+                keys = KeyFinder(
+                    table,
+                    max_columns=args.key_columns,
+                    max_candidates=args.max_key_candidates,
+                ).find()
+            model["tests"] = model_tests(keys)
+        model["columns"] = model_columns(table)
+        return model
 
-        def str_presenter(dumper, data):
-            if data.count("\n") > 0:
-                data = "\n".join(
-                    [line.rstrip() for line in data.splitlines()]
-                )  # Remove any trailing spaces, then put it back together again
-                return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
-            return dumper.represent_scalar("tag:yaml.org,2002:str", data)
-
-        yaml.add_representer(str, str_presenter)
-
-        class MyDumper(yaml.Dumper):
-            def increase_indent(self, flow=False, indentless=False):
-                return super(MyDumper, self).increase_indent(flow, False)
+    document = {"version": 2, "models": []}
+    if args.output and args.merge:
+        document = {"version": 2, **load_yml(args.output)}
+        document["models"] = document.get("models") or []
 
-        dict = {
-            "version": 2,
-            "models": [{"name": args.table.split(".")[-1], "columns": []}],
-        }
-
-        for row in table.column_info.itertuples():
-
-            tests = []
-            description_line = []
-            description_line.append(f"[ {row.DATA_TYPE} ]")
-            description_line.append("")
-
-            if row.UNIQUE:
-                description_line.append("* Column has Unique values")
-                tests.append("unique")
+    failures = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.max_workers) as workers:
+            futures = {
+                workers.submit(generate, fq_table): fq_table for fq_table in tables
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                fq_table = futures[future]
+                try:
+                    model = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(
+                        f"[{done}/{len(tables)}] {fq_table} failed: {e}",
+                        file=sys.stderr,
+                    )
+                    continue
 
-            if row.NULLS:
-                description_line.append("* Column has NULL values")
-            else:
-                description_line.append("* Column has NO NULL values")
-                tests.append("not_null")
-
-            if row.DATA_TYPE == "TEXT":
-                if row.EMPTY_STRINGS:
-                    description_line.append("* Column has empty string values")
+                if args.output_dir:
+                    path = os.path.join(args.output_dir, f"{model['name'].lower()}.yml")
+                    model_document = {"version": 2, "models": [model]}
+                    if args.merge:
+                        existing = load_yml(path)
+                        model_document = {
+                            "version": 2,
+                            **existing,
+                            "models": merge_models(
+                                existing.get("models") or [], [model]
+                            ),
+                        }
+                    os.makedirs(args.output_dir, exist_ok=True)
+                    write_yml(path, model_document)
                 else:
-                    description_line.append("* Column has NO empty string values")
-                    tests.append("dbt_utils.not_empty_string")
+                    document["models"] = merge_models(document["models"], [model])
+                    if args.output:
+                        write_yml(args.output, document)
+                if len(tables) > 1:
+                    print(f"[{done}/{len(tables)}] {fq_table}", file=sys.stderr)
+    finally:
+        executor.close()
+        # QUERY_HISTORY is read through a database the tables were found in
+        databases = [name.split(".")[0] for name in args.table]
+        databases = [database for database in databases if not has_magic(database)]
+        databases += [fq_table.split(".")[0] for fq_table in tables]
+        finish_trace(trace, args, config, *databases)
 
-            if row.DATA_TYPE == "NUMBER":
-                if row.ZEROS:
-                    description_line.append("* Column has zero values")
-                else:
-                    description_line.append("* Column has NO zero values")
-                    tests.append("not_zero")
+    if not args.output and not args.output_dir:
+        print(dump_yml(document))
 
-            columns = dict["models"][0]["columns"]
-            columns.append(
-                {
-                    "name": (
-                        f'"{row.COLUMN_NAME}"'
-                        if is_mixed_case(row.COLUMN_NAME)
-                        else row.COLUMN_NAME.lower()
-                    ),
-                    "description": "\n".join(description_line),
-                    "tests": tests,
-                }
-            )
-        print(yaml.dump(dict, Dumper=MyDumper, sort_keys=False))
+    if failures:
+        sys.exit(1)
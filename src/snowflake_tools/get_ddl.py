@@ -2,6 +2,9 @@ import os, sys
 from snowflake_tools.ArgumentParserTweaked import ArgumentParserTweaked
 from snowflake_tools import snowflake_config
 from snowflake_tools.Snowflake import Snowflake
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.DdlExport import DdlExport
+from snowflake_tools.QueryTrace import add_trace_arguments, start_trace, finish_trace
 from importlib.metadata import version
 
 project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -13,6 +16,18 @@ def dump(obj):
         print("obj.%s = %r" % (attr, getattr(obj, attr)))
 
 
+def lookup_object_type(snowflake, config, name):
+    parts = name.upper().split(".")
+    if len(parts) != 3:
+        raise ValueError("--type is required unless --name is DATABASE.SCHEMA.NAME")
+    table_type = MetadataCatalog.for_profile(config).object_type(
+        snowflake.cursor, *parts
+    )
+    if table_type is None:
+        raise ValueError(f"Could not find table or view: {name}")
+    return "VIEW" if table_type.endswith("VIEW") else "TABLE"
+
+
 def cli():
     tool_name = "snowflake-get-ddl"
     epilog = f"Example: {tool_name} --profile bd --type TABLE --name ARCHTICS.DC_DATA.AUDIT_SUMMARY"
@@ -31,16 +46,29 @@ def cli():
 
     parser.add_argument(
         "--type",
-        help="Object type",
-        required=True,
+        help="Object type (looked up in the metadata catalog for tables and views if omitted)",
     )
 
     parser.add_argument(
         "--name",
-        help="Object name",
+        help="Object name (a database or DATABASE.SCHEMA with --export-dir)",
         required=True,
     )
 
+    parser.add_argument(
+        "--export-dir",
+        help="Export the DDL of every object in the database or schema, one file per object, under this directory",
+    )
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of per-object DDL queries running at once when exporting (default 8)",
+        type=int,
+        default=8,
+    )
+
+    add_trace_arguments(parser)
+
     try:
         args = parser.parse_args()
     except Exception as e:
@@ -52,15 +80,30 @@ def cli():
 
     try:
         config = snowflake_config.get_profile(args.profile)
-        snowflake = Snowflake(
-            {
-                "user": config["user"],
-                "password": config["password"],
-                "account": config["account"],
-            },
-            debug=True,
-        )
-
-        print(snowflake.get_ddl(args.type, args.name))
+        trace = start_trace(args, config)
+
+        if args.export_dir is not None:
+            export = DdlExport(
+                config, args.export_dir, max_in_flight=args.max_in_flight, debug=True
+            )
+            written, fallback, failed = export.export(args.name)
+            print(
+                f"Exported {written + fallback} objects to {args.export_dir} ({fallback} fetched individually)"
+            )
+            for key, error in failed:
+                print(
+                    f"Could not get DDL for {key.object_type} {key.schema}.{key.name}: {error}"
+                )
+            finish_trace(trace, args, config, args.name.split(".")[0])
+            return
+
+        snowflake = Snowflake(config, debug=True)
+
+        object_type = args.type
+        if object_type is None:
+            object_type = lookup_object_type(snowflake, config, args.name)
+
+        print(snowflake.get_ddl(object_type, args.name))
+        finish_trace(trace, args, config, args.name.split(".")[0])
     except Exception as e:
         print(f'{e}"\n"{epilog}')
@@ -0,0 +1,152 @@
+import os, sys, argparse
+from glob import has_magic
+from importlib.metadata import version
+from snowflake_tools import snowflake_config
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.TableWatcher import TableWatcher
+from snowflake_tools.QueryTrace import (
+    add_profile_arguments,
+    add_trace_arguments,
+    start_trace,
+    finish_trace,
+)
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+snowflake_tools_version = version("snowflake-tools")
+
+
+def catalog_refresh(args):
+    config = snowflake_config.get_profile(args.profile)
+    catalog = MetadataCatalog.for_profile(config)
+    cursor = ConnectionPool.get(config).cursor()
+    for database in args.database:
+        reloaded = catalog.refresh(cursor, database.upper(), full=args.full)
+        print(f"{database.upper()}: {reloaded} objects reloaded")
+    print(f"Catalog: {catalog.path}")
+
+
+def watch(args):
+    config = snowflake_config.get_profile(args.profile)
+    trace = start_trace(args, config)
+    connection = ConnectionPool.get(config).connection
+    watcher = TableWatcher(
+        config,
+        args.match,
+        connection,
+        QueryExecutor(connection, args.max_in_flight),
+        ProfileCache(),
+        catalog=None if args.no_catalog else MetadataCatalog.for_profile(config),
+        max_workers=args.max_workers,
+        refresh=args.refresh,
+        table_options=dict(
+            approx=args.approx,
+            sample=args.sample,
+            escalate=not args.no_escalate,
+            top_k=args.top_k,
+            budget=args.budget,
+        ),
+    )
+    print(f"Watching {', '.join(args.match)} every {args.interval}s", file=sys.stderr)
+    try:
+        watcher.run(args.interval, once=args.once)
+    except KeyboardInterrupt:
+        print("Stopped", file=sys.stderr)
+    finally:
+        databases = [match.split(".")[0] for match in args.match]
+        finish_trace(
+            trace,
+            args,
+            config,
+            *[database for database in databases if not has_magic(database)],
+        )
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description=f"Snowflake tools v{snowflake_tools_version}.",
+        epilog="Example: snowflake-tools catalog refresh --profile bd --database BD_DEV_PRD",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    catalog = commands.add_parser("catalog", help="Local metadata catalog")
+    catalog_commands = catalog.add_subparsers(dest="catalog_command", required=True)
+
+    refresh = catalog_commands.add_parser(
+        "refresh",
+        help="Load or incrementally update the catalog of one or more databases",
+    )
+    refresh.add_argument(
+        "--profile",
+        help="Profile name",
+        required=True,
+    )
+    refresh.add_argument(
+        "--database",
+        help="Database name (repeat for several)",
+        action="append",
+        required=True,
+    )
+    refresh.add_argument(
+        "--full",
+        help="Reload everything instead of only objects whose LAST_ALTERED changed",
+        action="store_true",
+    )
+    refresh.set_defaults(func=catalog_refresh)
+
+    watch_parser = commands.add_parser(
+        "watch",
+        help="Keep the cached profiles of tables fresh, re-profiling tables when they change",
+    )
+    watch_parser.add_argument(
+        "--profile",
+        help="Profile name",
+        required=True,
+    )
+    watch_parser.add_argument(
+        "--match",
+        help="DATABASE, DATABASE.SCHEMA or DATABASE.SCHEMA.TABLE to watch, with * and ? wildcards (repeat for several)",
+        action="append",
+        required=True,
+    )
+    watch_parser.add_argument(
+        "--interval",
+        help="Seconds between checks of INFORMATION_SCHEMA.TABLES for changes (default: 300)",
+        type=int,
+        default=300,
+    )
+    watch_parser.add_argument(
+        "--once",
+        help="Check once, profile the changed tables and exit, e.g. from cron",
+        action="store_true",
+    )
+    watch_parser.add_argument(
+        "--max-workers",
+        help="Number of tables profiled at the same time (default: 4)",
+        type=int,
+        default=4,
+    )
+    watch_parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of queries running at the same time across all tables (default: 8)",
+        type=int,
+        default=8,
+    )
+    add_profile_arguments(watch_parser)
+    add_trace_arguments(watch_parser)
+    watch_parser.set_defaults(func=watch)
+
+    args = parser.parse_args()
+
+    if args.command == "watch" and args.no_cache:
+        watch_parser.error(
+            "watch keeps the profile cache fresh, so it can't run with --no-cache"
+        )
+
+    try:
+        args.func(args)
+    except Exception as e:
+        print(e)
+        sys.exit(1)
@@ -1,11 +1,11 @@
 import os, sys, argparse
-import snowflake.connector
-import pandas as pd
 from snowflake_tools import snowflake_config
-import pkg_resources
+from snowflake_tools.Snowflake import Snowflake
+from snowflake_tools.QueryTrace import add_trace_arguments, start_trace, finish_trace
+from importlib.metadata import version
 
 project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-version = pkg_resources.get_distribution("snowflake-tools").version
+snowflake_tools_version = version("snowflake-tools")
 
 
 def dump(obj):
@@ -13,63 +13,24 @@ def dump(obj):
         print("obj.%s = %r" % (attr, getattr(obj, attr)))
 
 
-class Snowflake:
-    def __init__(self, connection_config, debug=False):
-        self.connection_config = connection_config
-        self.connection = snowflake.connector.connect(
-            user=connection_config["user"],
-            password=connection_config["password"],
-            account=connection_config["account"],
-            role=connection_config["role"],
-        )
-        self.cursor = self.connection.cursor()
-
-        self.debug = debug
-
-    def mirror_db_permissions(
-        self, source_db, source_grantee, target_db, target_grantee
-    ):
-
-        self.cursor.execute(
-            f"select * from {source_db}.information_schema.object_privileges"
-        )
-        grants = self.cursor.fetch_pandas_all()
-        grant_rows = grants.loc[
-            (grants["GRANTEE"] == source_grantee)
-            & (grants["OBJECT_TYPE"] == "DATABASE")
-            & (grants["OBJECT_NAME"] == source_db),
-            ["PRIVILEGE_TYPE", "GRANTEE"],
-        ]
-
-        new_grants = [
-            f"grant {row['PRIVILEGE_TYPE']} on database {target_db} to {target_grantee};"
-            for row in grant_rows.to_dict(orient="records")
-        ]
-
-        self.cursor.execute(f"show future grants in database {source_db}")
-        privileges_columns = [desc[0] for desc in self.cursor.description]
-        future_grants = pd.DataFrame(self.cursor.fetchall(), columns=privileges_columns)
-        future_grant_rows = future_grants.loc[
-            (future_grants["grantee_name"] == source_grantee),
-            [
-                "privilege",
-                "grantee_name",
-                "grant_on",
-            ],
-        ]
-
-        new_future_grants = [
-            f"grant {row['privilege']} on future {row['grant_on']}S in database {target_db} to {target_grantee};"
-            for row in future_grant_rows.to_dict(orient="records")
-        ]
-
-        return new_grants + new_future_grants
+def read_pairs(path):
+    pairs = []
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            fields = [field.strip() for field in line.split(",")]
+            if len(fields) != 4:
+                raise ValueError(f"Expected 4 comma separated fields: {line}")
+            pairs.append(tuple(fields))
+    return pairs
 
 
 def cli():
 
     parser = argparse.ArgumentParser(
-        description=f"Get SQL to mirror permissions from another table v{version}.",
+        description=f"Get SQL to mirror permissions from another table v{snowflake_tools_version}.",
         epilog="Example: snowflake-mirror-permissions --profile bd --source-db BD_DEV_PRD --source-grantee DATA_ENGINEERING --target-db ARCHTICS --target-grantee DATA_ENGINEERING",
     )
 
@@ -82,27 +43,43 @@ def cli():
     parser.add_argument(
         "--source-db",
         help="Source database",
-        required=True,
     )
 
     parser.add_argument(
         "--source-grantee",
         help="Source grantee",
-        required=True,
     )
 
     parser.add_argument(
         "--target-db",
         help="Target database",
-        required=True,
     )
 
     parser.add_argument(
         "--target-grantee",
         help="Target grantee",
-        required=True,
     )
 
+    parser.add_argument(
+        "--pairs",
+        help="File of source_db,source_grantee,target_db,target_grantee lines to mirror in one run (implies --missing-only)",
+    )
+
+    parser.add_argument(
+        "--missing-only",
+        help="Only output grants the target grantee doesn't already have",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--max-in-flight",
+        help="Maximum number of grant lookups running at once (default 8)",
+        type=int,
+        default=8,
+    )
+
+    add_trace_arguments(parser)
+
     args = parser.parse_args()
     # args = parser.parse_args(
     #     [
@@ -119,24 +96,42 @@ def cli():
     #     ]
     # )
 
+    single = [args.source_db, args.source_grantee, args.target_db, args.target_grantee]
+    if args.pairs is None and None in single:
+        parser.error(
+            "--source-db, --source-grantee, --target-db and --target-grantee are required without --pairs"
+        )
+
     if args.profile is None:
         parser.print_help()
     else:
         try:
             config = snowflake_config.get_profile(args.profile)
-            snowflake = Snowflake(
-                {
-                    "user": config["user"],
-                    "password": config["password"],
-                    "account": config["account"],
-                    "role": config["role"],
-                },
-                debug=True,
-            )
-
-            for row in snowflake.mirror_db_permissions(
-                args.source_db, args.source_grantee, args.target_db, args.target_grantee
-            ):
-                print(row)
+            trace = start_trace(args, config)
+            snowflake = Snowflake(config, debug=True)
+
+            databases = [args.source_db, args.target_db]
+            if args.pairs is None:
+                for row in snowflake.mirror_db_permissions(
+                    *single, missing_only=args.missing_only
+                ):
+                    print(row)
+            else:
+                pairs = read_pairs(args.pairs)
+                databases = [pair[index] for pair in pairs for index in (0, 2)]
+                results = snowflake.mirror_many_db_permissions(
+                    pairs, missing_only=True, max_in_flight=args.max_in_flight
+                )
+                for pair, result in zip(pairs, results):
+                    source_db, source_grantee, target_db, target_grantee = pair
+                    print(
+                        f"-- {source_db}/{source_grantee} -> {target_db}/{target_grantee}"
+                    )
+                    if isinstance(result, Exception):
+                        print(f"-- {result}".replace("\n", "\n-- "))
+                        continue
+                    for row in result:
+                        print(row)
+            finish_trace(trace, args, config, *databases)
         except Exception as e:
             print(e)
@@ -0,0 +1,267 @@
+import re
+from snowflake_tools.profile_sql import NO_TOP_VALUES_TYPES
+
+# Rough scan rate of an X-Small warehouse; larger warehouses scale it linearly
+SCAN_BYTES_PER_SECOND = 200 * 1024**2
+
+# COUNT(DISTINCT) sorts or hashes every value; HLL only updates a small sketch
+EXACT_DISTINCT_COST = 2.0
+
+# Under a budget, tables this small are always profiled exactly
+SMALL_TABLE_BYTES = 100 * 1024**2
+
+SAMPLE_PERCENTAGES = [50, 25, 10, 5, 1]
+
+# Relative width of a column in storage, by data type
+COLUMN_WEIGHTS = {
+    "TEXT": 4,
+    "VARIANT": 8,
+    "OBJECT": 8,
+    "ARRAY": 8,
+    "BINARY": 4,
+}
+
+BUDGET_UNITS = {
+    "b": ("bytes", 1),
+    "kb": ("bytes", 1024),
+    "mb": ("bytes", 1024**2),
+    "gb": ("bytes", 1024**3),
+    "tb": ("bytes", 1024**4),
+    "s": ("seconds", 1),
+    "m": ("seconds", 60),
+    "h": ("seconds", 3600),
+}
+
+
+def parse_budget(budget):
+    """Parse a --budget value: bytes scanned ("50GB", "1.5TB") or seconds ("90s", "10m")."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-z]+)\s*", budget, re.IGNORECASE)
+    if match is None or match.group(2).lower() not in BUDGET_UNITS:
+        raise ValueError(f"Invalid budget: {budget} (use e.g. 50GB or 120s)")
+    size, unit = match.groups()
+    kind, multiplier = BUDGET_UNITS[unit.lower()]
+    return (kind, float(size) * multiplier)
+
+
+def format_bytes(size):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+
+
+def table_metadata(cursor, database, schema, table):
+    """ROW_COUNT, BYTES, CLUSTERING_KEY and TABLE_TYPE of a table, read without a scan."""
+    cursor.execute(
+        f"""select row_count, bytes, clustering_key, table_type from {database}.INFORMATION_SCHEMA.TABLES
+        where table_schema = %s and table_name = %s""",
+        (schema, table),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return {
+            "row_count": None,
+            "bytes": None,
+            "clustering_key": None,
+            "table_type": None,
+        }
+    return dict(zip(["row_count", "bytes", "clustering_key", "table_type"], row))
+
+
+class ProfilePlan:
+    """The strategy chosen for profiling one table and what it is expected to cost."""
+
+    def __init__(self, fq_table, metadata, budget):
+        self.fq_table = fq_table
+        self.metadata = metadata
+        self.budget = budget
+        self.strategy = "exact"
+        self.approx = False
+        self.sample = None
+        self.escalate = True
+        self.skipped = []
+        self.estimated_bytes = None
+        self.estimated_seconds = None
+        self.reasons = []
+
+    def explain(self):
+        metadata = self.metadata
+        lines = [f"Plan for {self.fq_table}"]
+        if metadata["bytes"] is None:
+            lines.append("  Size: unknown (view or missing metadata)")
+        else:
+            lines.append(
+                f"  Size: {metadata['row_count']:,} rows, {format_bytes(metadata['bytes'])}"
+            )
+        if metadata["clustering_key"]:
+            lines.append(f"  Clustering key: {metadata['clustering_key']}")
+        if self.budget is not None:
+            kind, size = self.budget
+            lines.append(
+                f"  Budget: {format_bytes(size) if kind == 'bytes' else f'{size:g} seconds'}"
+            )
+        strategy = self.strategy
+        if self.sample is not None:
+            kind, size = self.sample
+            strategy += (
+                f" ({size:g}% of partitions)"
+                if kind == "percent"
+                else f" ({size} rows)"
+            )
+        lines.append(f"  Strategy: {strategy}")
+        lines.append(f"  Confirm estimates exactly: {'yes' if self.escalate else 'no'}")
+        if self.skipped:
+            lines.append(f"  Skipped columns: {', '.join(self.skipped)}")
+        if self.estimated_bytes is not None:
+            lines.append(
+                f"  Estimated scan: {format_bytes(self.estimated_bytes)}, {self.estimated_seconds:.1f} seconds"
+            )
+        for reason in self.reasons:
+            lines.append(f"  - {reason}")
+        return "\n".join(lines)
+
+
+def column_bytes(metadata, columns):
+    """Split the table's bytes over (COLUMN_NAME, DATA_TYPE) pairs by their typical width."""
+    weights = [COLUMN_WEIGHTS.get(data_type, 1) for _, data_type in columns]
+    total = sum(weights) or 1
+    return [metadata["bytes"] * weight / total for weight in weights]
+
+
+def scan_cost(scanned_bytes, approx):
+    seconds = scanned_bytes / SCAN_BYTES_PER_SECOND
+    return scanned_bytes, seconds if approx else seconds * EXACT_DISTINCT_COST
+
+
+def fits(cost, budget):
+    if budget is None:
+        return True
+    kind, size = budget
+    scanned_bytes, seconds = cost
+    return (scanned_bytes if kind == "bytes" else seconds) <= size
+
+
+def plan_profile(
+    fq_table, metadata, columns, budget=None, approx=False, sample=None, escalate=True
+):
+    """Choose how to profile a table within `budget`, before scanning anything.
+
+    `columns` holds (COLUMN_NAME, DATA_TYPE) pairs. Strategies are tried from
+    most to least accurate, never more accurate than what was asked for:
+    exact, approximate distinct counts, block samples of decreasing size and
+    finally a 1% sample of fewer columns, dropping the widest first. Each
+    strategy's cost counts both of its scans: the profile query and the
+    APPROX_TOP_K query that reads the same rows again for the most frequent
+    values. Exact confirmation of estimates is kept only if a full exact
+    scan also fits.
+    """
+    plan = ProfilePlan(fq_table, metadata, budget)
+    plan.approx = approx
+    plan.sample = sample
+    plan.escalate = escalate
+    plan.strategy = "sample" if sample else "approx" if approx else "exact"
+
+    if metadata["bytes"] is None:
+        plan.reasons.append("No size metadata, profiling as requested")
+        return plan
+
+    widths = column_bytes(metadata, columns)
+    total_bytes = sum(widths)
+    has_values = [data_type not in NO_TOP_VALUES_TYPES for _, data_type in columns]
+
+    def cost(strategy, fraction=1.0, skipped=()):
+        profile_bytes, profile_seconds = scan_cost(
+            fraction
+            * sum(
+                width
+                for position, width in enumerate(widths)
+                if position not in skipped
+            ),
+            strategy != "exact",
+        )
+        values_bytes, values_seconds = scan_cost(
+            fraction
+            * sum(
+                width
+                for position, width in enumerate(widths)
+                if has_values[position] and position not in skipped
+            ),
+            True,
+        )
+        return profile_bytes + values_bytes, profile_seconds + values_seconds
+
+    if sample is not None and sample[0] == "rows":
+        # Row sampling still reads every partition
+        candidates = [("sample", sample, cost("sample"))]
+    elif sample is not None:
+        candidates = [("sample", sample, cost("sample", sample[1] / 100))]
+    else:
+        candidates = []
+        if not approx:
+            candidates.append(("exact", None, cost("exact")))
+        candidates.append(("approx", None, cost("approx")))
+    for percentage in SAMPLE_PERCENTAGES:
+        if sample is None or (sample[0] == "percent" and percentage < sample[1]):
+            candidates.append(
+                (
+                    "sample",
+                    ("percent", float(percentage)),
+                    cost("sample", percentage / 100),
+                )
+            )
+
+    if (
+        budget is not None
+        and total_bytes <= SMALL_TABLE_BYTES
+        and fits(cost("exact"), budget)
+    ):
+        candidates = [("exact", None, cost("exact"))]
+        plan.reasons.append(
+            f"Small table (under {format_bytes(SMALL_TABLE_BYTES)}), profiled exactly"
+        )
+
+    chosen = next(
+        (candidate for candidate in candidates if fits(candidate[2], budget)), None
+    )
+    if chosen is None:
+        # Even the smallest sample is over budget: drop the widest columns
+        strategy, chosen_sample, _ = candidates[-1]
+        fraction = 1.0
+        if chosen_sample is not None and chosen_sample[0] == "percent":
+            fraction = chosen_sample[1] / 100
+        order = sorted(range(len(columns)), key=lambda position: -widths[position])
+        skipped = set()
+        for position in order:
+            if fits(cost(strategy, fraction, skipped), budget):
+                break
+            plan.skipped.append(columns[position][0])
+            skipped.add(position)
+        chosen = (strategy, chosen_sample, cost(strategy, fraction, skipped))
+        plan.reasons.append(
+            f"Over budget even at the smallest sample, skipping {len(plan.skipped)} of {len(columns)} columns"
+        )
+
+    plan.strategy, plan.sample, (plan.estimated_bytes, plan.estimated_seconds) = chosen
+    plan.approx = plan.strategy != "exact" or approx
+    if plan.strategy != "exact" and budget is not None:
+        plan.reasons.append("An exact scan is over budget")
+
+    if (
+        plan.sample is not None
+        and plan.sample[0] == "percent"
+        and metadata["clustering_key"]
+    ):
+        plan.reasons.append(
+            "Block samples of a clustered table are biased toward its clustering key"
+        )
+
+    if plan.escalate and plan.strategy != "exact":
+        # Confirming reruns only the profile query, exactly and without a sample
+        confirm = scan_cost(total_bytes, approx=False)
+        total = (plan.estimated_bytes + confirm[0], plan.estimated_seconds + confirm[1])
+        if not fits(total, budget):
+            plan.escalate = False
+            plan.reasons.append(
+                "Confirming estimates exactly would exceed the budget, leaving them unconfirmed"
+            )
+    return plan
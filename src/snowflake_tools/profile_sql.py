@@ -0,0 +1,301 @@
+import re
+
+# Average relative error of APPROX_COUNT_DISTINCT as documented by Snowflake
+HLL_RELATIVE_ERROR = 0.0162338
+
+# Values tracked per column when looking for the most frequent ones
+TOP_K_COUNTERS = 1000
+
+# Columns of these types have no meaningful value frequencies
+NO_TOP_VALUES_TYPES = ["VARIANT", "OBJECT", "ARRAY", "BINARY", "GEOGRAPHY", "GEOMETRY"]
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def parse_sample(sample):
+    """Parse a --sample value: "10" or "10%" is a percentage, "5000 rows" a row count."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(%|rows)?\s*", sample, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid sample size: {sample}")
+    size, unit = match.groups()
+    if unit is not None and unit.lower() == "rows":
+        return ("rows", int(float(size)))
+    if not 0 < float(size) <= 100:
+        raise ValueError(f"Sample percentage must be between 0 and 100: {sample}")
+    return ("percent", float(size))
+
+
+def sample_clause(sample, seed=None, view=False):
+    """SAMPLE clause for a parse_sample() value; queries with the same `seed` sample the same rows."""
+    if sample is None:
+        return ""
+    kind, size = sample
+    if kind == "rows":
+        # Snowflake can't seed fixed-size samples
+        return f" sample ({size} rows)"
+    # Block sampling skips whole micro-partitions, which is where the savings
+    # are, but views only allow row sampling
+    clause = f" sample {'bernoulli' if view else 'system'} ({size:g})"
+    if seed is not None:
+        clause += f" seed ({seed})"
+    return clause
+
+
+def column_checks(data_type):
+    checks = ["NULLS"]
+    if data_type == "TEXT":
+        checks.append("EMPTY_STRINGS")
+    if data_type == "NUMBER":
+        checks.append("ZEROS")
+    checks.append("DIST")
+    return checks
+
+
+def check_expression(check, column_name, approx=False):
+    column = quote_identifier(column_name)
+    if check == "NULLS":
+        return f"count_if({column} is null)"
+    if check == "EMPTY_STRINGS":
+        return f"count_if({column} = '')"
+    if check == "ZEROS":
+        return f"count_if({column} = 0)"
+    if check == "DIST":
+        if approx:
+            return f"approx_count_distinct({column})"
+        return f"count(distinct {column})"
+    raise ValueError(f"Unknown check: {check}")
+
+
+def compile_profile_query(
+    fq_table, columns, approx=False, sample=None, seed=None, view=False
+):
+    """Build one aggregate query that profiles every column in a single scan.
+
+    `columns` is a list of (COLUMN_NAME, checks) tuples; `sample`, `seed`
+    and `view` are as in sample_clause(). Returns the SQL and a layout list
+    of (column position, check) matching the select list after the leading
+    count(*).
+    """
+    expressions = ["count(*)"]
+    layout = []
+    for position, (column_name, checks) in enumerate(columns):
+        for check in checks:
+            expressions.append(check_expression(check, column_name, approx))
+            layout.append((position, check))
+
+    select_list = ",\n    ".join(expressions)
+    return (
+        f"select\n    {select_list}\nfrom {fq_table}{sample_clause(sample, seed, view)}",
+        layout,
+    )
+
+
+def compile_top_values_query(fq_table, columns, sample=None, seed=None, view=False):
+    """Build one query finding the most frequent values of every column in a single scan.
+
+    `columns` is a list of (COLUMN_NAME, k, counters) tuples. APPROX_TOP_K
+    tracks `counters` values with the Space-Saving algorithm, so its counts
+    are exact while a column has no more distinct values than that. Each
+    result is a JSON array of [value, count] pairs, most frequent first.
+    """
+    select_list = ",\n    ".join(
+        f"approx_top_k(to_varchar({quote_identifier(column_name)}), {k}, {counters})"
+        for column_name, k, counters in columns
+    )
+    return (
+        f"select\n    {select_list}\nfrom {fq_table}{sample_clause(sample, seed, view)}"
+    )
+
+
+def compile_key_query(fq_table, keys, approx=False):
+    """Build one query counting the distinct values of every candidate key in a single scan.
+
+    `keys` is a list of tuples of column names. COUNT(DISTINCT) of several
+    columns counts each combination of their values once, leaving out rows
+    where any of them is null; APPROX_COUNT_DISTINCT estimates the same
+    count with HyperLogLog.
+    """
+    function = "approx_count_distinct({})" if approx else "count(distinct {})"
+    select_list = ",\n    ".join(
+        function.format(", ".join(quote_identifier(column_name) for column_name in key))
+        for key in keys
+    )
+    return f"select\n    {select_list}\nfrom {fq_table}"
+
+
+# Columns of these types have no ordering, so no MIN or MAX
+UNORDERED_TYPES = ["VARIANT", "OBJECT", "ARRAY", "GEOGRAPHY", "GEOMETRY"]
+
+
+def fingerprint_checks(data_type):
+    checks = ["HASH", "NULLS", "DIST"]
+    if data_type not in UNORDERED_TYPES:
+        checks += ["MIN", "MAX"]
+    return checks
+
+
+def fingerprint_expression(check, column_name):
+    column = quote_identifier(column_name)
+    if check == "HASH":
+        return f"hash_agg({column})"
+    if check == "MIN":
+        return f"to_varchar(min({column}))"
+    if check == "MAX":
+        return f"to_varchar(max({column}))"
+    return check_expression(check, column_name)
+
+
+def compile_fingerprint_query(fq_table, columns):
+    """Build one aggregate query fingerprinting every column in a single scan.
+
+    `columns` is a list of (COLUMN_NAME, checks) tuples. HASH_AGG does not
+    depend on row order, so two tables holding the same values in each
+    column get the same fingerprints wherever their rows are stored. Returns
+    the SQL and a layout list of (column position, check) matching the
+    select list after the leading count(*).
+    """
+    expressions = ["count(*)"]
+    layout = []
+    for position, (column_name, checks) in enumerate(columns):
+        for check in checks:
+            expressions.append(fingerprint_expression(check, column_name))
+            layout.append((position, check))
+
+    select_list = ",\n    ".join(expressions)
+    return f"select\n    {select_list}\nfrom {fq_table}", layout
+
+
+# Keys of these types are split into ranges of their values, so range filters
+# can prune micro-partitions; other keys are split on HASH(key)
+NUMERIC_KEY_TYPES = ["NUMBER", "FLOAT"]
+
+
+def diff_key_expression(key_name, data_type):
+    key = quote_identifier(key_name)
+    if data_type in NUMERIC_KEY_TYPES:
+        return key
+    return f"hash({key})"
+
+
+def key_range_filter(key_name, key_expression, low, high):
+    return f"{quote_identifier(key_name)} is not null and {key_expression} >= {low} and {key_expression} < {high}"
+
+
+def compile_diff_bounds_query(fq_table, key_name, key_expression):
+    """Count the rows with a null key, and bound the key expression of the others."""
+    key = quote_identifier(key_name)
+    keyed = f"case when {key} is not null then {key_expression} end"
+    return f"select\n    count_if({key} is null),\n    floor(min({keyed})),\n    floor(max({keyed}))\nfrom {fq_table}"
+
+
+def compile_diff_buckets_query(
+    fq_table, key_name, key_expression, column_names, boundaries
+):
+    """Build one query counting and hashing the rows of every key range in a single scan.
+
+    Range i holds the rows with boundaries[i] <= key expression <
+    boundaries[i + 1]. Ranges are found by comparison rather than division,
+    so a row falls into exactly the range whose filter selects it later on.
+    Returns rows of (range, count, HASH_AGG of the rows), only for ranges
+    that have rows.
+    """
+    cases = " ".join(
+        f"when {key_expression} < {boundary} then {index}"
+        for index, boundary in enumerate(boundaries[1:-1])
+    )
+    bucket = f"case {cases} else {len(boundaries) - 2} end" if cases else "0"
+    columns = ", ".join(quote_identifier(column_name) for column_name in column_names)
+    return (
+        f"select\n    {bucket},\n    count(*),\n    hash_agg({columns})\nfrom {fq_table}\n"
+        f"where {key_range_filter(key_name, key_expression, boundaries[0], boundaries[-1])}\n"
+        "group by 1"
+    )
+
+
+def compile_diff_rows_query(
+    fq_table, key_name, key_expression, column_names, low, high
+):
+    """Fetch the key and a hash of every row in one key range, for diffing locally."""
+    columns = ", ".join(quote_identifier(column_name) for column_name in column_names)
+    return (
+        f"select\n    {quote_identifier(key_name)},\n    hash({columns})\nfrom {fq_table}\n"
+        f"where {key_range_filter(key_name, key_expression, low, high)}"
+    )
+
+
+# Watermarks are carried between runs as text, so timestamps keep full precision
+WATERMARK_FORMATS = {
+    "TIMESTAMP_NTZ": ("YYYY-MM-DD HH24:MI:SS.FF9", "to_timestamp_ntz"),
+    "TIMESTAMP_LTZ": ("YYYY-MM-DD HH24:MI:SS.FF9 TZH:TZM", "to_timestamp_ltz"),
+    "TIMESTAMP_TZ": ("YYYY-MM-DD HH24:MI:SS.FF9 TZH:TZM", "to_timestamp_tz"),
+}
+
+
+def watermark_expressions(column_name, data_type):
+    """Return the select expression for the new watermark and the filter for rows past the old one."""
+    column = quote_identifier(column_name)
+    if data_type in WATERMARK_FORMATS:
+        format, function = WATERMARK_FORMATS[data_type]
+        return (
+            f"to_varchar(max({column}), '{format}')",
+            f"{column} > {function}(%s, '{format}')",
+        )
+    return f"max({column})::varchar", f"{column} > %s"
+
+
+def compile_increment_query(
+    fq_table, columns, watermark_column, watermark_type, max_distinct, since=None
+):
+    """Build one query profiling only the rows past the `since` watermark.
+
+    Besides the counting checks, each column gets an exported HLL sketch
+    ("SKETCH") and, when it has at most `max_distinct` values in the new rows,
+    their array ("VALUES"). Returns the SQL, its parameters and a layout of
+    (column position, check) after the leading count(*) and new watermark.
+    """
+    select_watermark, filter_watermark = watermark_expressions(
+        watermark_column, watermark_type
+    )
+    expressions = ["count(*)", select_watermark]
+    layout = []
+    for position, (column_name, checks) in enumerate(columns):
+        column = quote_identifier(column_name)
+        for check in checks:
+            if check == "DIST":
+                continue
+            expressions.append(check_expression(check, column_name))
+            layout.append((position, check))
+        expressions.append(f"hll_export(hll_accumulate({column}))")
+        layout.append((position, "SKETCH"))
+        expressions.append(
+            f"iff(count(distinct {column}) <= {max_distinct}, array_agg(distinct {column}::varchar), null)"
+        )
+        layout.append((position, "VALUES"))
+
+    select_list = ",\n    ".join(expressions)
+    query = f"select\n    {select_list}\nfrom {fq_table}"
+    if since is None:
+        return query, None, layout
+    return f"{query}\nwhere {filter_watermark}", (since,), layout
+
+
+def compile_sketch_merge_query(sketches):
+    """Combine exported HLL sketches without touching any table.
+
+    `sketches` holds, per column, the list of exported sketches to merge.
+    Each result is an object with the merged "sketch" and its "estimate".
+    """
+    expressions = []
+    params = []
+    for column_sketches in sketches:
+        merged = "hll_combine(hll_import(parse_json(column1)))"
+        rows = ", ".join(["(%s)"] * len(column_sketches))
+        expressions.append(
+            f"(select object_construct('sketch', hll_export({merged}), 'estimate', hll_estimate({merged})) from values {rows})"
+        )
+        params += column_sketches
+
+    select_list = ",\n    ".join(expressions)
+    return f"select\n    {select_list}", tuple(params)
@@ -5,3 +5,10 @@ def get_profile(profile_name):
     with open(os.path.expanduser("~/.snowflake-tools"), "r") as file:
         config = toml.load(file)
     return config["profiles"][profile_name]
+
+
+def get_cache_dir(*parts):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "snowflake-tools", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,37 @@
+import pytest
+
+from snowflake_tools.LocalConnection import LocalConnection
+from snowflake_tools.QueryTrace import QueryTrace
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+
+
+@pytest.fixture
+def trace():
+    return QueryTrace()
+
+
+@pytest.fixture
+def local():
+    """The LocalConnection itself, for setting `latency` or reading tables."""
+    return LocalConnection()
+
+
+@pytest.fixture
+def connection(local, trace):
+    """`local`, with every query recorded in `trace`."""
+    return trace.wrap(local)
+
+
+@pytest.fixture
+def make_table(connection):
+    """Create a local table from `columns` and `rows`, and return a SnowflakeTable on it.
+
+    Without `columns` the table is expected to exist already.
+    """
+
+    def make_table(fq_table="DB.S.T", columns=None, rows=(), **options):
+        if columns is not None:
+            connection.create_table(fq_table, columns, rows)
+        return SnowflakeTable(fq_table, {}, connection=connection, **options)
+
+    return make_table
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from snowflake_tools.AsyncQueryExecutor import AsyncQueryExecutor
+from snowflake_tools.AsyncSnowflakeTable import AsyncSnowflakeTable
+
+COLUMNS = [("ID", "NUMBER"), ("KIND", "TEXT"), ("SIZE", "NUMBER")]
+ROWS = [[i, "ab"[i % 2], i % 3] for i in range(30)]
+
+
+@pytest.fixture
+def make_async_table(connection):
+    def make_async_table(fq_table="DB.S.T", **options):
+        return AsyncSnowflakeTable(fq_table, {}, connection=connection, **options)
+
+    return make_async_table
+
+
+def statuses(local):
+    return [query["status"] for query in local._async_queries.values()]
+
+
+def test_profiles_like_the_synchronous_table(make_table, make_async_table):
+    table = make_table("DB.S.T", COLUMNS, ROWS)
+    table.analyze()
+    async_table = make_async_table()
+    asyncio.run(async_table.analyze())
+
+    assert async_table.to_pandas().equals(table.to_pandas())
+    assert async_table.total_rows == 30
+
+
+def test_tables_sharing_an_executor_are_profiled_at_once(connection, local):
+    names = [f"DB.S.T{i}" for i in range(3)]
+    for name in names:
+        connection.create_table(name, COLUMNS, ROWS)
+    local.latency = 0.2
+    executor = AsyncQueryExecutor(connection, max_in_flight=16)
+
+    async def analyze():
+        tables = [
+            AsyncSnowflakeTable(name, {}, connection=connection, executor=executor)
+            for name in names
+        ]
+        await asyncio.gather(*(table.analyze() for table in tables))
+        return tables
+
+    start = time.monotonic()
+    tables = asyncio.run(analyze())
+
+    # Each table runs a few rounds of queries; one after the other would take 3 times as long
+    assert time.monotonic() - start < 0.2 * 3 * 3
+    assert [table.total_rows for table in tables] == [30] * 3
+
+
+def test_cancelling_analyze_cancels_its_queries(connection, local, make_async_table):
+    connection.create_table("DB.S.T", COLUMNS, ROWS)
+    local.latency = 2
+
+    async def analyze_and_cancel():
+        task = asyncio.ensure_future(make_async_table(columns_per_query=1).analyze())
+        while "RUNNING" not in statuses(local):
+            await asyncio.sleep(0.01)
+        start = time.monotonic()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.monotonic() - start
+
+    assert asyncio.run(analyze_and_cancel()) < 1
+    while "RUNNING" in statuses(local):
+        time.sleep(0.01)
+    assert "ABORTED" in statuses(local)
+
+
+def test_deadline_keeps_the_statistics_found_so_far(
+    connection, local, make_async_table
+):
+    connection.create_table("DB.S.T", COLUMNS, ROWS)
+    local.latency = 1
+    table = make_async_table(deadline=1.5, columns_per_query=1)
+
+    start = time.monotonic()
+    asyncio.run(table.analyze())
+
+    # The column lookup takes a second, then the profile queries are cancelled
+    assert time.monotonic() - start < 2.5
+    assert table.incomplete
+
+
+def test_executor_cancels_queries_past_their_timeout(connection, local):
+    local.latency = 5
+    executor = AsyncQueryExecutor(connection, poll_interval=0.01)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(executor.submit("select 1", timeout=0.1))
+    while "RUNNING" in statuses(local):
+        time.sleep(0.01)
+    assert statuses(local) == ["ABORTED"]
+
+
+def test_incremental_profiles_are_refused(connection):
+    with pytest.raises(ValueError, match="incremental"):
+        AsyncSnowflakeTable("DB.S.T", {}, connection=connection, watermark="ID")
@@ -0,0 +1,33 @@
+# SQLite returns at most 2000 columns, and a profile query has three per NUMBER column
+WIDE_COLUMNS = [(f"C{i}", "NUMBER") for i in range(700)]
+
+
+def phase_queries(trace, phase):
+    return [record for record in trace.records if record["phase"] == phase]
+
+
+def test_columns_are_spread_over_the_queries_in_flight(make_table, trace):
+    columns = [(f"C{i}", "NUMBER") for i in range(400)]
+    table = make_table("DB.S.T", columns, [[1] * 400], max_in_flight=4)
+    table.analyze()
+
+    queries = phase_queries(trace, "profile")
+    assert [len(query["columns"]) for query in queries] == [100] * 4
+    assert list(table.stats.names) == [name for name, _ in columns]
+
+
+def test_batches_over_a_limit_are_split_and_later_batches_kept_under_it(
+    make_table, trace
+):
+    rows = [[0] * len(WIDE_COLUMNS), [1] * len(WIDE_COLUMNS)]
+    table = make_table("DB.S.T", WIDE_COLUMNS, rows, columns_per_query=700, top_k=0)
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    failed = [query for query in phase_queries(trace, "profile") if query["error"]]
+    assert [len(query["columns"]) for query in failed] == [700]
+    assert "too many columns" in failed[0]["error"]
+    # Top values queries, run after the split, start at the smaller size
+    assert all(len(query["columns"]) <= 350 for query in phase_queries(trace, "values"))
+    assert not table.incomplete
+    assert (frame["DIST"] == 2).all()
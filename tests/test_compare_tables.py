@@ -0,0 +1,53 @@
+from snowflake_tools.compare_tables import compare_fingerprints
+
+COLUMNS = [("ID", "NUMBER"), ("NAME", "TEXT")]
+ROWS = [[i, f"n{i}"] for i in range(100)]
+
+
+def fingerprints(make_table, left_rows, right_rows, right_columns=COLUMNS):
+    left = make_table("DB.S.LEFT", COLUMNS, left_rows)
+    right = make_table("DB.S.RIGHT", right_columns, right_rows)
+    return left.fingerprint(), right.fingerprint()
+
+
+def test_identical_tables_have_no_differences(make_table):
+    assert compare_fingerprints(*fingerprints(make_table, ROWS, ROWS)) == []
+
+
+def test_tables_with_the_same_rows_in_another_order_match(make_table):
+    assert compare_fingerprints(*fingerprints(make_table, ROWS, ROWS[::-1])) == []
+
+
+def test_a_changed_value_shows_in_its_column_only(make_table):
+    changed = [list(row) for row in ROWS]
+    changed[50][1] = "changed"
+
+    differences = compare_fingerprints(*fingerprints(make_table, ROWS, changed))
+
+    # "changed" sorts before every "n..." name
+    assert differences == [
+        ("NAME", "HASH", differences[0][2], differences[0][3]),
+        ("NAME", "MIN", "n0", "changed"),
+    ]
+
+
+def test_row_counts_and_missing_columns_are_reported(make_table):
+    right_columns = [("ID", "NUMBER"), ("EXTRA", "TEXT")]
+    right_rows = [[i, None] for i in range(101)]
+
+    differences = compare_fingerprints(
+        *fingerprints(make_table, ROWS, right_rows, right_columns)
+    )
+
+    assert differences[0] == ("", "ROWS", 100, 101)
+    assert ("NAME", "COLUMN", "present", "missing") in differences
+    assert ("EXTRA", "COLUMN", "missing", "present") in differences
+
+
+def test_fingerprints_take_one_scan_and_fetch_no_rows(make_table, trace):
+    left, _ = fingerprints(make_table, ROWS, ROWS)
+
+    queries = [r for r in trace.records if r["phase"] == "fingerprint"]
+    assert len(queries) == 2
+    assert all(query["rows"] == 1 for query in queries)
+    assert left[0] == 100
@@ -0,0 +1,77 @@
+import pytest
+
+from snowflake_tools.DdlExport import ObjectKey, split_ddl
+
+
+def test_split_ddl_keeps_alters_and_bodies_with_their_object():
+    script = [
+        "create or replace database DB;\n",
+        "create or replace schema DB.S;\n",
+        "create or replace TABLE DB.S.T (\n",
+        "\tID NUMBER(38,0)\n",
+        ");\n",
+        "alter table DB.S.T add constraint PK primary key (ID);\n",
+        "create or replace view DB.S.V as select 'create or replace table X' as c from T;\n",
+        'create or replace FUNCTION DB.S.F("A" NUMBER)\n',
+        "RETURNS NUMBER\n",
+        "AS $$\n",
+        "create or replace table not_an_object\n",
+        "$$;\n",
+    ]
+
+    objects = list(split_ddl(script))
+
+    assert [key for key, _ in objects] == [
+        ObjectKey("DATABASE", None, "DB"),
+        ObjectKey("SCHEMA", "S", "S"),
+        ObjectKey("TABLE", "S", "T"),
+        ObjectKey("VIEW", "S", "V"),
+        ObjectKey("FUNCTION", "S", "F", "(NUMBER)"),
+    ]
+    assert "alter table DB.S.T" in objects[2][1]
+    assert "not_an_object" in objects[4][1]
+
+
+def test_split_ddl_of_an_empty_script():
+    assert list(split_ddl([])) == []
+
+
+def test_split_ddl_puts_unqualified_names_in_the_last_schema():
+    script = [
+        "create or replace schema DB.S;\n",
+        "create or replace view V as select 1 as c;\n",
+        "create or replace schema DB.OTHER;\n",
+        "create or replace view W as select 1 as c;\n",
+    ]
+
+    assert [key for key, _ in split_ddl(script)] == [
+        ObjectKey("SCHEMA", "S", "S"),
+        ObjectKey("VIEW", "S", "V"),
+        ObjectKey("SCHEMA", "OTHER", "OTHER"),
+        ObjectKey("VIEW", "OTHER", "W"),
+    ]
+    assert [key for key, _ in split_ddl(script[1:2], "S")] == [
+        ObjectKey("VIEW", "S", "V")
+    ]
+
+
+def test_split_ddl_starts_objects_at_create_without_or_replace():
+    script = [
+        "create or replace table DB.S.T (ID NUMBER);\n",
+        "create view DB.S.V as select ID from DB.S.T;\n",
+        "create secure view if not exists DB.S.W as select 1 as c;\n",
+    ]
+
+    objects = list(split_ddl(script))
+
+    assert [key for key, _ in objects] == [
+        ObjectKey("TABLE", "S", "T"),
+        ObjectKey("VIEW", "S", "V"),
+        ObjectKey("VIEW", "S", "W"),
+    ]
+    assert "create view" not in objects[0][1]
+
+
+def test_split_ddl_rejects_unqualified_names_outside_a_schema():
+    with pytest.raises(ValueError, match="No schema"):
+        list(split_ddl(["create view V as select 1 as c;\n"]))
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+import snowflake_tools.SnowflakeTable
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.SnowflakeTable import NOT_PROFILED
+
+COLUMNS = [("ID", "NUMBER"), ("KIND", "TEXT"), ("SIZE", "NUMBER")]
+ROWS = [[i, "ab"[i % 2], i % 3] for i in range(30)]
+
+
+def statuses(local):
+    return [query["status"] for query in local._async_queries.values()]
+
+
+def wait_until_done(local):
+    while "RUNNING" in statuses(local):
+        time.sleep(0.01)
+
+
+def test_deadline_keeps_the_statistics_found_so_far(tmp_path, make_table, local):
+    cache = ProfileCache(str(tmp_path))
+    table = make_table("DB.S.T", COLUMNS, ROWS, deadline=2.5, cache=cache)
+    local.latency = 1
+
+    start = time.monotonic()
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    # The cache and column lookups take two seconds, then the profile queries
+    # are cancelled
+    assert time.monotonic() - start < 3.5
+    assert table.incomplete
+    assert all(NOT_PROFILED in estimated for estimated in frame["ESTIMATED"])
+    wait_until_done(local)
+    assert "ABORTED" in statuses(local)
+    # An incomplete profile is not cached
+    local.latency = 0
+    assert not table._load_cached(table._cache_key())
+
+
+def test_columns_over_the_statement_timeout_are_left_out(make_table, local, trace):
+    table = make_table("DB.S.T", COLUMNS, ROWS, statement_timeout=0.1)
+    local.latency = 0.3
+
+    table.analyze()
+
+    assert table.incomplete
+    profile_queries = [
+        record
+        for record in trace.records
+        if record["phase"] == "profile" and "cancel_query" not in record["statement"]
+    ]
+    # The batch of all columns is split down to single columns before giving up
+    assert sorted(len(query["columns"]) for query in profile_queries) == [
+        1,
+        1,
+        1,
+        2,
+        3,
+    ]
+    assert all("timeout" in query["error"] for query in profile_queries)
+
+
+def test_ctrl_c_cancels_the_running_queries(make_table, local, monkeypatch):
+    table = make_table("DB.S.T", COLUMNS, ROWS, columns_per_query=1)
+    wait = snowflake_tools.SnowflakeTable.wait
+
+    def interrupted_wait(futures, **kwargs):
+        while "RUNNING" not in statuses(local):
+            time.sleep(0.01)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(snowflake_tools.SnowflakeTable, "wait", interrupted_wait)
+    local.latency = 2
+
+    with pytest.raises(KeyboardInterrupt):
+        table.analyze()
+    start = time.monotonic()
+    wait_until_done(local)
+
+    assert time.monotonic() - start < 1
+    assert set(statuses(local)) == {"ABORTED"}
+
+
+def test_cancelling_futures_leaves_other_queries_of_a_shared_executor(
+    connection, local
+):
+    executor = QueryExecutor(connection, max_in_flight=2, poll_interval=0.01)
+    local.latency = 0.5
+    mine = executor.submit("select 1")
+    others = executor.submit("select 3")
+    queued = executor.submit("select 2")
+    while statuses(local).count("RUNNING") < 2:
+        time.sleep(0.01)
+
+    executor.cancel([mine, queued])
+
+    assert others.result() == [(3,)]
+    assert queued.cancelled()
+    with pytest.raises(Exception, match="canceled"):
+        mine.result()
+    executor.close()
@@ -0,0 +1,101 @@
+import os
+import stat
+
+from snowflake_tools.generate_yml import (
+    duplicate_models,
+    load_yml,
+    merge_model,
+    merge_models,
+    model_tests,
+    write_yml,
+)
+
+
+def column(name, tests=(), description="[ generated ]"):
+    return {"name": name, "description": description, "tests": list(tests)}
+
+
+def test_merge_model_replaces_generated_tests_and_keeps_hand_written_ones():
+    existing = {
+        "name": "orders",
+        "columns": [
+            {
+                "name": "id",
+                "description": "Order number",
+                "tests": ["unique", "relationships_check"],
+            },
+            {"name": "dropped", "description": "Gone", "tests": []},
+        ],
+    }
+    model = {"name": "orders", "columns": [column("ID", ["not_null"]), column("TOTAL")]}
+
+    merged = merge_model(existing, model)
+
+    assert [c["name"] for c in merged["columns"]] == ["id", "TOTAL", "dropped"]
+    assert merged["columns"][0]["description"] == "Order number"
+    assert merged["columns"][0]["tests"] == ["not_null", "relationships_check"]
+
+
+def test_merge_model_replaces_generated_descriptions_only():
+    existing = {"name": "t", "columns": [column("A", description="[ old ]")]}
+    model = {"name": "t", "columns": [column("a", description="[ new ]")]}
+
+    assert merge_model(existing, model)["columns"][0]["description"] == "[ new ]"
+
+
+def test_merge_model_updates_generated_model_tests():
+    expression = {"dbt_utils.expression_is_true": {"expression": "1"}}
+    existing = {
+        "name": "t",
+        "tests": [expression] + model_tests([("OLD",)]),
+        "columns": [],
+    }
+
+    merged = merge_model(
+        existing, {"name": "t", "tests": model_tests([("A", "B")]), "columns": []}
+    )
+    assert merged["tests"] == model_tests([("A", "B")]) + [expression]
+
+    merged = merge_model(
+        {"name": "t", "tests": model_tests([("A", "B")]), "columns": []},
+        {"name": "t", "tests": [], "columns": []},
+    )
+    assert "tests" not in merged
+
+
+def test_merge_models_matches_names_regardless_of_case():
+    existing = [
+        {"name": "Orders", "columns": [column("ID", description="Kept")]},
+        {"name": "zebra", "columns": []},
+    ]
+    models = [
+        {"name": "orders", "columns": [column("id")]},
+        {"name": "customers", "columns": [column("id")]},
+    ]
+
+    merged = merge_models(existing, models)
+
+    assert [model["name"] for model in merged] == ["customers", "Orders", "zebra"]
+    assert merged[1]["columns"][0]["description"] == "Kept"
+
+
+def test_duplicate_models_finds_tables_of_the_same_name_in_other_schemas():
+    tables = ["DB.A.ORDERS", "DB.A.CUSTOMERS", "DB.B.ORDERS", "OTHER.C.orders"]
+
+    assert duplicate_models(tables) == {
+        "orders": ["DB.A.ORDERS", "DB.B.ORDERS", "OTHER.C.orders"]
+    }
+    assert duplicate_models(["DB.A.ORDERS", "DB.A.CUSTOMERS"]) == {}
+
+
+def test_write_yml_keeps_the_file_mode(tmp_path):
+    path = str(tmp_path / "schema.yml")
+    write_yml(path, {"version": 2})
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+
+    os.chmod(path, 0o640)
+    write_yml(path, {"version": 2, "models": []})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert load_yml(path) == {"version": 2, "models": []}
@@ -0,0 +1,70 @@
+import pytest
+
+from snowflake_tools.IncrementalStore import IncrementalStore
+
+COLUMNS = [("ID", "NUMBER"), ("KIND", "TEXT")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IncrementalStore(str(tmp_path))
+
+
+@pytest.fixture
+def profile(make_table, store):
+    """Profile DB.S.EVENTS incrementally on `id`; returns the table."""
+
+    def profile(columns=None, rows=()):
+        table = make_table(
+            "DB.S.EVENTS", columns, rows, watermark="id", incremental_store=store
+        )
+        table.analyze()
+        return table
+
+    return profile
+
+
+def frame(table):
+    return table.to_pandas().set_index("COLUMN_NAME")
+
+
+def test_second_run_profiles_only_new_rows_and_merges(connection, store, profile):
+    profile(COLUMNS + [("NOTE", "TEXT")], [[i, "ab"[i % 2], None] for i in range(10)])
+
+    connection.insert("DB.S.EVENTS", [[i, "c", "x"] for i in range(10, 15)])
+    table = profile()
+    stats = frame(table)
+
+    assert table.profiled_rows == 5
+    assert table.total_rows == 15
+    assert store.load("DB.S.EVENTS")["watermark"] == "14"
+    assert stats.loc["KIND", "DIST"] == 3
+    assert stats.loc["KIND", "VALUES"] == ["a", "b", "c"]
+    assert stats.loc["ID", "DIST"] == 15
+    assert stats.loc["NOTE", "NULLS"]
+
+
+def test_no_new_rows_keeps_the_profile(store, profile):
+    profile(COLUMNS, [[1, "a"], [2, "b"]])
+    stats = frame(profile())
+
+    assert stats.loc["ID", "DIST"] == 2
+    assert store.load("DB.S.EVENTS")["rows"] == 2
+
+
+def test_changed_columns_profile_the_history_again(profile):
+    profile(COLUMNS, [[1, "a"], [2, "b"]])
+    table = profile(
+        COLUMNS + [("SIZE", "NUMBER")], [[1, "a", 1], [2, "b", 2], [3, "c", 3]]
+    )
+
+    assert table.profiled_rows == 3
+    assert table.total_rows == 3
+
+
+def test_near_unique_columns_are_not_confirmed_with_a_full_scan(trace, profile):
+    stats = frame(profile([("ID", "NUMBER")], [[i] for i in range(20)]))
+
+    assert "escalate" not in {record["phase"] for record in trace.records}
+    assert stats.loc["ID", "UNIQUE"]
+    assert "UNIQUE (unconfirmed)" in stats.loc["ID", "ESTIMATED"]
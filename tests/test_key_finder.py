@@ -0,0 +1,75 @@
+import itertools
+import random
+
+import pytest
+
+from snowflake_tools.KeyFinder import KeyFinder
+
+
+@pytest.fixture
+def profiled_table(make_table):
+    def profiled_table(columns, rows, approx=False):
+        table = make_table("DB.S.T", columns, rows, approx=approx)
+        table.analyze()
+        return table
+
+    return profiled_table
+
+
+def key_queries(trace):
+    return [record for record in trace.records if record["phase"].startswith("keys")]
+
+
+@pytest.mark.parametrize("approx", [False, True])
+def test_finds_a_three_column_key_among_noise_columns(profiled_table, trace, approx):
+    rng = random.Random(2)
+    columns = [("STORE", "NUMBER"), ("DAY", "TEXT"), ("SKU", "TEXT"), ("NOTE", "TEXT")]
+    columns += [(f"W{i}", "NUMBER") for i in range(20)]
+    rows = [
+        [store, f"d{day}", f"sku{sku}", rng.choice(["a", "b", None])]
+        + [rng.randint(0, 3) for _ in range(20)]
+        for store, day, sku in itertools.product(range(5), range(10), range(20))
+    ]
+    table = profiled_table(columns, rows, approx)
+    profile_queries = len(trace.records)
+
+    finder = KeyFinder(table, max_candidates=50)
+
+    assert finder.find() == [("STORE", "DAY", "SKU")]
+    assert not finder.incomplete
+    # Combinations are counted many to a query, not one query each
+    assert len(trace.records) - profile_queries < 10
+
+
+def test_leaves_out_unique_nullable_and_constant_columns(profiled_table):
+    columns = [
+        ("ID", "NUMBER"),
+        ("A", "NUMBER"),
+        ("B", "NUMBER"),
+        ("C", "TEXT"),
+        ("N", "TEXT"),
+    ]
+    rows = [[i, i // 10, i % 10, "x", None if i % 3 else "y"] for i in range(100)]
+    table = profiled_table(columns, rows)
+
+    finder = KeyFinder(table)
+
+    assert [table.stats.names[position] for position in finder._columns()] == ["A", "B"]
+    assert finder.find() == [("A", "B")]
+
+
+def test_combinations_bounded_under_the_row_count_need_no_query(profiled_table, trace):
+    columns = [("A", "NUMBER"), ("B", "NUMBER"), ("C", "NUMBER")]
+    rows = [[i % 2, i % 3, i % 5] for i in range(100)]
+    table = profiled_table(columns, rows)
+
+    # At most 2 * 3 * 5 = 30 distinct combinations for 100 rows
+    assert KeyFinder(table).find() == []
+    assert key_queries(trace) == []
+
+
+def test_needs_at_least_two_columns(profiled_table):
+    table = profiled_table([("A", "NUMBER")], [[1], [2]])
+
+    with pytest.raises(ValueError):
+        KeyFinder(table, max_columns=1)
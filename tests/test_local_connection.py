@@ -0,0 +1,65 @@
+import sqlite3
+import time
+
+import pytest
+
+COLUMNS = [("ID", "NUMBER"), ("NAME", "TEXT")]
+
+
+def test_reads_three_part_names_and_information_schema(local):
+    local.create_table("DB.S.T", COLUMNS, [[1, "a"], [2, None]])
+    cursor = local.cursor()
+
+    cursor.execute("select count(*), count_if(name is null) from DB.S.T")
+    assert cursor.fetchone() == (2, 1)
+
+    cursor.execute(
+        "select column_name, data_type from DB.INFORMATION_SCHEMA.COLUMNS"
+        " where table_name = %s order by ordinal_position",
+        ("T",),
+    )
+    assert cursor.fetchall() == [("ID", "NUMBER"), ("NAME", "TEXT")]
+
+
+def test_async_queries_overlap_their_latency(local):
+    local.create_table("DB.S.T", COLUMNS)
+    local.latency = 0.2
+    cursor = local.cursor()
+
+    start = time.monotonic()
+    query_ids = [
+        cursor.execute_async("select count(*) from DB.S.T")["queryId"]
+        for _ in range(5)
+    ]
+    while any(
+        local.is_still_running(local.get_query_status_throw_if_error(query_id))
+        for query_id in query_ids
+    ):
+        time.sleep(0.01)
+
+    assert time.monotonic() - start < 0.6
+    assert local.round_trips == 5
+
+
+def test_cancelled_queries_stop_and_fail(local):
+    local.create_table("DB.S.T", COLUMNS)
+    local.latency = 5
+    cursor = local.cursor()
+    query_id = cursor.execute_async("select count(*) from DB.S.T")["queryId"]
+
+    start = time.monotonic()
+    cursor.execute("select system$cancel_query(%s)", (query_id,))
+    while local.is_still_running(local._async_queries[query_id]["status"]):
+        time.sleep(0.01)
+
+    assert time.monotonic() - start < 1
+    with pytest.raises(sqlite3.OperationalError, match="canceled"):
+        cursor.get_results_from_sfqid(query_id)
+
+
+def test_statement_timeouts_shorter_than_the_latency_fail(local):
+    local.create_table("DB.S.T", COLUMNS)
+    local.latency = 0.2
+
+    with pytest.raises(sqlite3.OperationalError, match="timeout"):
+        local.cursor().execute("select count(*) from DB.S.T", timeout=0.05)
@@ -0,0 +1,145 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from snowflake_tools.MetadataCatalog import MetadataCatalog
+from snowflake_tools.ProfileCache import ProfileCache
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return MetadataCatalog(str(tmp_path / "catalog.sqlite"))
+
+
+def column_names(catalog, connection, table, last_altered=None):
+    return [
+        row[0]
+        for row in catalog.columns(
+            connection.cursor(),
+            "DB",
+            "S",
+            table,
+            ["COLUMN_NAME"],
+            last_altered=last_altered,
+        )
+    ]
+
+
+def stored_columns(catalog, table):
+    return catalog._db.execute(
+        "select count(*) from columns where TABLE_NAME = ?", (table,)
+    ).fetchone()[0]
+
+
+def phases(trace):
+    return [record["phase"] for record in trace.records]
+
+
+def test_first_lookup_loads_the_database_and_later_ones_stay_local(
+    catalog, connection, trace
+):
+    connection.create_table("DB.S.A", [("X", "NUMBER"), ("Y", "TEXT")])
+    connection.create_table("DB.S.B", [("Z", "NUMBER")])
+
+    assert column_names(catalog, connection, "A") == ["X", "Y"]
+    loaded = len(trace.records)
+    assert column_names(catalog, connection, "B") == ["Z"]
+    assert len(trace.records) == loaded
+    assert catalog.object_type(connection.cursor(), "DB", "S", "B") == "BASE TABLE"
+
+
+def test_refresh_reloads_only_changed_and_dropped_tables(catalog, local):
+    local.create_table("DB.S.A", [("X", "NUMBER")])
+    local.create_table("DB.S.B", [("Z", "NUMBER")])
+    catalog.refresh(local.cursor(), "DB")
+
+    time.sleep(0.01)
+    local.create_table("DB.S.A", [("X", "NUMBER"), ("W", "TEXT")])
+    local.create_table("DB.S.C", [("V", "NUMBER")])
+
+    assert catalog.refresh(local.cursor(), "DB") == 2
+    assert catalog.refresh(local.cursor(), "DB") == 0
+    assert stored_columns(catalog, "A") == 2
+
+
+def test_columns_of_a_recreated_table_are_reloaded_given_its_last_altered(
+    catalog, local
+):
+    local.create_table("DB.S.A", [("X", "NUMBER"), ("Y", "TEXT")])
+    column_names(catalog, local, "A")
+
+    time.sleep(0.01)
+    local.create_table("DB.S.A", [("X", "NUMBER"), ("Z", "TEXT")])
+    last_altered = ProfileCache.table_state(local.cursor(), "DB", "S", "A")[0]
+
+    assert column_names(catalog, local, "A") == ["X", "Y"]
+    assert column_names(catalog, local, "A", last_altered) == ["X", "Z"]
+    assert stored_columns(catalog, "A") == 2
+
+
+def test_concurrent_lookups_of_a_new_table_store_its_columns_once(catalog, local):
+    local.latency = 0.01
+    local.create_table("DB.S.A", [("X", "NUMBER")])
+    column_names(catalog, local, "A")
+    local.create_table("DB.S.NEW", [("X", "NUMBER"), ("Y", "TEXT")])
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(column_names(catalog, local, "NEW"))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [["X", "Y"]] * 4
+    assert stored_columns(catalog, "NEW") == 2
+
+
+def test_catalogs_in_an_older_format_are_reloaded(tmp_path, local):
+    path = str(tmp_path / "catalog.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("create table columns (TABLE_NAME)")
+    db.commit()
+    db.close()
+    local.create_table("DB.S.A", [("X", "NUMBER")])
+
+    assert column_names(MetadataCatalog(path), local, "A") == ["X"]
+
+
+def test_cached_tables_look_up_columns_without_a_query(
+    tmp_path, catalog, make_table, trace
+):
+    cache = ProfileCache(str(tmp_path))
+    columns = [("ID", "NUMBER"), ("NAME", "TEXT")]
+    make_table("DB.S.T", columns, [[1, "a"]], catalog=catalog, cache=cache).analyze()
+    trace.records.clear()
+
+    table = make_table(catalog=catalog, cache=cache, refresh=True)
+    table.analyze()
+
+    assert "metadata" not in phases(trace)
+    assert list(table.stats.names) == ["ID", "NAME"]
+
+
+def test_a_dropped_column_reloads_the_table_and_profiles_again(
+    catalog, local, make_table, trace
+):
+    make_table(
+        "DB.S.T", [("ID", "NUMBER"), ("NAME", "TEXT")], [[1, "a"]], catalog=catalog
+    ).analyze()
+    time.sleep(0.01)
+    local.create_table("DB.S.T", [("ID", "NUMBER")], [[1], [2]])
+    trace.records.clear()
+
+    table = make_table(catalog=catalog)
+    table.analyze()
+
+    assert list(table.stats.names) == ["ID"]
+    assert table.total_rows == 2
+    assert phases(trace).count("metadata") > 0
@@ -0,0 +1,110 @@
+import pytest
+
+from snowflake_tools.profile_plan import parse_budget, plan_profile
+
+GB = 1024**3
+
+
+@pytest.mark.parametrize(
+    "budget, parsed",
+    [
+        ("50GB", ("bytes", 50 * GB)),
+        ("1.5 tb", ("bytes", 1.5 * 1024**4)),
+        ("90s", ("seconds", 90)),
+        ("10m", ("seconds", 600)),
+    ],
+)
+def test_parse_budget(budget, parsed):
+    assert parse_budget(budget) == parsed
+
+
+@pytest.mark.parametrize("budget", ["50", "50 parsecs", "GB"])
+def test_parse_budget_rejects(budget):
+    with pytest.raises(ValueError):
+        parse_budget(budget)
+
+
+def metadata(size, clustering_key=None):
+    return {
+        "row_count": 10**9,
+        "bytes": size,
+        "clustering_key": clustering_key,
+        "table_type": "BASE TABLE",
+    }
+
+
+COLUMNS = [("ID", "NUMBER"), ("NAME", "TEXT"), ("PAYLOAD", "VARIANT")]
+
+
+def test_plan_without_budget_profiles_as_requested():
+    plan = plan_profile("DB.S.T", metadata(10 * GB), COLUMNS)
+
+    assert plan.strategy == "exact"
+    assert plan.escalate
+
+
+def test_plan_counts_the_top_values_scan():
+    plan = plan_profile("DB.S.T", metadata(10 * GB), COLUMNS)
+
+    # The VARIANT column has no top values, so only the others are read twice
+    assert 10 * GB < plan.estimated_bytes < 20 * GB
+
+
+def test_plan_samples_under_a_tight_budget():
+    plan = plan_profile(
+        "DB.S.T", metadata(10 * GB, "(ID)"), COLUMNS, budget=parse_budget("1GB")
+    )
+
+    assert plan.strategy == "sample"
+    assert plan.sample[0] == "percent"
+    assert plan.approx
+    assert not plan.escalate
+    assert plan.estimated_bytes <= GB
+    assert any("clustering key" in reason for reason in plan.reasons)
+
+
+def test_plan_skips_the_widest_columns_when_even_a_sample_is_over_budget():
+    plan = plan_profile(
+        "DB.S.T", metadata(10 * GB), COLUMNS, budget=parse_budget("20MB")
+    )
+
+    assert plan.sample == ("percent", 1.0)
+    assert plan.skipped[0] == "PAYLOAD"
+    assert "ID" not in plan.skipped
+
+
+def test_plan_profiles_small_tables_exactly():
+    plan = plan_profile(
+        "DB.S.T", metadata(1024**2), COLUMNS, budget=parse_budget("1GB")
+    )
+
+    assert plan.strategy == "exact"
+
+
+def test_plan_never_exceeds_the_requested_accuracy():
+    plan = plan_profile(
+        "DB.S.T",
+        metadata(10 * GB),
+        COLUMNS,
+        sample=("percent", 5.0),
+        budget=parse_budget("1TB"),
+    )
+
+    assert plan.strategy == "sample"
+    assert plan.sample == ("percent", 5.0)
+
+
+def test_table_profiles_with_the_planned_strategy(make_table, trace):
+    rows = [[i, f"name {i}", None] for i in range(5000)]
+    table = make_table("DB.S.T", COLUMNS, rows, budget=parse_budget("10KB"))
+
+    plan = table.plan_profile()
+    table.analyze()
+
+    assert plan.sample == ("percent", 5.0)
+    assert "Strategy: sample (5% of partitions)" in plan.explain()
+    assert (table.approx, table.escalate) == (True, False)
+    profile_queries = [r for r in trace.records if r["phase"] == "profile"]
+    assert profile_queries
+    assert all("sample system (5" in r["statement"] for r in profile_queries)
+    assert "escalate" not in {record["phase"] for record in trace.records}
@@ -0,0 +1,48 @@
+import pytest
+
+from snowflake_tools.profile_sql import parse_sample, sample_clause
+
+
+@pytest.mark.parametrize(
+    "sample, parsed",
+    [
+        ("10", ("percent", 10.0)),
+        ("2.5%", ("percent", 2.5)),
+        (" 100 % ", ("percent", 100.0)),
+        ("5000 rows", ("rows", 5000)),
+        ("5000 ROWS", ("rows", 5000)),
+    ],
+)
+def test_parse_sample(sample, parsed):
+    assert parse_sample(sample) == parsed
+
+
+@pytest.mark.parametrize("sample", ["0", "101", "ten", "10 blocks", ""])
+def test_parse_sample_rejects(sample):
+    with pytest.raises(ValueError):
+        parse_sample(sample)
+
+
+def test_sample_clause():
+    assert sample_clause(None) == ""
+    assert sample_clause(("percent", 10.0), seed=7) == " sample system (10) seed (7)"
+    assert (
+        sample_clause(("percent", 10.0), seed=7, view=True)
+        == " sample bernoulli (10) seed (7)"
+    )
+    assert sample_clause(("rows", 100), seed=7) == " sample (100 rows)"
+
+
+def test_column_batches_of_a_percent_sample_see_the_same_rows(make_table):
+    columns = [(f"C{i}", "NUMBER") for i in range(6)]
+    rows = [[n] * 6 for n in range(2000)]
+    table = make_table(
+        "DB.S.T", columns, rows, sample="20", columns_per_query=2, escalate=False
+    )
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    # Every batch of two columns sampled the same rows, so the columns, equal
+    # on every row, came out with the same distinct counts
+    assert frame["DIST"].nunique() == 1
+    assert 0 < frame.loc["C0", "DIST"] < 2000
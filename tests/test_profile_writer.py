@@ -0,0 +1,78 @@
+import csv
+import json
+
+import pytest
+
+from snowflake_tools.ProfileWriter import ProfileWriter
+
+COLUMNS = [("ID", "NUMBER"), ("KIND", "TEXT")]
+
+
+@pytest.fixture
+def tables(make_table):
+    """Two analyzed tables, of two and three rows."""
+    tables = [
+        make_table("DB.S.A", COLUMNS, [[1, "x"], [2, "y"]]),
+        make_table("DB.S.B", COLUMNS, [[1, "x"], [2, "x"], [3, None]]),
+    ]
+    for table in tables:
+        table.analyze()
+    return tables
+
+
+def write(path, format, tables):
+    with ProfileWriter(path, format) as writer:
+        for table in tables:
+            writer.write(table)
+    return writer
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_writes_one_row_per_column_of_every_table(tmp_path, tables, format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / f"profile.{format}")
+    writer = write(path, format, tables)
+
+    if format == "parquet":
+        result = pq.read_table(path)
+    else:
+        result = pa.ipc.open_file(path).read_all()
+    assert result.schema == writer.schema
+    rows = result.to_pylist()
+    assert [(row["TABLE_NAME"], row["COLUMN_NAME"]) for row in rows] == [
+        ("A", "ID"),
+        ("A", "KIND"),
+        ("B", "ID"),
+        ("B", "KIND"),
+    ]
+    assert [row["TOTAL_ROWS"] for row in rows] == [2, 2, 3, 3]
+    assert rows[3]["VALUES"] == ["x"]
+    assert len({row["PROFILED_AT"] for row in rows}) == 1
+
+
+def test_jsonl_rows_are_json_objects(tmp_path, tables):
+    path = str(tmp_path / "profile.jsonl")
+    write(path, "jsonl", tables)
+
+    with open(path) as file:
+        rows = [json.loads(line) for line in file]
+    assert len(rows) == 4
+    assert rows[0]["TABLE_CATALOG"] == "DB"
+    assert rows[1]["VALUES"] == ["x", "y"]
+
+
+def test_csv_writes_nested_values_as_json_text(tmp_path, tables):
+    path = str(tmp_path / "profile.csv")
+    write(path, "csv", tables)
+
+    with open(path) as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 4
+    assert json.loads(rows[1]["VALUES"]) == ["x", "y"]
+
+
+def test_rejects_unknown_formats(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported format"):
+        ProfileWriter(str(tmp_path / "profile.xml"), "xml")
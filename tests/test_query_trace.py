@@ -0,0 +1,81 @@
+import argparse
+
+import pytest
+
+from snowflake_tools.ConnectionPool import ConnectionPool
+from snowflake_tools.QueryTrace import (
+    QueryTrace,
+    add_trace_arguments,
+    finish_trace,
+    query_context,
+    start_trace,
+)
+
+
+@pytest.fixture
+def config(request):
+    # A profile of its own, so each test gets its own pooled session
+    return {"backend": "local", "user": "u", "account": request.node.name}
+
+
+def parse(*arguments):
+    parser = argparse.ArgumentParser()
+    add_trace_arguments(parser)
+    return parser.parse_args(arguments)
+
+
+def test_records_are_labelled_with_the_query_context(connection, trace):
+    connection.create_table("DB.S.T", [("ID", "NUMBER")], [[1], [2]])
+    with query_context(phase="profile", table="DB.S.T", columns=["ID"]):
+        connection.cursor().execute("select count(*) from DB.S.T")
+
+    (record,) = trace.records
+    assert (record["phase"], record["table"], record["columns"]) == (
+        "profile",
+        "DB.S.T",
+        ["ID"],
+    )
+    assert record["rows"] == 1
+    assert record["query_id"] is not None
+    assert trace.summary().splitlines()[2].split()[:4] == [
+        "profile",
+        "DB.S.T",
+        "ID",
+        "1",
+    ]
+
+
+def test_no_trace_arguments_start_no_trace(config):
+    assert start_trace(parse(), config) is None
+
+
+def test_trace_history_alone_traces_and_prints_a_summary(config, monkeypatch, capsys):
+    databases = []
+
+    def fetch_history(trace, cursor, database=None):
+        if database != "DB":
+            raise RuntimeError(f"no database {database}")
+        databases.append(database)
+
+    monkeypatch.setattr(QueryTrace, "fetch_history", fetch_history)
+    args = parse("--trace-history")
+    trace = start_trace(args, config)
+    ConnectionPool.get(config).cursor().execute("select 1")
+    finish_trace(trace, args, config, "MISSING", "DB")
+
+    assert len(trace.records) == 1
+    assert databases == ["DB"]
+    assert "QUERIES" in capsys.readouterr().err
+    assert ConnectionPool.get(config).trace is None
+
+
+def test_trace_writes_json_lines_without_a_summary(config, tmp_path, capsys):
+    path = str(tmp_path / "trace.jsonl")
+    args = parse("--trace", path)
+    trace = start_trace(args, config)
+    ConnectionPool.get(config).cursor().execute("select 1")
+    finish_trace(trace, args, config)
+
+    with open(path) as file:
+        assert len(file.readlines()) == 1
+    assert "QUERIES" not in capsys.readouterr().err
@@ -0,0 +1,67 @@
+import io
+import time
+
+import pytest
+
+from snowflake_tools.ProfileCache import ProfileCache
+from snowflake_tools.QueryExecutor import QueryExecutor
+from snowflake_tools.SnowflakeTable import SnowflakeTable
+from snowflake_tools.TableWatcher import TableWatcher
+
+COLUMNS = [("ID", "NUMBER")]
+
+
+@pytest.fixture
+def attempts():
+    """The tables analyzed, in order."""
+    return []
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch, connection, attempts):
+    """Watches DB.S, where profiling DB.S.BAD always fails."""
+    connection.create_table("DB.S.GOOD", COLUMNS, [[1], [2]])
+    connection.create_table("DB.S.BAD", COLUMNS, [[1], [2]])
+    analyze = SnowflakeTable.analyze
+
+    def failing_analyze(table):
+        attempts.append(table.fq_table)
+        if table.fq_table == "DB.S.BAD":
+            raise RuntimeError("Insufficient privileges")
+        analyze(table)
+
+    monkeypatch.setattr(SnowflakeTable, "analyze", failing_analyze)
+    return TableWatcher(
+        {},
+        ["DB.S"],
+        connection,
+        QueryExecutor(connection),
+        ProfileCache(str(tmp_path)),
+        max_workers=1,
+        output=io.StringIO(),
+    )
+
+
+def test_failing_tables_wait_for_their_retry_delay(watcher, attempts):
+    watcher.run(once=True)
+    watcher.run(once=True)
+    assert attempts == ["DB.S.BAD", "DB.S.GOOD"]
+    assert "retrying in 300s" in watcher.output.getvalue()
+
+    # Once the delay has passed it is retried, and the next delay doubles
+    watcher._failures["DB.S.BAD"] = watcher._failures["DB.S.BAD"][:2] + (0,)
+    watcher.run(once=True)
+    assert attempts[2:] == ["DB.S.BAD"]
+    assert "retrying in 600s" in watcher.output.getvalue()
+
+
+def test_failing_tables_are_retried_once_they_change(watcher, connection, attempts):
+    watcher.run(once=True)
+
+    time.sleep(0.01)
+    connection.insert("DB.S.BAD", [[3]])
+    watcher.run(once=True)
+
+    assert attempts == ["DB.S.BAD", "DB.S.GOOD", "DB.S.BAD"]
+    # A changed table starts over at the first delay
+    assert watcher._failures["DB.S.BAD"][1] == 1
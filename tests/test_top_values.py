@@ -0,0 +1,71 @@
+import pytest
+
+COLUMNS = [
+    ("ID", "NUMBER"),
+    ("KIND", "TEXT"),
+    ("CODE", "NUMBER"),
+    ("PAYLOAD", "VARIANT"),
+]
+
+
+@pytest.fixture
+def rows():
+    # KIND has 3 values; CODE has 10, with 7 the most frequent and 3 next
+    return [
+        [i, "abc"[i % 3], 7 if i % 2 else (3 if i % 5 == 0 else i % 20), None]
+        for i in range(100)
+    ]
+
+
+def values_queries(trace):
+    return [record for record in trace.records if record["phase"] == "values"]
+
+
+def test_few_values_are_listed_with_exact_counts(make_table, rows):
+    table = make_table("DB.S.T", COLUMNS, rows, max_distinct=5, top_k=2)
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    assert frame.loc["KIND", "VALUES"] == ["a", "b", "c"]
+    assert sorted(frame.loc["KIND", "TOP_VALUES"]) == [
+        ("a", 34),
+        ("b", 33),
+        ("c", 33),
+    ]
+
+
+def test_many_values_list_only_the_top_k(make_table, rows):
+    table = make_table("DB.S.T", COLUMNS, rows, max_distinct=5, top_k=2)
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    # APPROX_TOP_K runs over TO_VARCHAR of each column, so values come back as text
+    assert frame.loc["CODE", "TOP_VALUES"] == [("7", 50), ("3", 10)]
+    assert frame.loc["CODE", "VALUES"] is None
+
+
+def test_all_columns_share_one_scan_leaving_out_unique_and_variant_columns(
+    make_table, trace, rows
+):
+    make_table("DB.S.T", COLUMNS, rows, max_distinct=5, top_k=2).analyze()
+
+    (query,) = values_queries(trace)
+    assert query["columns"] == ["KIND", "CODE"]
+
+
+def test_top_k_zero_finds_values_of_small_columns_only(make_table, trace, rows):
+    table = make_table("DB.S.T", COLUMNS, rows, max_distinct=5, top_k=0)
+    table.analyze()
+
+    (query,) = values_queries(trace)
+    assert query["columns"] == ["KIND"]
+    assert table.to_pandas().set_index("COLUMN_NAME").loc["CODE", "TOP_VALUES"] is None
+
+
+def test_sampled_values_are_not_listed_as_complete(make_table, rows):
+    table = make_table("DB.S.T", COLUMNS, rows, max_distinct=5, sample="50")
+    table.analyze()
+    frame = table.to_pandas().set_index("COLUMN_NAME")
+
+    assert frame.loc["KIND", "VALUES"] is None
+    assert "VALUES (sample)" in frame.loc["KIND", "ESTIMATED"]